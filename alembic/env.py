@@ -0,0 +1,65 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from car_management_backend.app.config import settings
+from car_management_backend.app.models.database import Base
+# Register every model on the metadata
+from car_management_backend.app.models.garage import Garage  # noqa: F401
+from car_management_backend.app.models.car import Car  # noqa: F401
+from car_management_backend.app.models.maintenance import MaintenanceRequest  # noqa: F401
+from car_management_backend.app.models.maintenance_schedule import MaintenanceSchedule  # noqa: F401
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy  # noqa: F401
+from car_management_backend.app.models.service_count import MonthlyServiceCount  # noqa: F401
+from car_management_backend.app.models.table_version import TableVersion  # noqa: F401
+from car_management_backend.app.models.job import Job  # noqa: F401
+from car_management_backend.app.models.search import is_search_table
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Migrate the same database the application is configured for
+config.set_main_option("sqlalchemy.url", settings.database_url.replace("%", "%%"))
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    """ Leave the FTS5 search tables, which are not mapped models, out of the autogenerate comparison """
+    return not (type_ == "table" and is_search_table(name))
+
+
+def run_migrations_offline():
+    """ Emit the migration SQL without a database connection """
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_name=include_name,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """ Run the migrations against the configured database """
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        # SQLite can only alter columns by recreating the table, which batch mode does
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True,
+                          include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
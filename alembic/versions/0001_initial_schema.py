@@ -0,0 +1,80 @@
+"""initial schema
+
+Tables as created by car_management_backend/app/models/init_db.py before the precomputed occupancy and the
+migrations were introduced. Databases created by that script are brought under Alembic with: alembic stamp 0001,
+then alembic upgrade head, which creates and fills the later tables from their rows.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "garages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("city", sa.String(), nullable=False),
+        sa.Column("capacity", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_garages_id", "garages", ["id"])
+    op.create_index("ix_garages_name", "garages", ["name"])
+    op.create_index("ix_garages_city", "garages", ["city"])
+
+    op.create_table(
+        "cars",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("make", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("production_year", sa.Integer(), nullable=False),
+        sa.Column("license_plate", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_cars_id", "cars", ["id"])
+    op.create_index("ix_cars_make", "cars", ["make"])
+
+    op.create_table(
+        "car_garage",
+        sa.Column("car_id", sa.Integer(), sa.ForeignKey("cars.id"), nullable=False),
+        sa.Column("garage_id", sa.Integer(), sa.ForeignKey("garages.id"), nullable=False),
+        sa.PrimaryKeyConstraint("car_id", "garage_id"),
+    )
+
+    op.create_table(
+        "maintenance_requests",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("car_id", sa.Integer(), sa.ForeignKey("cars.id"), nullable=False),
+        sa.Column("car_name", sa.String(), nullable=False),
+        sa.Column("service_type", sa.String(), nullable=False),
+        sa.Column("scheduled_date", sa.String(), nullable=False),
+        sa.Column("garage_id", sa.Integer(), sa.ForeignKey("garages.id"), nullable=False),
+        sa.Column("garage_name", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_maintenance_requests_id", "maintenance_requests", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_maintenance_requests_id", table_name="maintenance_requests")
+    op.drop_table("maintenance_requests")
+    op.drop_table("car_garage")
+    op.drop_index("ix_cars_make", table_name="cars")
+    op.drop_index("ix_cars_id", table_name="cars")
+    op.drop_table("cars")
+    op.drop_index("ix_garages_city", table_name="garages")
+    op.drop_index("ix_garages_name", table_name="garages")
+    op.drop_index("ix_garages_id", table_name="garages")
+    op.drop_table("garages")
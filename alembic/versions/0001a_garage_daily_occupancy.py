@@ -0,0 +1,37 @@
+"""garage daily occupancy
+
+Number of maintenance requests per garage and day, kept by the booking paths, filled from the existing requests.
+Same as running car_management_backend/app/models/rebuild_occupancy.py on the upgraded database.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001a"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "garage_daily_occupancy",
+        sa.Column("garage_id", sa.Integer(), sa.ForeignKey("garages.id"), nullable=False),
+        sa.Column("date", sa.String(), nullable=False),
+        sa.Column("request_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("garage_id", "date"),
+    )
+    op.execute(
+        "INSERT INTO garage_daily_occupancy (garage_id, date, request_count) "
+        "SELECT garage_id, scheduled_date, COUNT(id) FROM maintenance_requests GROUP BY garage_id, scheduled_date"
+    )
+
+
+def downgrade():
+    op.drop_table("garage_daily_occupancy")
@@ -0,0 +1,53 @@
+"""typed scheduled date and composite date indexes
+
+Stores maintenance_requests.scheduled_date and garage_daily_occupancy.date as DATE and indexes the
+maintenance requests by (garage_id, scheduled_date) and (car_id, scheduled_date).
+The stored values are already YYYY-MM-DD strings, which is also how SQLite keeps DATE columns.
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    retype_column("maintenance_requests", "scheduled_date", sa.Date(), sa.String())
+    with op.batch_alter_table("maintenance_requests") as batch_op:
+        batch_op.create_index("ix_maintenance_requests_garage_id_scheduled_date", ["garage_id", "scheduled_date"])
+        batch_op.create_index("ix_maintenance_requests_car_id_scheduled_date", ["car_id", "scheduled_date"])
+
+    retype_column("garage_daily_occupancy", "date", sa.Date(), sa.String(), primary_key=True)
+
+
+def downgrade():
+    retype_column("garage_daily_occupancy", "date", sa.String(), sa.Date(), primary_key=True)
+
+    with op.batch_alter_table("maintenance_requests") as batch_op:
+        batch_op.drop_index("ix_maintenance_requests_car_id_scheduled_date")
+        batch_op.drop_index("ix_maintenance_requests_garage_id_scheduled_date")
+    retype_column("maintenance_requests", "scheduled_date", sa.String(), sa.Date())
+
+
+def retype_column(table_name, column_name, new_type, existing_type, primary_key=False):
+    """ Change the type of a column while keeping its YYYY-MM-DD values as they are """
+    if op.get_bind().dialect.name == "sqlite":
+        # Recreating the table with the column reflected as the new type copies the values without the
+        # CAST(... AS DATE) batch mode would add for a type change, which turns the strings into numbers
+        column = sa.Column(column_name, new_type, nullable=False, primary_key=primary_key)
+        with op.batch_alter_table(table_name, recreate="always", reflect_args=[column]):
+            pass
+        return
+
+    with op.batch_alter_table(table_name) as batch_op:
+        batch_op.alter_column(column_name, type_=new_type, existing_type=existing_type, existing_nullable=False,
+                              postgresql_using=f"{column_name}::{new_type.compile(op.get_bind().dialect)}")
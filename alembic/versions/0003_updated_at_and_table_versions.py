@@ -0,0 +1,50 @@
+"""updated_at columns and table versions
+
+Adds the updated_at column of the cars, garages and maintenance requests and the table_versions change
+counters, which together give the ETags of the detail and listing routes.
+Existing rows get the time of the migration as their last update.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ["cars", "garages", "maintenance_requests"]
+
+
+def upgrade():
+    for table_name in VERSIONED_TABLES:
+        # SQLite cannot add a column with a non constant default in place, so the table is recreated there
+        with op.batch_alter_table(table_name, recreate="always" if is_sqlite() else "auto") as batch_op:
+            batch_op.add_column(sa.Column("updated_at", sa.DateTime(), nullable=False,
+                                          server_default=sa.func.current_timestamp()))
+
+    table_versions = op.create_table(
+        "table_versions",
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("table_name"),
+    )
+    op.bulk_insert(table_versions, [{"table_name": table_name, "version": 0} for table_name in VERSIONED_TABLES])
+
+
+def downgrade():
+    op.drop_table("table_versions")
+    for table_name in reversed(VERSIONED_TABLES):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column("updated_at")
+
+
+def is_sqlite():
+    """ Whether the migration runs against SQLite """
+    return op.get_bind().dialect.name == "sqlite"
@@ -0,0 +1,40 @@
+"""drop the denormalized car and garage names
+
+The maintenance requests read the names from their car and garage instead of storing copies of them.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("maintenance_requests") as batch_op:
+        batch_op.drop_column("garage_name")
+        batch_op.drop_column("car_name")
+
+
+def downgrade():
+    with op.batch_alter_table("maintenance_requests") as batch_op:
+        batch_op.add_column(sa.Column("car_name", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("garage_name", sa.String(), nullable=True))
+
+    # Copy the current names back before making the columns required again
+    op.execute(
+        "UPDATE maintenance_requests SET "
+        "car_name = (SELECT make FROM cars WHERE cars.id = maintenance_requests.car_id), "
+        "garage_name = (SELECT name FROM garages WHERE garages.id = maintenance_requests.garage_id)"
+    )
+    with op.batch_alter_table("maintenance_requests") as batch_op:
+        batch_op.alter_column("car_name", existing_type=sa.String(), nullable=False)
+        batch_op.alter_column("garage_name", existing_type=sa.String(), nullable=False)
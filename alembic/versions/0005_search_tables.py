@@ -0,0 +1,40 @@
+"""search tables
+
+Creates the FTS5 tables of the cars and garages search on SQLite and fills them from the existing rows.
+Other databases search with ILIKE and have nothing to migrate.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Search table, indexed table and indexed columns, as in car_management_backend/app/models/search.py
+SEARCH_TABLES = [
+    ("cars_search", "cars", "make, model, license_plate"),
+    ("garages_search", "garages", "name, location, city"),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table_name, source_table, columns in SEARCH_TABLES:
+        op.execute(f"CREATE VIRTUAL TABLE {table_name} USING fts5({columns}, "
+                   f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        op.execute(f"INSERT INTO {table_name} (rowid, {columns}) SELECT id, {columns} FROM {source_table}")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table_name, _, _ in SEARCH_TABLES:
+        op.execute(f"DROP TABLE {table_name}")
@@ -0,0 +1,57 @@
+"""normalized unique license plate
+
+Adds cars.normalized_plate, the license plate upper-cased and without whitespace, with a unique index.
+Existing duplicates have to be resolved first, the migration lists them and stops otherwise.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def normalize_plate(plate):
+    """ Same folding as crud_operations/cars.py """
+    return "".join(plate.split()).upper()
+
+
+def upgrade():
+    connection = op.get_bind()
+    cars = sa.table("cars", sa.column("id", sa.Integer()), sa.column("license_plate", sa.String()),
+                    sa.column("normalized_plate", sa.String()))
+
+    rows = connection.execute(sa.select(cars.c.id, cars.c.license_plate)).all()
+    car_ids = defaultdict(list)
+    for car_id, license_plate in rows:
+        car_ids[normalize_plate(license_plate)].append(car_id)
+    duplicates = {plate: ids for plate, ids in car_ids.items() if len(ids) > 1}
+    if duplicates:
+        raise RuntimeError(f"Cars sharing a license plate, to be merged or corrected first: {duplicates}")
+
+    with op.batch_alter_table("cars") as batch_op:
+        batch_op.add_column(sa.Column("normalized_plate", sa.String(), nullable=True))
+    if rows:
+        connection.execute(
+            cars.update().where(cars.c.id == sa.bindparam("car_id")).values(normalized_plate=sa.bindparam("plate")),
+            [{"car_id": car_id, "plate": normalize_plate(license_plate)} for car_id, license_plate in rows]
+        )
+    with op.batch_alter_table("cars") as batch_op:
+        batch_op.alter_column("normalized_plate", existing_type=sa.String(), nullable=False)
+        batch_op.create_index("ix_cars_normalized_plate", ["normalized_plate"], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table("cars") as batch_op:
+        batch_op.drop_index("ix_cars_normalized_plate")
+        batch_op.drop_column("normalized_plate")
@@ -0,0 +1,59 @@
+"""maintenance schedules
+
+Adds the recurring maintenance schedules and links the maintenance requests booked from one of their
+occurrences to the schedule and the occurrence they replace.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "maintenance_schedules",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("car_id", sa.Integer(), nullable=False),
+        sa.Column("garage_id", sa.Integer(), nullable=False),
+        sa.Column("service_type", sa.String(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("frequency", sa.String(), nullable=False),
+        sa.Column("interval", sa.Integer(), nullable=False),
+        sa.Column("until_date", sa.Date(), nullable=True),
+        sa.Column("occurrence_count", sa.Integer(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+        sa.ForeignKeyConstraint(["car_id"], ["cars.id"]),
+        sa.ForeignKeyConstraint(["garage_id"], ["garages.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_maintenance_schedules_id", "maintenance_schedules", ["id"])
+    op.create_index("ix_maintenance_schedules_car_id", "maintenance_schedules", ["car_id"])
+    op.create_index("ix_maintenance_schedules_garage_id", "maintenance_schedules", ["garage_id"])
+
+    with op.batch_alter_table("maintenance_requests") as batch_op:
+        batch_op.add_column(sa.Column("schedule_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("occurrence_date", sa.Date(), nullable=True))
+        batch_op.create_foreign_key("fk_maintenance_requests_schedule_id", "maintenance_schedules",
+                                    ["schedule_id"], ["id"])
+        batch_op.create_index("ix_maintenance_requests_schedule_id_occurrence_date",
+                              ["schedule_id", "occurrence_date"], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table("maintenance_requests") as batch_op:
+        batch_op.drop_index("ix_maintenance_requests_schedule_id_occurrence_date")
+        batch_op.drop_constraint("fk_maintenance_requests_schedule_id", type_="foreignkey")
+        batch_op.drop_column("occurrence_date")
+        batch_op.drop_column("schedule_id")
+
+    op.drop_table("maintenance_schedules")
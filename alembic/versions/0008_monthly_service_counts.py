@@ -0,0 +1,47 @@
+"""monthly service counts
+
+Adds the maintenance request counts per month, car make, production year and service type read by the fleet
+analytics, and fills them from the existing maintenance requests.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "monthly_service_counts",
+        sa.Column("month", sa.String(), nullable=False),
+        sa.Column("make", sa.String(), nullable=False),
+        sa.Column("production_year", sa.Integer(), nullable=False),
+        sa.Column("service_type", sa.String(), nullable=False),
+        sa.Column("request_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("month", "make", "production_year", "service_type"),
+    )
+
+    # Same YYYY-MM month as crud_operations/service_counts.py
+    if op.get_bind().dialect.name == "postgresql":
+        month = "to_char(maintenance_requests.scheduled_date, 'YYYY-MM')"
+    else:
+        month = "strftime('%Y-%m', maintenance_requests.scheduled_date)"
+    op.execute(
+        "INSERT INTO monthly_service_counts (month, make, production_year, service_type, request_count) "
+        f"SELECT {month}, cars.make, cars.production_year, maintenance_requests.service_type, "
+        "count(maintenance_requests.id) FROM maintenance_requests JOIN cars ON cars.id = maintenance_requests.car_id "
+        f"GROUP BY {month}, cars.make, cars.production_year, maintenance_requests.service_type"
+    )
+
+
+def downgrade():
+    op.drop_table("monthly_service_counts")
@@ -0,0 +1 @@
+""" Benchmarks of the backend hot paths, see benchmarks/scenarios.py for the reproducible suite """
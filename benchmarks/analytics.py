@@ -0,0 +1,97 @@
+""" Benchmark of the fleet analytics reports on a year of data across many garages
+
+Usage: python -m benchmarks.analytics --garages 1000 --requests 1000000 --max-ms 1000
+Fills a temporary SQLite database with the fleet of benchmarks/fleet.py and computes each report of
+crud_operations/analytics.py over the last year of it, with NumPy when installed and with the pure Python
+fallback. Checks that both give the same report and prints the timings as JSON. With --max-ms the exit status
+is 1 when a report is slower than the budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(function, repeat):
+    """ Median duration in milliseconds and the result of the last call """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        durations.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(durations), 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--garages", type=int, default=1000)
+    parser.add_argument("--cars", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="Budget of every report, with NumPy when installed")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["CAR_MANAGEMENT_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'analytics.db')}"
+    sys.path.insert(0, REPO_ROOT)
+
+    from benchmarks.fleet import FIRST_DAY, HISTORY_DAYS, generate_fleet
+    from car_management_backend.app.crud_operations import analytics
+    from car_management_backend.app.models.database import get_engines
+    from car_management_backend.app.serializers import encode_json
+
+    engines = get_engines()
+    started = time.perf_counter()
+    generate_fleet(engines["engine"], garages=args.garages, cars=args.cars, requests=args.requests)
+    generation_s = time.perf_counter() - started
+
+    # The last year of the generated history, where the fleet is the busiest
+    end_date = FIRST_DAY + timedelta(days=HISTORY_DAYS - 1)
+    start_date = end_date - timedelta(days=364)
+    window = {"start_date": f"{start_date:%Y-%m-%d}", "end_date": f"{end_date:%Y-%m-%d}"}
+    month_window = {"start_month": f"{start_date:%Y-%m}", "end_month": f"{end_date:%Y-%m}"}
+    reports = {
+        "garage_utilization": (analytics.get_garage_utilization, window),
+        "service_mix": (analytics.get_service_mix, month_window),
+        "city_load_heatmap": (analytics.get_city_load_heatmap, window),
+    }
+
+    numpy = analytics.np
+    db = engines["SessionLocal"]()
+    results = {"garages": args.garages, "requests": args.requests, "generation_s": round(generation_s, 3),
+               "numpy": numpy is not None, "reports": {}}
+    for name, (report, parameters) in reports.items():
+        result = {}
+        bodies = []
+        # NumPy first when installed, then the fallback the module uses without it
+        for implementation, module_numpy in (("numpy", numpy), ("python", None)):
+            if implementation == "numpy" and numpy is None:
+                continue
+            analytics.np = module_numpy
+            elapsed_ms, body = timed(lambda: encode_json(report(db, **parameters)), args.repeat)
+            result[f"{implementation}_ms"] = elapsed_ms
+            bodies.append(body)
+        analytics.np = numpy
+        result["bytes"] = len(bodies[0])
+        result["identical"] = all(body == bodies[0] for body in bodies)
+        results["reports"][name] = result
+
+    db.close()
+    engines["engine"].dispose()
+    print(json.dumps(results, indent=2))
+
+    identical = all(result["identical"] for result in results["reports"].values())
+    fastest = "numpy_ms" if numpy is not None else "python_ms"
+    within_budget = args.max_ms is None or all(result[fastest] <= args.max_ms
+                                               for result in results["reports"].values())
+    sys.exit(0 if identical and within_budget else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+""" Load benchmark comparing the sync (threadpool) and async DB layers on the same dataset
+
+Usage: python benchmarks/async_vs_sync.py --cars 5000 --concurrency 200 --duration 10
+Requires uvicorn, httpx and aiosqlite next to the backend requirements.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed_database(workdir, garages, cars, requests):
+    """ Create and fill car_management.db in the working directory with a deterministic dataset """
+    script = f"""
+import random
+from car_management_backend.app.models.init_db import *
+from car_management_backend.app.models.database import engine
+from car_management_backend.app.models.car_garage import car_garage
+
+rng = random.Random(42)
+with engine.begin() as connection:
+    connection.execute(Garage.__table__.insert(), [
+        {{"id": i, "name": f"Garage {{i}}", "location": f"Street {{i}}", "city": f"City {{i % 20}}", "capacity": 10}}
+        for i in range(1, {garages} + 1)
+    ])
+    connection.execute(Car.__table__.insert(), [
+        {{"id": i, "make": rng.choice(["VW", "BMW", "Audi", "Toyota"]), "model": "Model", "production_year": 2015,
+          "license_plate": f"CA{{i:06d}}", "normalized_plate": f"CA{{i:06d}}"}}
+        for i in range(1, {cars} + 1)
+    ])
+    connection.execute(car_garage.insert(), [
+        {{"car_id": i, "garage_id": rng.randint(1, {garages})}} for i in range(1, {cars} + 1)
+    ])
+    connection.execute(MaintenanceRequest.__table__.insert(), [
+        {{"car_id": rng.randint(1, {cars}), "service_type": "Oil change",
+          "scheduled_date": f"2030-{{rng.randint(1, 12):02d}}-{{rng.randint(1, 28):02d}}",
+          "garage_id": rng.randint(1, {garages})}}
+        for _ in range({requests})
+    ])
+
+from car_management_backend.app.crud_operations.occupancy import rebuild_occupancy
+from car_management_backend.app.models.database import SessionLocal
+rebuild_occupancy(SessionLocal())
+"""
+    subprocess.run([sys.executable, "-c", script], cwd=workdir, check=True, env=server_env(workdir, False))
+
+
+def server_env(workdir, use_async):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["CAR_MANAGEMENT_DATABASE_ASYNC"] = "1" if use_async else "0"
+    # Idle job workers polling their queue would only add noise
+    env["CAR_MANAGEMENT_JOB_WORKERS"] = "0"
+    return env
+
+
+async def wait_until_ready(base_url, timeout=20):
+    async with httpx.AsyncClient() as client:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{base_url}/garages/1")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+async def run_load(base_url, garages, cars, concurrency, duration):
+    """ Hit a mix of read endpoints from many concurrent clients and collect latencies """
+    rng = random.Random(7)
+    paths = [
+        lambda: f"/cars/{rng.randint(1, cars)}",
+        lambda: f"/garages/{rng.randint(1, garages)}",
+        lambda: f"/cars?garageId={rng.randint(1, garages)}&limit=50",
+        lambda: f"/garages/dailyAvailabilityReport?garageId={rng.randint(1, garages)}"
+                f"&startDate=2030-01-01&endDate=2030-01-31",
+    ]
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.get(rng.choice(paths)())
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+    }
+
+
+def benchmark_mode(workdir, use_async, port, args):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "car_management_backend.app.main:app", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=server_env(workdir, use_async)
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        return asyncio.run(run_load(base_url, args.garages, args.cars, args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--garages", type=int, default=200)
+    parser.add_argument("--cars", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_database(workdir, args.garages, args.cars, args.requests)
+        results = {
+            "dataset": {"garages": args.garages, "cars": args.cars, "maintenance_requests": args.requests},
+            "concurrency": args.concurrency,
+            "sync": benchmark_mode(workdir, False, args.port, args),
+            "async": benchmark_mode(workdir, True, args.port, args),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
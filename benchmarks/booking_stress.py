@@ -0,0 +1,92 @@
+""" Stress test of the capacity-aware booking: many threads book the same garage day at once
+
+Usage: python benchmarks/booking_stress.py --bookers 500 --capacity 1
+Runs against a temporary SQLite database, or against CAR_MANAGEMENT_DATABASE_URL when it is set.
+Exits with a non-zero status when the garage day ends up overbooked, or when a booking neither succeeded nor was
+rejected with a 409, e.g. a database error.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEDULED_DATE = "2030-01-02"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookers", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault("CAR_MANAGEMENT_DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'stress.db')}")
+    # One connection per booker, so that they really run concurrently
+    os.environ["CAR_MANAGEMENT_DATABASE_MAX_OVERFLOW"] = str(args.bookers)
+    os.environ["CAR_MANAGEMENT_CACHE_ENABLED"] = "false"
+    sys.path.insert(0, REPO_ROOT)
+
+    from fastapi import HTTPException
+    from car_management_backend.app.models.init_db import Car, Garage, MaintenanceRequest
+    from car_management_backend.app.models.database import SessionLocal
+    from car_management_backend.app.models.occupancy import GarageDailyOccupancy
+    from car_management_backend.app.crud_operations import maintenance_requests as maintenance_crud
+    from car_management_backend.app.schemas.maintenance import MaintenanceRequestCreate
+
+    with SessionLocal() as db:
+        garage = Garage(name="Stress garage", location="Street 1", city="Sofia", capacity=args.capacity)
+        car = Car(make="VW", model="Golf", production_year=2015, license_plate="CA0001",
+                  normalized_plate="CA0001")
+        db.add_all([garage, car])
+        db.commit()
+        garage_id, car_id = garage.id, car.id
+
+    start = threading.Barrier(args.bookers)
+    request = MaintenanceRequestCreate(carId=car_id, garageId=garage_id, serviceType="Oil change",
+                                       scheduledDate=SCHEDULED_DATE)
+
+    def book(_):
+        with SessionLocal() as db:
+            start.wait()
+            try:
+                maintenance_crud.create_maintenance_request(db=db, maintenance_request=request)
+                return "booked"
+            except HTTPException as error:
+                return str(error.status_code)
+            except Exception as error:
+                return type(error).__name__
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.bookers) as executor:
+        outcomes = list(executor.map(book, range(args.bookers)))
+    elapsed = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        stored = db.query(MaintenanceRequest).filter(MaintenanceRequest.garage_id == garage_id).count()
+        occupancy = db.query(GarageDailyOccupancy.request_count).filter(
+            GarageDailyOccupancy.garage_id == garage_id).scalar()
+
+    counts = {outcome: outcomes.count(outcome) for outcome in sorted(set(outcomes))}
+    overbooked = stored > args.capacity or occupancy != stored
+    # A full day is the only expected rejection, a busy database must be retried by the booking path
+    unexpected = sum(count for outcome, count in counts.items() if outcome not in ("booked", "409"))
+    print(json.dumps({
+        "bookers": args.bookers,
+        "capacity": args.capacity,
+        "outcomes": counts,
+        "stored_requests": stored,
+        "occupancy": occupancy,
+        "overbooked": overbooked,
+        "unexpected_outcomes": unexpected,
+        "elapsed_s": round(elapsed, 3),
+    }, indent=2))
+    sys.exit(1 if overbooked or unexpected else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+""" Compare two results of benchmarks/scenarios.py and flag the regressions
+
+Usage: python -m benchmarks.compare before.json after.json [--metric p50_ms] [--threshold 0.1] [--fail]
+Prints one line per scenario with the metric before and after and their ratio. A scenario is a regression
+when its metric grew by more than the threshold, or when it started failing requests. With --fail the
+exit status is non-zero when any scenario regressed.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_METRICS = ["mean_ms", "p50_ms", "p95_ms", "p99_ms", "min_ms", "max_ms"]
+
+
+def compare(before, after, metric, threshold):
+    """ Per scenario comparison of the metric, the scenarios run on both sides only """
+    if before.get("suite_version") != after.get("suite_version"):
+        raise ValueError("The results come from different versions of the suite and cannot be compared")
+    fleets = [{key: value for key, value in results["fleet"].items() if key != "generation_s"}
+              for results in (before, after)]
+    if fleets[0] != fleets[1]:
+        print("Warning: the results were measured on different fleets", file=sys.stderr)
+
+    rows = []
+    for name, old in before["scenarios"].items():
+        new = after["scenarios"].get(name)
+        if new is None:
+            continue
+        ratio = new[metric] / old[metric] if old[metric] else None
+        rows.append({
+            "scenario": name,
+            "before": old[metric],
+            "after": new[metric],
+            "ratio": round(ratio, 3) if ratio is not None else None,
+            "regression": (ratio is not None and ratio > 1 + threshold) or new["errors"] > old["errors"],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="p50_ms", choices=LATENCY_METRICS)
+    parser.add_argument("--threshold", type=float, default=0.1, help="Tolerated relative slowdown")
+    parser.add_argument("--fail", action="store_true", help="Exit with status 1 on any regression")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    rows = compare(before, after, args.metric, args.threshold)
+
+    if args.json:
+        print(json.dumps({"metric": args.metric, "threshold": args.threshold,
+                          "before": before["environment"].get("commit"), "after": after["environment"].get("commit"),
+                          "scenarios": rows}, indent=2))
+    else:
+        print(f"{'scenario':<24}{'before':>12}{'after':>12}{'ratio':>8}  ({args.metric}, "
+              f"{before['environment'].get('commit')} -> {after['environment'].get('commit')})")
+        for row in rows:
+            ratio = f"{row['ratio']:.2f}" if row["ratio"] is not None else "-"
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['scenario']:<24}{row['before']:>12.3f}{row['after']:>12.3f}{ratio:>8}{flag}")
+
+    if args.fail and any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+""" Deterministic synthetic fleet: garages, cars linked to a few garages each and skewed maintenance requests
+
+Usage: python -m benchmarks.fleet --database-url sqlite:///fleet.db --garages 200 --cars 20000 --requests 200000
+The same seed and sizes always produce the same rows. The schema is created from the current models, the
+occupancy, service counts and search tables are rebuilt from the generated rows.
+"""
+import argparse
+import json
+import random
+import time
+from bisect import bisect
+from datetime import date, timedelta
+from itertools import accumulate, islice
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from car_management_backend.app.crud_operations.occupancy import rebuild_occupancy
+from car_management_backend.app.crud_operations.search import rebuild_search_index
+from car_management_backend.app.crud_operations.service_counts import rebuild_service_counts
+from car_management_backend.app.models.database import Base
+from car_management_backend.app.models.maintenance import MaintenanceRequest  # noqa: F401
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy  # noqa: F401
+from car_management_backend.app.models.service_count import MonthlyServiceCount  # noqa: F401
+from car_management_backend.app.models.search import SEARCH_TABLES  # noqa: F401
+from car_management_backend.app.models.table_version import TableVersion  # noqa: F401
+
+# First day of the generated maintenance history and its length in days
+FIRST_DAY = date(2030, 1, 1)
+HISTORY_DAYS = 730
+
+CITIES = ["Sofia", "Plovdiv", "Varna", "Burgas", "Ruse", "Stara Zagora", "Pleven", "Sliven"]
+MAKES = ["Toyota", "Volkswagen", "BMW", "Audi", "Skoda", "Renault", "Peugeot", "Ford", "Opel", "Volvo"]
+MODELS = ["Corolla", "Golf", "Passat", "Octavia", "Clio", "Focus", "Astra", "Yaris", "Megane", "Polo"]
+SERVICE_TYPES = ["Oil change", "Tyre change", "Brake inspection", "Annual inspection", "Battery replacement"]
+# Relative load of the weekdays, Monday first: garages are busiest early in the week and closed on Sundays
+WEEKDAY_WEIGHTS = [1.6, 1.3, 1.1, 1.0, 1.2, 0.5, 0.0]
+
+# Rows sent per executemany call
+INSERT_BATCH_SIZE = 20_000
+
+
+def cumulative(weights):
+    return list(accumulate(weights))
+
+
+def pick(rng, values, cumulative_weights):
+    """ Weighted choice by bisection, much cheaper than random.choices for one value out of many """
+    return values[bisect(cumulative_weights, rng.random() * cumulative_weights[-1])]
+
+
+def generate_garages(rng, count):
+    for garage_id in range(1, count + 1):
+        city = CITIES[garage_id % len(CITIES)]
+        yield garage_id, f"{city} Auto {garage_id}", f"Street {rng.randint(1, 200)}", city, rng.randint(5, 30)
+
+
+def generate_cars(rng, count):
+    for car_id in range(1, count + 1):
+        license_plate = f"{rng.choice(['CA', 'PB', 'CB', 'BT'])}{car_id:06d}{rng.choice('ABCEHKMOPTX')}"
+        yield car_id, rng.choice(MAKES), rng.choice(MODELS), rng.randint(1995, 2024), license_plate, license_plate
+
+
+def generate_links(rng, cars, garage_weights):
+    """ Each car is serviced at one to three garages, the popular ones more often """
+    garage_ids = list(range(1, len(garage_weights) + 1))
+    for car_id in range(1, cars + 1):
+        garages = {pick(rng, garage_ids, garage_weights) for _ in range(rng.choice((1, 1, 1, 2, 2, 3)))}
+        for garage_id in sorted(garages):
+            yield car_id, garage_id
+
+
+def generate_requests(rng, count, car_garages):
+    """ Requests of the cars at their garages, growing over the history and following the weekly cycle """
+    days = [FIRST_DAY + timedelta(days=offset) for offset in range(HISTORY_DAYS)]
+    # The fleet grows, so the last day is about three times as busy as the first one
+    day_weights = cumulative(WEEKDAY_WEIGHTS[day.weekday()] * (1 + 2 * offset / HISTORY_DAYS)
+                             for offset, day in enumerate(days))
+    for request_id in range(1, count + 1):
+        car_id = rng.randint(1, len(car_garages))
+        yield (request_id, car_id, rng.choice(SERVICE_TYPES), pick(rng, days, day_weights).isoformat(),
+               rng.choice(car_garages[car_id - 1]))
+
+
+def insert_rows(connection, table, columns, rows):
+    """ Insert tuples through the driver's executemany, in batches """
+    placeholder = "?" if connection.dialect.paramstyle == "qmark" else "%s"
+    statement = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                 f"VALUES ({', '.join([placeholder] * len(columns))})")
+    rows = iter(rows)
+    while batch := list(islice(rows, INSERT_BATCH_SIZE)):
+        connection.exec_driver_sql(statement, batch)
+
+
+def generate_fleet(engine, garages=200, cars=20_000, requests=200_000, seed=42):
+    """ Create the schema on the engine and fill it, returns the generated row counts """
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+
+    # A few garages get most of the cars and requests
+    garage_weights = cumulative(1 / rank ** 0.8 for rank in range(1, garages + 1))
+    links = list(generate_links(rng, cars, garage_weights))
+    car_garages = [[] for _ in range(cars)]
+    for car_id, garage_id in links:
+        car_garages[car_id - 1].append(garage_id)
+
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            # Nothing to recover from a crash while generating, the database is simply generated again
+            connection.exec_driver_sql("PRAGMA synchronous=OFF")
+        insert_rows(connection, "garages", ["id", "name", "location", "city", "capacity"],
+                    generate_garages(rng, garages))
+        insert_rows(connection, "cars", ["id", "make", "model", "production_year", "license_plate",
+                                         "normalized_plate"], generate_cars(rng, cars))
+        insert_rows(connection, "car_garage", ["car_id", "garage_id"], links)
+        insert_rows(connection, "maintenance_requests", ["id", "car_id", "service_type", "scheduled_date",
+                                                         "garage_id"], generate_requests(rng, requests, car_garages))
+
+    db = sessionmaker(bind=engine)()
+    try:
+        rebuild_occupancy(db)
+        rebuild_service_counts(db)
+        rebuild_search_index(db)
+    finally:
+        db.close()
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            connection.exec_driver_sql("ANALYZE")
+    return {"garages": garages, "cars": cars, "car_garage": len(links), "maintenance_requests": requests}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///fleet.db")
+    parser.add_argument("--garages", type=int, default=200)
+    parser.add_argument("--cars", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    started = time.perf_counter()
+    counts = generate_fleet(engine, args.garages, args.cars, args.requests, args.seed)
+    engine.dispose()
+    print(json.dumps({**counts, "elapsed_s": round(time.perf_counter() - started, 3)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+""" Benchmark of the maintenance report queries before and after the typed date column and composite indexes
+
+Usage: python benchmarks/report_indexes.py --rows 1000000
+Builds two temporary SQLite databases with the same rows: one with the original schema (string date,
+no composite indexes) queried with the original report SQL, one created from the current models and
+queried through the current CRUD functions. Prints the timings and EXPLAIN QUERY PLAN output as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from car_management_backend.app.crud_operations import maintenance_requests as maintenance_crud
+from car_management_backend.app.crud_operations import reports
+from car_management_backend.app.models.database import Base
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.car import Car
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy  # noqa: F401
+
+LEGACY_SCHEMA = """
+CREATE TABLE maintenance_requests (
+    id INTEGER PRIMARY KEY, car_id INTEGER NOT NULL, car_name VARCHAR NOT NULL, service_type VARCHAR NOT NULL,
+    scheduled_date VARCHAR NOT NULL, garage_id INTEGER NOT NULL, garage_name VARCHAR NOT NULL
+);
+CREATE INDEX ix_maintenance_requests_id ON maintenance_requests (id);
+"""
+
+# The monthly report and the filtered listing as issued before the migration
+LEGACY_MONTHLY_REPORT = """
+SELECT strftime('%Y-%m', scheduled_date) AS month, count(id) AS count FROM maintenance_requests
+WHERE garage_id = ? AND date(scheduled_date) >= ? AND date(scheduled_date) <= ?
+GROUP BY strftime('%Y-%m', scheduled_date) ORDER BY strftime('%Y-%m', scheduled_date)
+"""
+LEGACY_CAR_LISTING = """
+SELECT * FROM maintenance_requests WHERE car_id = ? AND scheduled_date >= ? AND scheduled_date <= ?
+"""
+LEGACY_INSERT = "INSERT INTO maintenance_requests VALUES (?, ?, 'Make', ?, ?, ?, 'Garage')"
+CURRENT_INSERT = (
+    "INSERT INTO maintenance_requests (id, car_id, service_type, scheduled_date, garage_id, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)"
+)
+
+
+def generate_rows(count, garages, cars):
+    """ Deterministic maintenance requests spread over two years """
+    rng = random.Random(42)
+    first_day = date(2030, 1, 1)
+    for request_id in range(1, count + 1):
+        yield (request_id, rng.randint(1, cars), "Oil change",
+               (first_day + timedelta(days=rng.randint(0, 729))).isoformat(), rng.randint(1, garages))
+
+
+def fill(connection, rows, insert):
+    connection.executemany(insert, rows)
+    connection.commit()
+    connection.execute("ANALYZE")
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--garages", type=int, default=500)
+    parser.add_argument("--cars", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_path = os.path.join(workdir, "legacy.db")
+        current_path = os.path.join(workdir, "current.db")
+
+        legacy = sqlite3.connect(legacy_path)
+        legacy.executescript(LEGACY_SCHEMA)
+        fill(legacy, generate_rows(args.rows, args.garages, args.cars), LEGACY_INSERT)
+
+        # The current maintenance requests read the names of their cars and garages
+        engine = create_engine(f"sqlite:///{current_path}")
+        Base.metadata.create_all(bind=engine, tables=[Car.__table__, Garage.__table__, MaintenanceRequest.__table__])
+        current = sqlite3.connect(current_path)
+        current.executemany("INSERT INTO cars (id, make, model, production_year, license_plate, normalized_plate, "
+                            "updated_at) VALUES (?, 'Make', 'Model', 2015, ?, ?, CURRENT_TIMESTAMP)",
+                            [(car_id, f"CA{car_id}", f"CA{car_id}") for car_id in range(1, args.cars + 1)])
+        current.executemany("INSERT INTO garages (id, name, location, city, capacity, updated_at) "
+                            "VALUES (?, 'Garage', 'Street', 'City', 10, CURRENT_TIMESTAMP)",
+                            [(garage_id,) for garage_id in range(1, args.garages + 1)])
+        fill(current, generate_rows(args.rows, args.garages, args.cars), CURRENT_INSERT)
+        db = sessionmaker(bind=engine)()
+
+        monthly_params = (7, "2030-01-01", "2030-12-31")
+        listing_params = (7, "2030-01-01", "2030-12-31")
+        current_monthly = (
+            "EXPLAIN QUERY PLAN SELECT scheduled_date, count(id) FROM maintenance_requests "
+            "WHERE garage_id = ? AND scheduled_date >= ? AND scheduled_date <= ? GROUP BY scheduled_date"
+        )
+        current_listing = (
+            "EXPLAIN QUERY PLAN SELECT * FROM maintenance_requests "
+            "WHERE car_id = ? AND scheduled_date >= ? AND scheduled_date <= ? ORDER BY id"
+        )
+
+        results = {
+            "rows": args.rows,
+            "monthly_report_ms": {
+                "before": timed(lambda: legacy.execute(LEGACY_MONTHLY_REPORT, monthly_params).fetchall(), args.repeat),
+                "after": timed(lambda: reports.get_requests_per_month(db, 7, "2030-01", "2030-12"), args.repeat),
+            },
+            "car_listing_ms": {
+                "before": timed(lambda: legacy.execute(LEGACY_CAR_LISTING, listing_params).fetchall(), args.repeat),
+                "after": timed(lambda: maintenance_crud.get_maintenance_requests(
+                    db, car_id=7, start_date="2030-01-01", end_date="2030-12-31"), args.repeat),
+            },
+            "query_plans": {
+                "monthly_report_before": [row[3] for row in legacy.execute(
+                    "EXPLAIN QUERY PLAN " + LEGACY_MONTHLY_REPORT, monthly_params)],
+                "monthly_report_after": [row[3] for row in current.execute(current_monthly, monthly_params)],
+                "car_listing_before": [row[3] for row in legacy.execute(
+                    "EXPLAIN QUERY PLAN " + LEGACY_CAR_LISTING, listing_params)],
+                "car_listing_after": [row[3] for row in current.execute(current_listing, listing_params)],
+            },
+        }
+        for name in ("monthly_report_ms", "car_listing_ms"):
+            timings = results[name]
+            timings["speedup"] = round(timings["before"] / timings["after"], 1) if timings["after"] else None
+
+        db.close()
+        engine.dispose()
+        legacy.close()
+        current.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+""" Reproducible scenario benchmarks driving the FastAPI app in-process on a synthetic fleet
+
+Usage: python -m benchmarks.scenarios --output results.json [--iterations 200] [--scenario monthly_report]
+Generates the fleet of benchmarks/fleet.py into a temporary SQLite database (or uses --database-url), then
+times each scenario through the ASGI app with the test client, without any network. The response cache is
+disabled unless --cache is given, so that the database work is measured. The JSON output of two commits
+can be diffed with: python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Bump when the scenarios or the fleet change, results of different versions are not comparable
+SUITE_VERSION = 1
+
+
+def list_cars_by_garage(client, rng, fleet):
+    # The popular garages have the most cars
+    return [client.get("/cars", params={"garageId": rng.randint(1, 20), "limit": 100})]
+
+
+def monthly_report(client, rng, fleet):
+    return [client.get("/maintenance/monthlyRequestsReport",
+                       params={"garageId": rng.randint(1, fleet["garages"]), "startMonth": "2030-01",
+                               "endMonth": "2031-12"})]
+
+
+def daily_availability(client, rng, fleet):
+    month = rng.randint(1, 12)
+    return [client.get("/garages/dailyAvailabilityReport",
+                       params={"garageId": rng.randint(1, fleet["garages"]), "startDate": f"2031-{month:02d}-01",
+                               "endDate": f"2031-{month:02d}-28"})]
+
+
+def create_maintenance(client, rng, fleet):
+    # Days after the generated history, spread enough for the garages never to be fully booked
+    return [client.post("/maintenance", json={
+        "carId": rng.randint(1, fleet["cars"]), "garageId": rng.randint(1, fleet["garages"]),
+        "serviceType": "Oil change", "scheduledDate": f"2032-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    })]
+
+
+def bulk_reads(client, rng, fleet):
+    """ Five pages of a thousand maintenance requests of a quarter, following the cursor """
+    quarter = rng.randint(0, 7)
+    params = {"startDate": f"{2030 + quarter // 4}-{quarter % 4 * 3 + 1:02d}-01",
+              "endDate": f"{2030 + quarter // 4}-{quarter % 4 * 3 + 3:02d}-28", "limit": 1000}
+    responses = []
+    for _ in range(5):
+        response = client.get("/maintenance", params=params)
+        responses.append(response)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {**params, "cursor": cursor}
+    return responses
+
+
+SCENARIOS = {
+    "list_cars_by_garage": list_cars_by_garage,
+    "monthly_report": monthly_report,
+    "daily_availability": daily_availability,
+    "create_maintenance": create_maintenance,
+    "bulk_reads": bulk_reads,
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def run_scenario(client, scenario, fleet, iterations, warmup, seed):
+    """ Time the iterations of a scenario, the same requests on every run thanks to the seeded generator """
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        scenario(client, rng, fleet)
+
+    latencies = []
+    errors = 0
+    rows = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        responses = scenario(client, rng, fleet)
+        latencies.append((time.perf_counter() - started) * 1000)
+        for response in responses:
+            if response.status_code >= 400:
+                errors += 1
+            elif isinstance(body := response.json(), list):
+                rows += len(body)
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "rows": rows,
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "min_ms": round(latencies[0], 3),
+        "max_ms": round(latencies[-1], 3),
+        "ops_per_s": round(iterations / (sum(latencies) / 1000), 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Existing empty database to fill, a temporary SQLite one otherwise")
+    parser.add_argument("--garages", type=int, default=200)
+    parser.add_argument("--cars", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run, repeatable, all of them by default")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache enabled")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Serve from the async engine")
+    parser.add_argument("--output", help="File to write the JSON results to, stdout otherwise")
+    args = parser.parse_args()
+
+    # The settings are read when the app is imported
+    workdir = tempfile.mkdtemp()
+    os.environ["CAR_MANAGEMENT_DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'fleet.db')}"
+    os.environ["CAR_MANAGEMENT_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["CAR_MANAGEMENT_DATABASE_ASYNC"] = "1" if args.use_async else "0"
+    sys.path.insert(0, REPO_ROOT)
+
+    from fastapi.testclient import TestClient
+    from benchmarks.fleet import generate_fleet
+    from car_management_backend.app.main import app
+    from car_management_backend.app.models.database import engine
+
+    started = time.perf_counter()
+    fleet = generate_fleet(engine, args.garages, args.cars, args.requests, args.seed)
+    results = {
+        "suite_version": SUITE_VERSION,
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "database": engine.dialect.name,
+            "async": args.use_async,
+            "cache": args.cache,
+        },
+        "fleet": {**fleet, "seed": args.seed, "generation_s": round(time.perf_counter() - started, 3)},
+        "scenarios": {},
+    }
+
+    client = TestClient(app)
+    for name in args.scenario or SCENARIOS:
+        results["scenarios"][name] = run_scenario(client, SCENARIOS[name], fleet, args.iterations, args.warmup,
+                                                  args.seed)
+    client.close()
+    engine.dispose()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
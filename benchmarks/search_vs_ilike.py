@@ -0,0 +1,104 @@
+""" Benchmark of the FTS5 search against the ILIKE scans it replaces
+
+Usage: python benchmarks/search_vs_ilike.py --cars 1000000
+Builds a temporary SQLite database from the current models, fills it with deterministic cars and garages,
+then times the same queries through the FTS5 search tables, an ILIKE over the same columns and the
+make filter of GET /cars. Prints the timings and the match counts as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAKES = ["Toyota", "Volkswagen", "BMW", "Audi", "Skoda", "Renault", "Peugeot", "Ford", "Opel", "Volvo"]
+MODELS = ["Corolla", "Golf", "Passat", "Octavia", "Clio", "Focus", "Astra", "Yaris", "Megane", "Polo"]
+CITIES = ["Sofia", "Plovdiv", "Varna", "Burgas", "Ruse"]
+# A frequent make, a rare plate prefix and a make and model pair
+QUERIES = ["toyota", "CA000123", "volks golf"]
+
+
+def generate_cars(count):
+    """ Deterministic cars with unique plates """
+    rng = random.Random(42)
+    for car_id in range(1, count + 1):
+        license_plate = f"{rng.choice(['CA', 'PB', 'CB', 'BT'])}{car_id:07d}"
+        yield car_id, rng.choice(MAKES), rng.choice(MODELS), rng.randint(1995, 2024), license_plate, license_plate
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return round((time.perf_counter() - started) / repeat * 1000, 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cars", type=int, default=1_000_000)
+    parser.add_argument("--garages", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["CAR_MANAGEMENT_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'search.db')}"
+    os.environ["CAR_MANAGEMENT_CACHE_ENABLED"] = "false"
+    sys.path.insert(0, REPO_ROOT)
+
+    from car_management_backend.app.models.init_db import Car, Garage
+    from car_management_backend.app.models.database import SessionLocal, engine
+    from car_management_backend.app.crud_operations import cars as cars_crud
+    from car_management_backend.app.crud_operations import search as search_crud
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO garages (id, name, location, city, capacity, updated_at) "
+            "VALUES (?, ?, ?, ?, 10, CURRENT_TIMESTAMP)",
+            [(garage_id, f"Garage {garage_id}", f"Street {garage_id}", CITIES[garage_id % len(CITIES)])
+             for garage_id in range(1, args.garages + 1)]
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO cars (id, make, model, production_year, license_plate, normalized_plate, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            list(generate_cars(args.cars))
+        )
+
+    db = SessionLocal()
+    started = time.perf_counter()
+    search_crud.rebuild_search_index(db)
+    results = {"cars": args.cars, "limit": args.limit, "index_build_s": round(time.perf_counter() - started, 3),
+               "queries": {}}
+
+    car_columns = [Car.make, Car.model, Car.license_plate]
+    for query in QUERIES:
+        words = search_crud.SEARCH_WORD.findall(query)
+        fts_ms, (cars, _) = timed(lambda: search_crud.search(db, query, limit=args.limit), args.repeat)
+        ilike_ms, ilike_ids = timed(
+            lambda: search_crud.like_search_ids(db, Car, car_columns, words, args.limit), args.repeat)
+        # The same ILIKE without a limit, as the listing of all matches would do
+        ilike_all_ms, ilike_all_ids = timed(
+            lambda: search_crud.like_search_ids(db, Car, car_columns, words, None), max(1, args.repeat // 5))
+        make_filter_ms, (make_cars, _) = timed(
+            lambda: cars_crud.get_cars(db, make=words[0], limit=args.limit), args.repeat)
+        results["queries"][query] = {
+            "fts_ms": fts_ms,
+            "ilike_ms": ilike_ms,
+            "ilike_all_matches_ms": ilike_all_ms,
+            "get_cars_make_ilike_ms": make_filter_ms,
+            "fts_results": len(cars),
+            "ilike_results": len(ilike_ids),
+            "all_matches": len(ilike_all_ids),
+        }
+
+    db.close()
+    engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+""" Benchmark of the column row fast path of the list endpoints against the ORM and response model path
+
+Usage: python -m benchmarks.serialization --rows 50000
+Fills a temporary SQLite database with the fleet of benchmarks/fleet.py, then builds the full listings of
+GET /cars and GET /maintenance both ways: ORM entities mapped to dicts, validated against the
+response model and rendered by JSONResponse as before, and column rows encoded directly as now. Checks
+that both produce the same bytes and prints the timings as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(function, repeat):
+    """ Median duration in milliseconds and the result of the last call """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        durations.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(durations), 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000, help="Cars and maintenance requests")
+    parser.add_argument("--garages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["CAR_MANAGEMENT_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'serialization.db')}"
+    sys.path.insert(0, REPO_ROOT)
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from benchmarks.fleet import generate_fleet
+    from car_management_backend.app import serializers
+    from car_management_backend.app.crud_operations import cars as cars_crud
+    from car_management_backend.app.crud_operations import maintenance_requests as maintenance_crud
+    from car_management_backend.app.main import app
+    from car_management_backend.app.models.database import SessionLocal, engine
+
+    generate_fleet(engine, garages=args.garages, cars=args.rows, requests=args.rows)
+    response_fields = {(route.path, tuple(route.methods)): route.response_field for route in app.routes
+                       if hasattr(route, "response_field")}
+
+    def validated(path, content):
+        """ What FastAPI does with the dicts returned by an endpoint having a response model """
+        field = response_fields[(path, ("GET",))]
+        return JSONResponse(asyncio.run(serialize_response(field=field, response_content=content))).body
+
+    db = SessionLocal()
+    listings = {
+        "cars": (
+            lambda: validated("/cars", [serializers.car_to_dict(car) for car in cars_crud.get_cars(db)[0]]),
+            lambda: serializers.FastJSONResponse(serializers.car_rows_to_dicts(*cars_crud.get_car_rows(db)[:2])).body,
+        ),
+        "maintenance": (
+            lambda: validated("/maintenance", [serializers.maintenance_request_to_dict(request) for request in
+                                               maintenance_crud.get_maintenance_requests(db)[0]]),
+            lambda: serializers.FastJSONResponse(serializers.maintenance_rows_to_dicts(
+                maintenance_crud.get_maintenance_request_rows(db)[0])).body,
+        ),
+    }
+
+    results = {"rows": args.rows, "orjson": serializers.orjson is not None, "listings": {}}
+    for name, (before, after) in listings.items():
+        # A fresh session each time, so that neither path reuses the entities of the identity map
+        db.expunge_all()
+        before_ms, before_body = timed(lambda: (db.expunge_all(), before())[1], args.repeat)
+        after_ms, after_body = timed(after, args.repeat)
+        results["listings"][name] = {
+            "before_ms": before_ms,
+            "after_ms": after_ms,
+            "speedup": round(before_ms / after_ms, 1),
+            "bytes": len(after_body),
+            "identical": before_body == after_body,
+        }
+
+    db.close()
+    engine.dispose()
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if all(listing["identical"] for listing in results["listings"].values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
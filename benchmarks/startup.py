@@ -0,0 +1,106 @@
+""" Benchmark of the cold start: import of the app module, create_app and the first requests
+
+Usage: python -m benchmarks.startup --runs 10 [--max-import-ms 800 --max-first-request-ms 300]
+Each run is a fresh interpreter on a prepared SQLite database, as a new container would be. Prints the
+median timings as JSON and checks that no engine exists before the first request. With the --max-*
+options the exit status is non-zero when a median exceeds its budget, to guard against regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Timed in the fresh interpreter, reports its measures as JSON on stdout
+COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+from car_management_backend.app.main import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+from car_management_backend.app.models import database
+engines_at_startup = bool(database.engines)
+modules_at_startup = len(sys.modules)
+from fastapi.testclient import TestClient
+client = TestClient(app)
+client_ready = time.perf_counter()
+first_status = client.get("/garages?limit=1").status_code
+first = time.perf_counter()
+client.get("/cars?limit=1")
+second = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (first - client_ready) * 1000,
+    "second_request_ms": (second - first) * 1000,
+    "first_status": first_status,
+    "engines_at_startup": engines_at_startup,
+    "modules_at_startup": modules_at_startup,
+}))
+"""
+
+
+def prepare_database(path):
+    """ Create the schema and one garage and car in a separate interpreter, leaving this one clean """
+    script = """
+from sqlalchemy import create_engine
+from car_management_backend.app.models.database import Base
+from car_management_backend.app.models import car, garage, maintenance, occupancy, search, table_version
+engine = create_engine("sqlite:///%s")
+Base.metadata.create_all(bind=engine)
+with engine.begin() as connection:
+    connection.exec_driver_sql("INSERT INTO garages (name, location, city, capacity) VALUES ('G', 'L', 'Sofia', 5)")
+    connection.exec_driver_sql("INSERT INTO cars (make, model, production_year, license_plate, normalized_plate) "
+                               "VALUES ('VW', 'Golf', 2015, 'CA1', 'CA1')")
+""" % path
+    subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-create-app-ms", type=float)
+    parser.add_argument("--max-first-request-ms", type=float)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database_path = os.path.join(workdir, "startup.db")
+        prepare_database(database_path)
+        env = dict(os.environ)
+        env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        env["CAR_MANAGEMENT_DATABASE_URL"] = f"sqlite:///{database_path}"
+
+        runs = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", COLD_START], cwd=workdir, env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            run = json.loads(output)
+            run["process_ms"] = (time.perf_counter() - started) * 1000
+            runs.append(run)
+
+    results = {"runs": args.runs}
+    for name in ("import_ms", "create_app_ms", "first_request_ms", "second_request_ms", "process_ms"):
+        results[name] = round(statistics.median(run[name] for run in runs), 2)
+    results["modules_at_startup"] = runs[-1]["modules_at_startup"]
+    results["engines_at_startup"] = any(run["engines_at_startup"] for run in runs)
+    results["first_request_ok"] = all(run["first_status"] == 200 for run in runs)
+
+    budgets = {"import_ms": args.max_import_ms, "create_app_ms": args.max_create_app_ms,
+               "first_request_ms": args.max_first_request_ms}
+    results["over_budget"] = [name for name, budget in budgets.items()
+                              if budget is not None and results[name] > budget]
+    print(json.dumps(results, indent=2))
+    if results["over_budget"] or results["engines_at_startup"] or not results["first_request_ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
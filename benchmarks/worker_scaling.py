@@ -0,0 +1,106 @@
+""" Benchmark of the read throughput of the multi-process server by number of workers
+
+Usage: python -m benchmarks.worker_scaling --workers 1 2 4 --duration 10
+Generates the fleet of benchmarks/fleet.py into a temporary SQLite database, then for each worker count
+serves it with car_management_backend.app.serve on read-only connections and hits a mix of read endpoints
+from several client processes. Requires uvicorn and httpx. The scaling is bounded by the CPU count, which
+is printed with the results.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import create_engine
+
+from benchmarks.async_vs_sync import run_load, wait_until_ready
+from benchmarks.fleet import generate_fleet
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def client_load(base_url, garages, cars, concurrency, duration):
+    return asyncio.run(run_load(base_url, garages, cars, concurrency, duration))
+
+
+def benchmark_workers(database_path, workers, args):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["CAR_MANAGEMENT_DATABASE_URL"] = f"sqlite:///{database_path}"
+    env["CAR_MANAGEMENT_SQLITE_READ_ONLY_CONNECTIONS"] = "1"
+    # Every request reaches the database, a cache would only measure itself
+    env["CAR_MANAGEMENT_CACHE_ENABLED"] = "false"
+    # Idle job workers polling their queue would only add noise
+    env["CAR_MANAGEMENT_JOB_WORKERS"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "car_management_backend.app.serve", "--workers", str(workers), "--port",
+         str(args.port), "--log-level", "warning"],
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        # The clients run in their own processes, so that they are not the bottleneck of many workers
+        with ProcessPoolExecutor(max_workers=args.clients) as executor:
+            futures = [executor.submit(client_load, base_url, args.garages, args.cars,
+                                       args.concurrency // args.clients, args.duration)
+                       for _ in range(args.clients)]
+            loads = [future.result() for future in futures]
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "requests": sum(load["requests"] for load in loads),
+        "errors": sum(load["errors"] for load in loads),
+        "throughput_rps": round(sum(load["throughput_rps"] for load in loads), 1),
+        "latency_p50_ms": round(sum(load["latency_p50_ms"] for load in loads) / len(loads), 2),
+        "latency_p95_ms": max(load["latency_p95_ms"] for load in loads),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--garages", type=int, default=200)
+    parser.add_argument("--cars", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database_path = os.path.join(workdir, "fleet.db")
+        engine = create_engine(f"sqlite:///{database_path}")
+        generate_fleet(engine, args.garages, args.cars, args.requests)
+        # The read-only connections need the database in WAL mode, which the primary sets on its connections
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        engine.dispose()
+
+        results = {
+            "cpu_count": os.cpu_count(),
+            "dataset": {"garages": args.garages, "cars": args.cars, "maintenance_requests": args.requests},
+            "concurrency": args.concurrency,
+            "workers": {},
+        }
+        baseline = None
+        for workers in args.workers:
+            started = time.perf_counter()
+            result = benchmark_workers(database_path, workers, args)
+            baseline = baseline or result["throughput_rps"]
+            result["speedup"] = round(result["throughput_rps"] / baseline, 2) if baseline else None
+            result["elapsed_s"] = round(time.perf_counter() - started, 1)
+            results["workers"][str(workers)] = result
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
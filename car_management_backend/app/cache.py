@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from car_management_backend.app.config import settings
+
+
+class MemoryCacheBackend:
+    """ In-process LRU cache with a TTL per entry and an index of the entries per tag """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        """ Get (found, value) for a key, and the number of entries evicted on the way """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None, 0
+            expires_at, value, tags = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return False, None, 1
+            self.entries.move_to_end(key)
+            return True, value, 0
+
+    def set(self, key: str, value, tags):
+        """ Store a value under a key and its tags, returning the number of evicted entries """
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+
+            evicted = 0
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                evicted += 1
+            return evicted
+
+    def invalidate(self, tags):
+        """ Remove all entries with any of the tags, returning their number """
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self.tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+
+    def _remove(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisCacheBackend:
+    """ Cache on a Redis compatible server, shared by all workers, with a set of keys per tag """
+
+    def __init__(self, url: str, ttl: int, prefix: str = "car_management:cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis cache backend requires the redis package.")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return False, None, 0
+        return True, json.loads(value), 0
+
+    def set(self, key: str, value, tags):
+        # Entries expire on their own, the server evicts by its own maxmemory policy
+        pipeline = self.client.pipeline()
+        pipeline.set(self.prefix + key, json.dumps(value, default=str), ex=self.ttl)
+        for tag in tags:
+            pipeline.sadd(self.prefix + "tag:" + tag, key)
+            pipeline.expire(self.prefix + "tag:" + tag, self.ttl)
+        pipeline.execute()
+        return 0
+
+    def invalidate(self, tags):
+        tag_keys = [self.prefix + "tag:" + tag for tag in tags]
+        keys = set()
+        for tag_key in tag_keys:
+            keys.update(key.decode() for key in self.client.smembers(tag_key))
+        if keys or tag_keys:
+            self.client.delete(*[self.prefix + key for key in keys], *tag_keys)
+        return len(keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ForwardingCacheBackend:
+    """ Cache of a process serving no reads, which hands the invalidated tags over to the cache of another process """
+
+    def __init__(self, send):
+        self.send = send
+
+    def get(self, key: str):
+        return False, None, 0
+
+    def set(self, key: str, value, tags):
+        return 0
+
+    def invalidate(self, tags):
+        self.send(list(tags))
+        return 0
+
+    def clear(self):
+        pass
+
+
+class ResponseCache:
+    """ Cache of the read endpoint responses, invalidated by tags when the CRUD operations commit """
+
+    def __init__(self, backend, enabled: bool = True):
+        self.configure(backend, enabled)
+
+    def configure(self, backend, enabled: bool = True):
+        """ Start over with another backend and empty statistics """
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(endpoint: str, **params):
+        """ Build the key of an endpoint call from its normalized query parameters """
+        normalized = sorted((name, value) for name, value in params.items() if value is not None)
+        return f"{endpoint}?{urlencode(normalized, doseq=True)}"
+
+    def get(self, key: str):
+        """ Get (found, value) for a key """
+        if not self.enabled:
+            return False, None
+        found, value, evicted = self.backend.get(key)
+        self.evictions += evicted
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found, value
+
+    def set(self, key: str, value, tags):
+        """ Store a JSON compatible value with the tags it should be invalidated by """
+        if self.enabled:
+            self.evictions += self.backend.set(key, value, list(tags))
+
+    def invalidate(self, *tags):
+        """ Drop every entry with any of the tags """
+        if self.enabled and tags:
+            self.invalidations += self.backend.invalidate(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def build_backend():
+    """ Build the cache backend selected in the settings """
+    if settings.cache_backend == "redis":
+        return RedisCacheBackend(settings.cache_url, settings.cache_ttl_seconds)
+    return MemoryCacheBackend(settings.cache_max_entries, settings.cache_ttl_seconds)
+
+
+# Set up from the settings by create_app, disabled until then
+response_cache = ResponseCache(None, enabled=False)
+
+
+def invalidate_on_commit(db: Session, *tags):
+    """ Invalidate the cache entries with the tags once the session's transaction commits """
+    db.info.setdefault("cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed_tags(session):
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        response_cache.invalidate(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_rolled_back_tags(session):
+    session.info.pop("cache_tags", None)
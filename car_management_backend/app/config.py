@@ -0,0 +1,88 @@
+from typing import Optional
+from pydantic import BaseSettings, validator
+
+# Values of PRAGMA synchronous, which is set on every connection from the settings as is
+SQLITE_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class Settings(BaseSettings):
+    """ Application settings, read from CAR_MANAGEMENT_* environment variables """
+    # Database connection and pooling
+    database_url: str = "sqlite:///car_management.db"
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_recycle: int = 1800
+    database_pool_pre_ping: bool = True
+
+    # SQLite connection PRAGMAs
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    # Attempts again of a booking whose transaction found the database locked, before answering 503
+    booking_lock_retries: int = 3
+
+    # Serve the routers from an async engine instead of the threadpool bound sync one,
+    # by default on the async driver of the database URL (aiosqlite, asyncpg)
+    database_async: bool = False
+    async_database_url: Optional[str] = None
+
+    # Read replica of the primary database: the sessions read from it until they write. On SQLite the
+    # replica can simply be read-only connections to the same file, which no writer ever blocks in WAL mode
+    read_database_url: Optional[str] = None
+    sqlite_read_only_connections: bool = False
+
+    # Response cache of the read heavy endpoints, "memory" (per process) or "redis" (shared by the workers)
+    cache_enabled: bool = True
+    cache_backend: str = "memory"
+    cache_url: str = "redis://localhost:6379/0"
+    cache_max_entries: int = 10000
+    cache_ttl_seconds: int = 60
+
+    # Keyset pagination of the list endpoints
+    default_page_limit: int = 100
+    max_page_limit: int = 1000
+    # Rows fetched per round trip by the streaming exports
+    export_batch_size: int = 1000
+    # Largest payload accepted by the bulk endpoints
+    max_bulk_items: int = 10000
+    # Per request SQL and serialization timings in Server-Timing headers and /metrics, off by default
+    instrumentation_enabled: bool = False
+    # Share of the requests run under cProfile when instrumented, the ones slower than the threshold are dumped
+    profile_sample_rate: float = 0.0
+    profile_threshold_ms: float = 500
+    profile_dir: str = "profiles"
+    # Occurrences of the maintenance schedules a single read may expand, bounding their cost per date window
+    schedule_max_occurrences: int = 100000
+    # Days ahead whose occurrences of a created or moved schedule are checked against the capacity of its garage
+    schedule_capacity_check_days: int = 365
+    # Matches of a search ranked by relevance, bounding the bm25 work of very frequent words
+    search_ranked_matches: int = 5000
+    # Processes running the background report and import jobs, per server process, 0 leaves the queue to others
+    job_workers: int = 2
+    # Delay between two looks at the job queue by an idle worker, and at the cancelled jobs by the supervisor
+    job_poll_interval_seconds: float = 0.5
+    # Largest payload accepted by the import jobs, run in batches of max_bulk_items
+    job_max_import_items: int = 1000000
+
+    @validator("sqlite_synchronous")
+    def check_sqlite_synchronous(cls, value):
+        if value.upper() not in SQLITE_SYNCHRONOUS_MODES:
+            raise ValueError(f"should be one of {', '.join(SQLITE_SYNCHRONOUS_MODES)}")
+        return value.upper()
+
+    class Config:
+        env_prefix = "CAR_MANAGEMENT_"
+
+
+settings = Settings()
+
+
+def configure(new_settings: Settings):
+    """ Replace the values of the shared settings, read by the modules when they need them
+
+    Called once per process, before the app or a job worker is built: whatever was built from the previous values
+    is not rebuilt.
+    """
+    for name in Settings.__fields__:
+        setattr(settings, name, getattr(new_settings, name))
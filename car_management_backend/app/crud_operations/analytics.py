@@ -0,0 +1,247 @@
+from datetime import datetime, timedelta
+from typing import List
+from fastapi import HTTPException
+from sqlalchemy import Integer, cast, extract, func
+from sqlalchemy.orm import Session
+from car_management_backend.app.crud_operations.maintenance_requests import parse_date
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy
+from car_management_backend.app.models.service_count import MonthlyServiceCount
+
+# The aggregations are vectorized with NumPy when installed, pure Python gives the same results otherwise
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WEEKDAYS = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+# Rates are rounded half up to this many decimals with integer arithmetic, the same in both implementations
+RATE_SCALE = 10000
+
+
+def get_garage_utilization(db: Session, start_date: str, end_date: str, garage_ids: List[int] = None,
+                           city: str = None):
+    """ Booked share of the capacity of each garage per week, for the given garages, a city or the whole fleet """
+    first_day, last_day = parse_window(start_date, end_date)
+    # Weeks start on Monday, the first and last ones only count their days in the window
+    first_monday = first_day - timedelta(days=first_day.weekday())
+    week_count = (last_day - first_monday).days // 7 + 1
+    weeks = [first_monday + timedelta(weeks=week) for week in range(week_count)]
+    week_days = [(min(week + timedelta(days=6), last_day) - max(week, first_day)).days + 1 for week in weeks]
+
+    garages_query = db.query(Garage.id, Garage.capacity)
+    if garage_ids:
+        garages_query = garages_query.filter(Garage.id.in_(garage_ids))
+    if city:
+        garages_query = garages_query.filter(Garage.city.ilike(city))
+    garages = garages_query.order_by(Garage.id).all()
+    fleet_garage_ids = [garage.id for garage in garages]
+
+    # One query summing the daily occupancy to the garage and week grain
+    week = week_index(db, GarageDailyOccupancy.date, first_monday)
+    query = (
+        db.query(GarageDailyOccupancy.garage_id, week, func.sum(GarageDailyOccupancy.request_count))
+            .filter(GarageDailyOccupancy.date.between(first_day, last_day))
+            .group_by(GarageDailyOccupancy.garage_id, week)
+    )
+    if garage_ids or city:
+        query = query.filter(GarageDailyOccupancy.garage_id.in_(fleet_garage_ids))
+    row_garage_ids, row_weeks, counts = columns(query.all(), 3)
+
+    requests = scatter((len(garages), week_count), codes_of(fleet_garage_ids, row_garage_ids), row_weeks, counts)
+    return {
+        "startDate": first_day,
+        "endDate": last_day,
+        "weeks": weeks,
+        "garageIds": fleet_garage_ids,
+        "requests": to_lists(requests),
+        "utilization": rates(requests, [garage.capacity for garage in garages], week_days)
+    }
+
+
+def get_service_mix(db: Session, start_month: str, end_month: str, year_band: int = 5):
+    """ Maintenance requests per service type for each car make and production year band over a range of months """
+    first_month, last_month = parse_month_window(start_month, end_month)
+    if year_band <= 0:
+        raise HTTPException(status_code=400, detail=f"Year band should be a positive number: {year_band}.")
+
+    # One query on the maintained monthly counts, at most the makes x production years x service types rows,
+    # without the counts left at zero once their requests are moved or deleted
+    rows = (
+        db.query(MonthlyServiceCount.make, MonthlyServiceCount.production_year, MonthlyServiceCount.service_type,
+                 func.sum(MonthlyServiceCount.request_count))
+            .filter(MonthlyServiceCount.month.between(first_month, last_month))
+            .group_by(MonthlyServiceCount.make, MonthlyServiceCount.production_year,
+                      MonthlyServiceCount.service_type)
+            .having(func.sum(MonthlyServiceCount.request_count) > 0)
+            .all()
+    )
+    makes, production_years, service_types, counts = columns(rows, 4)
+    bands = year_bands(production_years, year_band)
+
+    # Groups ordered by make then band, from the codes of both
+    make_values, make_codes = factorize(makes)
+    band_values, band_codes = factorize(bands)
+    group_keys, group_codes = factorize(combine_codes(make_codes, band_codes, len(band_values)))
+    service_type_values, service_type_codes = factorize(service_types)
+
+    counts = scatter((len(group_keys), len(service_type_values)), group_codes, service_type_codes, counts)
+    group_totals = row_totals(counts)
+    return {
+        "startMonth": first_month,
+        "endMonth": last_month,
+        "makes": [make_values[key // len(band_values)] for key in group_keys],
+        "yearBands": [band_values[key % len(band_values)] for key in group_keys],
+        "serviceTypes": service_type_values,
+        "counts": to_lists(counts),
+        "shares": rates(counts, group_totals, [1] * len(service_type_values))
+    }
+
+
+def get_city_load_heatmap(db: Session, start_date: str, end_date: str):
+    """ Booked share of the capacity of the garages of each city per weekday """
+    first_day, last_day = parse_window(start_date, end_date)
+    # Number of each weekday in the window, the weekdays of the last partial week once more
+    day_count = (last_day - first_day).days + 1
+    weekday_days = [day_count // 7 + ((weekday - first_day.weekday()) % 7 < day_count % 7) for weekday in range(7)]
+
+    cities = db.query(Garage.city, func.sum(Garage.capacity)).group_by(Garage.city).order_by(Garage.city).all()
+    city_names = [city for city, _ in cities]
+
+    # One query summing the daily occupancy to the city and weekday grain
+    weekday = weekday_of(db, GarageDailyOccupancy.date)
+    rows = (
+        db.query(Garage.city, weekday, func.sum(GarageDailyOccupancy.request_count))
+            .join(Garage, Garage.id == GarageDailyOccupancy.garage_id)
+            .filter(GarageDailyOccupancy.date.between(first_day, last_day))
+            .group_by(Garage.city, weekday)
+            .all()
+    )
+    row_cities, row_weekdays, counts = columns(rows, 3)
+
+    requests = scatter((len(cities), 7), codes_of(city_names, row_cities), row_weekdays, counts)
+    return {
+        "startDate": first_day,
+        "endDate": last_day,
+        "cities": city_names,
+        "weekdays": WEEKDAYS,
+        "requests": to_lists(requests),
+        "load": rates(requests, [capacity for _, capacity in cities], weekday_days)
+    }
+
+
+def parse_window(start_date: str, end_date: str):
+    """ Parse the YYYY-MM-DD bounds of an analytics window """
+    first_day, last_day = parse_date(start_date), parse_date(end_date)
+    if first_day > last_day:
+        raise HTTPException(status_code=400, detail="Start date cannot be after the end date.")
+    return first_day, last_day
+
+
+def parse_month_window(start_month: str, end_month: str):
+    """ Check the YYYY-MM bounds of an analytics window of months, which compare as strings """
+    for month in (start_month, end_month):
+        try:
+            datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid month: {month}.")
+    if start_month > end_month:
+        raise HTTPException(status_code=400, detail="Start month cannot be after the end month.")
+    return start_month, end_month
+
+
+def week_index(db: Session, column, first_monday):
+    """ SQL expression of the number of whole weeks between a first Monday and a date column """
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(column - first_monday, Integer) // 7
+    return cast((func.julianday(column) - func.julianday(first_monday)) / 7, Integer)
+
+
+def weekday_of(db: Session, column):
+    """ SQL expression of the weekday of a date column, 0 being Monday """
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(extract("isodow", column), Integer) - 1
+    return (cast(func.strftime("%w", column), Integer) + 6) % 7
+
+
+def columns(rows, count: int):
+    """ Split query rows into one list per column """
+    if not rows:
+        return [[] for _ in range(count)]
+    return [list(column) for column in zip(*rows)]
+
+
+def codes_of(keys: list, values: list):
+    """ Position of each value in the sorted list of keys """
+    if np is not None:
+        return np.searchsorted(np.asarray(keys), np.asarray(values)) if values else np.zeros(0, dtype=np.intp)
+    positions = {key: index for index, key in enumerate(keys)}
+    return [positions[value] for value in values]
+
+
+def factorize(values: list):
+    """ Sorted distinct values and the position of each value among them """
+    if np is not None:
+        if not values:
+            return [], np.zeros(0, dtype=np.intp)
+        distinct, codes = np.unique(np.asarray(values), return_inverse=True)
+        return distinct.tolist(), codes
+    distinct = sorted(set(values))
+    return distinct, codes_of(distinct, values)
+
+
+def year_bands(years: list, year_band: int):
+    """ First year of the band of each year """
+    if np is not None:
+        return (np.asarray(years, dtype=np.int64) // year_band * year_band).tolist()
+    return [year // year_band * year_band for year in years]
+
+
+def combine_codes(major_codes, minor_codes, minor_count: int):
+    """ Single code of each pair of codes, ordered by the major then the minor one """
+    if np is not None:
+        return (np.asarray(major_codes, dtype=np.int64) * minor_count + minor_codes).tolist()
+    return [major * minor_count + minor for major, minor in zip(major_codes, minor_codes)]
+
+
+def scatter(shape, row_codes, column_codes, values):
+    """ Dense matrix of the values summed at their row and column codes """
+    if np is not None:
+        matrix = np.zeros(shape, dtype=np.int64)
+        if len(values):
+            np.add.at(matrix, (np.asarray(row_codes, dtype=np.intp), np.asarray(column_codes, dtype=np.intp)),
+                      np.asarray(values, dtype=np.int64))
+        return matrix
+    matrix = [[0] * shape[1] for _ in range(shape[0])]
+    for row, column, value in zip(row_codes, column_codes, values):
+        matrix[row][column] += value
+    return matrix
+
+
+def row_totals(matrix):
+    """ Sum of each row of a matrix """
+    if np is not None:
+        return matrix.sum(axis=1).tolist()
+    return [sum(row) for row in matrix]
+
+
+def rates(matrix, row_factors: list, column_factors: list):
+    """ Each value over the product of its row and column factors, None where that product is 0 """
+    if np is not None:
+        denominators = np.outer(np.asarray(row_factors, dtype=np.int64), np.asarray(column_factors, dtype=np.int64))
+        # Half up rounding of value / denominator as (2 * scale * value + denominator) // (2 * denominator)
+        scaled = (2 * RATE_SCALE * matrix + denominators) // np.maximum(2 * denominators, 1)
+        values = (scaled / RATE_SCALE).tolist()
+        for row, column in np.argwhere(denominators == 0).tolist():
+            values[row][column] = None
+        return values
+    return [
+        [(2 * RATE_SCALE * value + row_factor * column_factor) // (2 * row_factor * column_factor) / RATE_SCALE
+         if row_factor * column_factor else None for value, column_factor in zip(row, column_factors)]
+        for row, row_factor in zip(matrix, row_factors)
+    ]
+
+
+def to_lists(matrix):
+    """ Plain nested lists of a matrix, for the JSON encoding """
+    return matrix.tolist() if np is not None else matrix
@@ -1,10 +1,26 @@
 from datetime import datetime
+from typing import List
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from car_management_backend.app.config import settings
+from car_management_backend.app.cache import invalidate_on_commit
+from car_management_backend.app.crud_operations.occupancy import release_occupancy
+from car_management_backend.app.crud_operations.pagination import paginate
+from car_management_backend.app.crud_operations.schedules import delete_schedules
+from car_management_backend.app.crud_operations.search import index_cars, unindex_cars
+from car_management_backend.app.crud_operations.service_counts import add_service_counts, release_service_counts
+from car_management_backend.app.crud_operations.versions import bump_versions
 from car_management_backend.app.models.car import Car
+from car_management_backend.app.models.car_garage import car_garage
 from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.maintenance_schedule import MaintenanceSchedule
 from car_management_backend.app.schemas.car import CarCreate, CarUpdate
 
+# Cars whose garages are read per SELECT by get_car_rows
+GARAGE_LOAD_CHUNK_SIZE = 500
+
 
 def create_car(db: Session, car: CarCreate):
     """ Add a new car to the DB """
@@ -16,12 +32,16 @@ def create_car(db: Session, car: CarCreate):
             detail=f"Invalid production year: {car.productionYear}."
         )
 
+    normalized_plate = normalize_plate(car.licensePlate)
+    check_plate_available(db, normalized_plate, car.licensePlate)
+
     # Create car in the DB
     db_car = Car(
         make=car.make,
         model=car.model,
         production_year=car.productionYear,
-        license_plate=car.licensePlate
+        license_plate=car.licensePlate,
+        normalized_plate=normalized_plate
     )
 
     # Retrieve the Garage objects using the provided IDs and set them for the car
@@ -32,19 +52,175 @@ def create_car(db: Session, car: CarCreate):
         db_car.garages = garages
 
     db.add(db_car)
+    # Flush to get the ID the search index refers to
+    flush_plates(db, car.licensePlate)
+    index_cars(db, [db_car])
+    bump_versions(db, "cars")
     db.commit()
-    db.refresh(db_car)
-    return db_car
+    # Reload the car together with its garages, which the caller reads after the session call has returned
+    return get_car(db, db_car.id)
+
+
+def create_cars(db: Session, cars: List[CarCreate]):
+    """ Add many cars to the DB in a single transaction, reporting the invalid ones per item """
+    if len(cars) > settings.max_bulk_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(cars)}, the maximum is {settings.max_bulk_items}."
+        )
+
+    # Resolve all referenced garages with one query
+    garage_ids = {garage_id for car in cars for garage_id in car.garageIds}
+    existing_garage_ids = set()
+    if garage_ids:
+        existing_garage_ids = {row.id for row in db.query(Garage.id).filter(Garage.id.in_(garage_ids))}
+
+    # Resolve the plates already registered with one query too
+    normalized_plates = [normalize_plate(car.licensePlate) for car in cars]
+    taken_plates = {
+        row.normalized_plate
+        for row in db.query(Car.normalized_plate).filter(Car.normalized_plate.in_(set(normalized_plates)))
+    } if normalized_plates else set()
+
+    current_year = datetime.now().year
+    valid_cars = []
+    errors = []
+    for index, (car, normalized_plate) in enumerate(zip(cars, normalized_plates)):
+        if car.productionYear > current_year:
+            errors.append({"index": index, "detail": f"Invalid production year: {car.productionYear}."})
+            continue
+        invalid_garage_ids = [garage_id for garage_id in car.garageIds if garage_id not in existing_garage_ids]
+        if invalid_garage_ids:
+            errors.append({"index": index, "detail": f"Invalid garage IDs: {invalid_garage_ids}."})
+            continue
+        # Also rejects the later duplicates of a plate within the payload
+        if normalized_plate in taken_plates:
+            errors.append({"index": index, "detail": plate_taken_detail(car.licensePlate)})
+            continue
+        taken_plates.add(normalized_plate)
+        valid_cars.append((car, normalized_plate))
+
+    db_cars = [
+        Car(
+            make=car.make,
+            model=car.model,
+            production_year=car.productionYear,
+            license_plate=car.licensePlate,
+            normalized_plate=normalized_plate
+        )
+        for car, normalized_plate in valid_cars
+    ]
+
+    # Insert the cars to get their IDs, then all garage links with one executemany
+    db.add_all(db_cars)
+    flush_plates(db)
+    links = [
+        {"car_id": db_car.id, "garage_id": garage_id}
+        for db_car, (car, _) in zip(db_cars, valid_cars)
+        for garage_id in set(car.garageIds)
+    ]
+    if links:
+        db.execute(car_garage.insert(), links)
+    if db_cars:
+        index_cars(db, db_cars)
+        bump_versions(db, "cars")
+    created_ids = [db_car.id for db_car in db_cars]
+    db.commit()
+
+    return {"created": created_ids, "errors": errors}
 
 
 def get_car(db: Session, car_id: int):
     """ Get a car from the DB via its ID """
-    return db.query(Car).filter(Car.id == car_id).first()
+    return db.query(Car).options(selectinload(Car.garages)).filter(Car.id == car_id).first()
+
+
+def get_car_by_plate(db: Session, plate: str):
+    """ Get a car from the DB via its license plate, however it is cased or spaced """
+    return db.query(Car).options(selectinload(Car.garages)) \
+        .filter(Car.normalized_plate == normalize_plate(plate)).first()
+
+
+def get_cars_by_plates(db: Session, plates: List[str]):
+    """ Get the cars of many license plates, in the order of the plates and None for the unknown ones """
+    if len(plates) > settings.max_bulk_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(plates)}, the maximum is {settings.max_bulk_items}."
+        )
+
+    normalized_plates = [normalize_plate(plate) for plate in plates]
+    cars = find_cars_by_plates(db, normalized_plates)
+    return [cars.get(normalized_plate) for normalized_plate in normalized_plates]
+
 
+def find_cars_by_plates(db: Session, normalized_plates: List[str]):
+    """ Map the registered normalized plates to their cars with one query """
+    if not normalized_plates:
+        return {}
+    cars = db.query(Car).options(selectinload(Car.garages)).filter(Car.normalized_plate.in_(set(normalized_plates)))
+    return {car.normalized_plate: car for car in cars}
 
-def get_cars(db: Session, make: str = None, garage_id: int = None, from_year: int = None, to_year: int = None):
-    """ Get all cars from the DB with filter options """
-    query = db.query(Car)
+
+def normalize_plate(plate: str):
+    """ Fold the case and the whitespace of a license plate """
+    return "".join(plate.split()).upper()
+
+
+def check_plate_available(db: Session, normalized_plate: str, plate: str):
+    """ Reject a license plate already registered for another car """
+    if db.query(Car.id).filter(Car.normalized_plate == normalized_plate).first():
+        raise HTTPException(status_code=409, detail=plate_taken_detail(plate))
+
+
+def plate_taken_detail(plate: str):
+    """ Error message of a duplicated license plate """
+    return f"License plate already registered: {plate}."
+
+
+def flush_plates(db: Session, plate: str = None):
+    """ Flush the pending cars, turning a plate registered concurrently since it was checked into a 409 """
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=plate_taken_detail(plate) if plate else
+                            "License plate registered concurrently, please retry.")
+
+
+def get_cars(db: Session, make: str = None, garage_id: int = None, from_year: int = None, to_year: int = None,
+             cursor: str = None, limit: int = None):
+    """ Get a page of cars from the DB with filter options and the cursor of the next page """
+    # Load the garages of all matched cars with one extra SELECT instead of one per car
+    query = filter_cars(db.query(Car).options(selectinload(Car.garages)), make=make, garage_id=garage_id,
+                        from_year=from_year, to_year=to_year)
+    return paginate(query, Car.id, cursor=cursor, limit=limit)
+
+
+def get_car_rows(db: Session, make: str = None, garage_id: int = None, from_year: int = None, to_year: int = None,
+                 cursor: str = None, limit: int = None):
+    """ Same page as get_cars, as plain column rows and the garage rows of each car, without building entities """
+    query = db.query(Car.id, Car.make, Car.model, Car.production_year, Car.license_plate)
+    query = filter_cars(query, make=make, garage_id=garage_id, from_year=from_year, to_year=to_year)
+    rows, next_cursor = paginate(query, Car.id, cursor=cursor, limit=limit)
+
+    garages = {row.id: [] for row in rows}
+    car_ids = list(garages)
+    # In chunks like the selectin loading, the whole listing can exceed the bound parameters limit
+    for start in range(0, len(car_ids), GARAGE_LOAD_CHUNK_SIZE):
+        garage_rows = (
+            db.query(car_garage.c.car_id, Garage.id, Garage.name, Garage.location, Garage.city, Garage.capacity)
+                .join(Garage, Garage.id == car_garage.c.garage_id)
+                .filter(car_garage.c.car_id.in_(car_ids[start:start + GARAGE_LOAD_CHUNK_SIZE]))
+                .order_by(car_garage.c.car_id, Garage.id)
+        )
+        for car_id, *garage in garage_rows:
+            garages[car_id].append(garage)
+    return rows, garages, next_cursor
+
+
+def filter_cars(query, make: str = None, garage_id: int = None, from_year: int = None, to_year: int = None):
+    """ Apply the car filter options to a query """
     if make:
         query = query.filter(Car.make.ilike(f"%{make}%"))
     if garage_id:
@@ -53,13 +229,17 @@ def get_cars(db: Session, make: str = None, garage_id: int = None, from_year: in
         query = query.filter(Car.production_year >= from_year)
     if to_year:
         query = query.filter(Car.production_year <= to_year)
-    return query.all()
+    return query
 
 
 def update_car(db: Session, car_id: int, car: CarUpdate):
     """ Update info about a car in the DB """
     db_car = db.query(Car).filter(Car.id == car_id).first()
     if db_car:
+        # The requests of the car are counted per make and production year, so they are counted again after
+        recount_requests = bool(car.make or car.productionYear)
+        if recount_requests:
+            release_service_counts(db, MaintenanceRequest.car_id == car_id)
         if car.make:
             db_car.make = car.make
         if car.model:
@@ -74,7 +254,11 @@ def update_car(db: Session, car_id: int, car: CarUpdate):
                 )
             db_car.production_year = car.productionYear
         if car.licensePlate:
+            normalized_plate = normalize_plate(car.licensePlate)
+            if normalized_plate != db_car.normalized_plate:
+                check_plate_available(db, normalized_plate, car.licensePlate)
             db_car.license_plate = car.licensePlate
+            db_car.normalized_plate = normalized_plate
 
         # If the garages have been updated we will receive a list with garage IDs
         # If the user didn't change the garages we should receive a list with garage objects
@@ -86,9 +270,17 @@ def update_car(db: Session, car_id: int, car: CarUpdate):
             garages = db.query(Garage).filter(Garage.id.in_(garage_ids)).all()
             db_car.garages = garages
 
+        # The garage links are not columns of the car, so it is touched explicitly for its ETag
+        db_car.updated_at = datetime.utcnow()
+        if recount_requests:
+            db.flush()
+            add_service_counts(db, MaintenanceRequest.car_id == car_id)
+        index_cars(db, [db_car])
+        bump_versions(db, "cars")
+        invalidate_on_commit(db, f"car:{car_id}")
+        flush_plates(db, car.licensePlate)
         db.commit()
-        db.refresh(db_car)
-        return db_car
+        return get_car(db, car_id)
     return None
 
 
@@ -96,7 +288,45 @@ def delete_car(db: Session, car_id: int):
     """ Delete a car from the DB """
     db_car = db.query(Car).filter(Car.id == car_id).first()
     if db_car:
+        # The maintenance requests of the car are deleted with it by the cascade, its schedules explicitly
+        release_occupancy(db, MaintenanceRequest.car_id == car_id)
+        release_service_counts(db, MaintenanceRequest.car_id == car_id)
+        delete_schedules(db, MaintenanceSchedule.car_id == car_id)
         db.delete(db_car)
+        unindex_cars(db, [car_id])
+        bump_versions(db, "cars", "maintenance_requests")
+        invalidate_on_commit(db, f"car:{car_id}")
         db.commit()
         return db_car
     return None
+
+
+def delete_cars(db: Session, car_ids: List[int]):
+    """ Delete many cars and their maintenance requests from the DB in a single transaction """
+    if len(car_ids) > settings.max_bulk_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(car_ids)}, the maximum is {settings.max_bulk_items}."
+        )
+
+    existing_ids = {row.id for row in db.query(Car.id).filter(Car.id.in_(car_ids))} if car_ids else set()
+    errors = [
+        {"index": index, "detail": f"Car not found: {car_id}."}
+        for index, car_id in enumerate(car_ids) if car_id not in existing_ids
+    ]
+
+    # Set-based deletes of everything depending on the cars, as the ORM cascade would do row by row
+    if existing_ids:
+        release_occupancy(db, MaintenanceRequest.car_id.in_(existing_ids))
+        release_service_counts(db, MaintenanceRequest.car_id.in_(existing_ids))
+        delete_schedules(db, MaintenanceSchedule.car_id.in_(existing_ids))
+        db.query(MaintenanceRequest).filter(MaintenanceRequest.car_id.in_(existing_ids)) \
+            .delete(synchronize_session=False)
+        db.execute(car_garage.delete().where(car_garage.c.car_id.in_(existing_ids)))
+        db.query(Car).filter(Car.id.in_(existing_ids)).delete(synchronize_session=False)
+        unindex_cars(db, existing_ids)
+        bump_versions(db, "cars", "maintenance_requests")
+        invalidate_on_commit(db, *(f"car:{car_id}" for car_id in existing_ids))
+    db.commit()
+
+    return {"deleted": sorted(existing_ids), "errors": errors}
@@ -0,0 +1,11 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from car_management_backend.app.instrumentation import profiled
+
+
+async def run_crud(db, crud_function, **kwargs):
+    """ Await a CRUD function on either a sync or an async DB session """
+    if isinstance(db, AsyncSession):
+        # The CRUD code runs on the async connection through greenlets, without holding a worker thread
+        return await db.run_sync(lambda session: crud_function(db=session, **kwargs))
+    return await run_in_threadpool(profiled(crud_function), db=db, **kwargs)
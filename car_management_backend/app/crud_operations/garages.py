@@ -1,6 +1,15 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from car_management_backend.app.cache import invalidate_on_commit
+from car_management_backend.app.crud_operations.pagination import paginate
+from car_management_backend.app.crud_operations.schedules import delete_schedules
+from car_management_backend.app.crud_operations.search import index_garages, unindex_garages
+from car_management_backend.app.crud_operations.service_counts import release_service_counts
+from car_management_backend.app.crud_operations.versions import bump_versions
 from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.maintenance_schedule import MaintenanceSchedule
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy
 from car_management_backend.app.schemas.garage import GarageCreate, GarageUpdate
 
 
@@ -16,6 +25,10 @@ def create_garage(db: Session, garage: GarageCreate):
     # Add the new garage to the DB
     db_garage = Garage(**garage.dict())
     db.add(db_garage)
+    db.flush()
+    index_garages(db, [db_garage])
+    bump_versions(db, "garages")
+    invalidate_on_commit(db, "garages")
     db.commit()
     db.refresh(db_garage)
     return db_garage
@@ -26,12 +39,12 @@ def get_garage(db: Session, garage_id: int):
     return db.query(Garage).filter(Garage.id == garage_id).first()
 
 
-def get_garages(db: Session, city: str = None):
-    """ Get all garages from the DB with filter options """
+def get_garages(db: Session, city: str = None, cursor: str = None, limit: int = None):
+    """ Get a page of garages from the DB with filter options and the cursor of the next page """
     query = db.query(Garage)
     if city:
         query = query.filter(Garage.city.ilike(f"%{city}%"))
-    return query.all()
+    return paginate(query, Garage.id, cursor=cursor, limit=limit)
 
 
 def update_garage(db: Session, garage_id: int, garage: GarageUpdate):
@@ -47,6 +60,10 @@ def update_garage(db: Session, garage_id: int, garage: GarageUpdate):
     if db_garage:
         for key, value in garage.dict(exclude_unset=True).items():
             setattr(db_garage, key, value)
+        index_garages(db, [db_garage])
+        bump_versions(db, "garages")
+        # Also evicts the cars linked to the garage and its reports
+        invalidate_on_commit(db, "garages", f"garage:{garage_id}")
         db.commit()
         db.refresh(db_garage)
         return db_garage
@@ -54,10 +71,21 @@ def update_garage(db: Session, garage_id: int, garage: GarageUpdate):
 
 
 def delete_garage(db: Session, garage_id: int):
-    """ Delete a garage from the DB """
+    """ Delete a garage and its maintenance requests from the DB """
     db_garage = db.query(Garage).filter(Garage.id == garage_id).first()
     if db_garage:
+        # The maintenance requests of the garage would be left without a garage name, they go with it like the
+        # requests of a deleted car. Its occupancy rows are deleted as a whole, its service counts released
+        release_service_counts(db, MaintenanceRequest.garage_id == garage_id)
+        delete_schedules(db, MaintenanceSchedule.garage_id == garage_id)
+        db.query(MaintenanceRequest).filter(MaintenanceRequest.garage_id == garage_id) \
+            .delete(synchronize_session=False)
+        db.query(GarageDailyOccupancy).filter(GarageDailyOccupancy.garage_id == garage_id) \
+            .delete(synchronize_session=False)
         db.delete(db_garage)
+        unindex_garages(db, [garage_id])
+        bump_versions(db, "garages", "maintenance_requests")
+        invalidate_on_commit(db, "garages", f"garage:{garage_id}", f"reports:garage:{garage_id}")
         db.commit()
         return db_garage
     return None
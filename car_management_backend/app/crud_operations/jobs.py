@@ -0,0 +1,128 @@
+import json
+from datetime import datetime
+from typing import List
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, defer
+from car_management_backend.app.crud_operations.pagination import paginate
+from car_management_backend.app.models.job import FINISHED_JOB_STATUSES, JOB_STATUSES, Job
+
+
+def create_job(db: Session, kind: str, arguments: dict):
+    """ Queue a job running a CRUD function with the given JSON compatible keyword arguments """
+    db_job = Job(kind=kind, arguments=json.dumps(arguments), status="QUEUED", progress=0.0, cancel_requested=False,
+                 created_at=datetime.utcnow())
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job(db: Session, job_id: int):
+    """ Get a job from the DB via its ID """
+    return db.query(Job).filter(Job.id == job_id).first()
+
+
+def get_jobs(db: Session, status: str = None, kind: str = None, cursor: str = None, limit: int = None):
+    """ Get a page of jobs from the DB with filter options and the cursor of the next page """
+    # The result of every job would be loaded for nothing
+    query = db.query(Job).options(defer(Job.result))
+    if status:
+        if status.upper() not in JOB_STATUSES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid status: {status}, it should be one of {', '.join(JOB_STATUSES)}."
+            )
+        query = query.filter(Job.status == status.upper())
+    if kind:
+        query = query.filter(Job.kind == kind)
+    return paginate(query, Job.id, cursor=cursor, limit=limit)
+
+
+def get_job_result(db: Session, job_id: int):
+    """ Get the JSON result of a job, also the partial one of an import stopped halfway """
+    job = db.query(Job.status, Job.result).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.result is None:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}, it has no result.")
+    return job.result
+
+
+def cancel_job(db: Session, job_id: int):
+    """ Cancel a queued job at once, a running one is stopped by the supervisor of its worker """
+    # Conditional updates, a worker may claim the job or finish it in the meantime
+    cancelled = db.query(Job).filter(Job.id == job_id, Job.status == "QUEUED") \
+        .update({Job.status: "CANCELLED", Job.cancel_requested: True, Job.finished_at: datetime.utcnow()},
+                synchronize_session=False)
+    if not cancelled:
+        db.query(Job).filter(Job.id == job_id, Job.status == "RUNNING") \
+            .update({Job.cancel_requested: True}, synchronize_session=False)
+    db.commit()
+
+    db_job = get_job(db, job_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if db_job.status in FINISHED_JOB_STATUSES and not db_job.cancel_requested:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already {db_job.status}.")
+    return db_job
+
+
+def claim_job(db: Session, worker_pid: int):
+    """ Take the oldest queued job for a worker process, as (id, kind, arguments), or None when there is none """
+    while True:
+        job = db.query(Job.id, Job.kind, Job.arguments).filter(Job.status == "QUEUED").order_by(Job.id).first()
+        if not job:
+            db.rollback()
+            return None
+        # Another worker may have claimed it since, then the next queued job is tried
+        claimed = db.query(Job).filter(Job.id == job.id, Job.status == "QUEUED") \
+            .update({Job.status: "RUNNING", Job.worker_pid: worker_pid, Job.started_at: datetime.utcnow()},
+                    synchronize_session=False)
+        db.commit()
+        if claimed:
+            return job.id, job.kind, json.loads(job.arguments)
+
+
+def update_job_progress(db: Session, job_id: int, progress: float, result: str = None):
+    """ Record the progress of a running job and its partial result """
+    db.query(Job).filter(Job.id == job_id, Job.status == "RUNNING") \
+        .update({Job.progress: progress, Job.result: result}, synchronize_session=False)
+    db.commit()
+
+
+def finish_job(db: Session, job_id: int, status: str, result: str = None, error: str = None):
+    """ Record the end of a running job, unless it was stopped in the meantime """
+    values = {Job.status: status, Job.finished_at: datetime.utcnow(), Job.error: error}
+    if status == "SUCCEEDED":
+        values.update({Job.progress: 1.0, Job.result: result})
+    db.query(Job).filter(Job.id == job_id, Job.status == "RUNNING").update(values, synchronize_session=False)
+    db.commit()
+
+
+def get_cancelled_jobs(db: Session, worker_pids: List[int]):
+    """ Get the ID and the worker process of the running jobs of these workers whose cancellation was requested """
+    return db.query(Job.id, Job.worker_pid).filter(Job.status == "RUNNING", Job.cancel_requested.is_(True),
+                                                   Job.worker_pid.in_(worker_pids)).all()
+
+
+def get_running_job_pids(db: Session):
+    """ Get the worker processes running a job, of any server """
+    return {row.worker_pid for row in db.query(Job.worker_pid).filter(Job.status == "RUNNING").distinct()}
+
+
+def release_jobs(db: Session, worker_pids: List[int], status: str, error: str = None):
+    """ End the running jobs of stopped worker processes, or queue them again when the status is QUEUED """
+    if not worker_pids:
+        return
+    running_jobs = db.query(Job).filter(Job.status == "RUNNING", Job.worker_pid.in_(worker_pids))
+    if status == "QUEUED":
+        # An import with committed batches is failed instead, running it again would import them twice
+        running_jobs.filter(Job.progress > 0).update(
+            {Job.status: "FAILED", Job.finished_at: datetime.utcnow(), Job.error: "Job stopped with its worker."},
+            synchronize_session=False
+        )
+        values = {Job.status: status, Job.worker_pid: None, Job.started_at: None}
+    else:
+        values = {Job.status: status, Job.finished_at: datetime.utcnow(), Job.error: error}
+    running_jobs.update(values, synchronize_session=False)
+    db.commit()
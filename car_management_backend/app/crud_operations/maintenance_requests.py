@@ -1,85 +1,342 @@
-from datetime import datetime
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import List
 from fastapi import HTTPException
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
+from car_management_backend.app.config import settings
+from car_management_backend.app.crud_operations.occupancy import adjust_occupancy, release_occupancy, \
+    reserve_occupancy, retry_on_lock
+from car_management_backend.app.crud_operations.occurrences import count_scheduled_occurrences, \
+    get_scheduled_occurrences
+from car_management_backend.app.crud_operations.pagination import paginate
+from car_management_backend.app.crud_operations.service_counts import add_service_counts, release_service_counts
+from car_management_backend.app.crud_operations.versions import bump_versions
 from car_management_backend.app.models.car import Car
 from car_management_backend.app.models.garage import Garage
 from car_management_backend.app.models.maintenance import MaintenanceRequest
 from car_management_backend.app.schemas.maintenance import MaintenanceRequestCreate, MaintenanceRequestUpdate
 
 
+@retry_on_lock
 def create_maintenance_request(db: Session, maintenance_request: MaintenanceRequestCreate):
     """ Add a new maintenance request to the DB """
-    # Validate that the scheduled date is not in the past
+    # Validate that the scheduled date is not in the past, today can still be booked
     scheduled_date = datetime.strptime(maintenance_request.scheduledDate, "%Y-%m-%d")
-    if scheduled_date < datetime.now():
+    if scheduled_date.date() < date.today():
         raise HTTPException(
             status_code=400,
             detail="Scheduled date cannot be in the past."
         )
 
-    # Add the new maintenance request to the DB
-    car = db.query(Car).filter(Car.id == maintenance_request.carId).first()
-    garage = db.query(Garage).filter(Garage.id == maintenance_request.garageId).first()
-
+    # Add the new maintenance request to the DB, its car and garage names are read with it after the commit
+    check_car_exists(db, maintenance_request.carId)
     db_request = MaintenanceRequest(
         car_id=maintenance_request.carId,
-        car_name=car.make,
         service_type=maintenance_request.serviceType,
-        scheduled_date=maintenance_request.scheduledDate,
-        garage_id=maintenance_request.garageId,
-        garage_name=garage.name
+        scheduled_date=scheduled_date.date(),
+        garage_id=maintenance_request.garageId
     )
 
+    # Take a slot of the garage day first, a fully booked day or a missing garage rejects the request
+    reserve_slot(db, db_request.garage_id, db_request.scheduled_date)
     db.add(db_request)
+    db.flush()
+    add_service_counts(db, MaintenanceRequest.id == db_request.id)
+    bump_versions(db, "maintenance_requests")
     db.commit()
     db.refresh(db_request)
     return db_request
 
 
+@retry_on_lock
+def create_maintenance_requests(db: Session, maintenance_requests: List[MaintenanceRequestCreate]):
+    """ Add many maintenance requests to the DB in a single transaction, reporting the invalid ones per item """
+    if len(maintenance_requests) > settings.max_bulk_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(maintenance_requests)}, the maximum is {settings.max_bulk_items}."
+        )
+
+    # Resolve all referenced cars and garages with one query each
+    car_ids = {request.carId for request in maintenance_requests}
+    garage_ids = {request.garageId for request in maintenance_requests}
+    existing_car_ids = {row.id for row in db.query(Car.id).filter(Car.id.in_(car_ids))} if car_ids else set()
+    existing_garage_ids = {row.id for row in db.query(Garage.id).filter(Garage.id.in_(garage_ids))} \
+        if garage_ids else set()
+
+    today = date.today()
+    candidates = []
+    errors = []
+    for index, request in enumerate(maintenance_requests):
+        try:
+            scheduled_date = datetime.strptime(request.scheduledDate, "%Y-%m-%d")
+        except ValueError:
+            errors.append({"index": index, "detail": f"Invalid scheduled date: {request.scheduledDate}."})
+            continue
+        if scheduled_date.date() < today:
+            errors.append({"index": index, "detail": "Scheduled date cannot be in the past."})
+            continue
+        if request.carId not in existing_car_ids:
+            errors.append({"index": index, "detail": f"Car not found: {request.carId}."})
+            continue
+        if request.garageId not in existing_garage_ids:
+            errors.append({"index": index, "detail": f"Garage not found: {request.garageId}."})
+            continue
+
+        candidates.append((index, MaintenanceRequest(
+            car_id=request.carId,
+            service_type=request.serviceType,
+            scheduled_date=scheduled_date.date(),
+            garage_id=request.garageId
+        )))
+
+    # Take the slots of each garage day at once, falling back to one by one when the day cannot fit them all,
+    # in which case the last requests of the day are rejected. Sorted so that concurrent writers lock in order
+    requests_per_slot = defaultdict(list)
+    for index, db_request in candidates:
+        requests_per_slot[(db_request.garage_id, db_request.scheduled_date)].append(index)
+    # The occurrences of the schedules not booked yet keep their slots
+    held = count_scheduled_occurrences(db, min(day for _, day in requests_per_slot),
+                                       max(day for _, day in requests_per_slot),
+                                       list({garage_id for garage_id, _ in requests_per_slot})) \
+        if requests_per_slot else Counter()
+    admitted_indexes = set()
+    for (garage_id, day), indexes in sorted(requests_per_slot.items()):
+        admitted = len(indexes)
+        if not reserve_occupancy(db, garage_id, day, admitted, held[(garage_id, day)]):
+            admitted = 0
+            while admitted < len(indexes) and reserve_occupancy(db, garage_id, day, held=held[(garage_id, day)]):
+                admitted += 1
+        admitted_indexes.update(indexes[:admitted])
+        errors.extend({"index": index, "detail": fully_booked_detail(garage_id, day)} for index in indexes[admitted:])
+    errors.sort(key=lambda error: error["index"])
+    db_requests = [db_request for index, db_request in candidates if index in admitted_indexes]
+
+    # Read the generated IDs before the commit expires the instances
+    db.add_all(db_requests)
+    if db_requests:
+        bump_versions(db, "maintenance_requests")
+    db.flush()
+    created_ids = [db_request.id for db_request in db_requests]
+    if created_ids:
+        add_service_counts(db, MaintenanceRequest.id.in_(created_ids))
+    db.commit()
+
+    return {"created": created_ids, "errors": errors}
+
+
+def reserve_slot(db: Session, garage_id: int, day: date, booking_occurrence: bool = False):
+    """ Take a slot of a garage day for a maintenance request, rejecting it when the day is fully booked """
+    # The occurrences of the schedules not booked yet keep their slots, except the one being booked, whose slot
+    # goes to the request replacing it
+    held = count_scheduled_occurrences(db, day, day, [garage_id])[(garage_id, day)]
+    if booking_occurrence:
+        held = max(held - 1, 0)
+    if not reserve_occupancy(db, garage_id, day, held=held):
+        if not db.query(Garage.id).filter(Garage.id == garage_id).first():
+            raise HTTPException(status_code=404, detail="Garage not found")
+        raise HTTPException(status_code=409, detail=fully_booked_detail(garage_id, day))
+
+
+def check_car_exists(db: Session, car_id: int):
+    """ Reject a maintenance request of a missing car """
+    if not db.query(Car.id).filter(Car.id == car_id).first():
+        raise HTTPException(status_code=404, detail="Car not found")
+
+
+def fully_booked_detail(garage_id: int, day: date):
+    """ Error message of a booking on a full garage day """
+    return f"Garage {garage_id} is fully booked on {day:%Y-%m-%d}."
+
+
 def get_maintenance_request(db: Session, request_id: int):
     """ Get a maintenance request from the DB via its ID """
     return db.query(MaintenanceRequest).filter(MaintenanceRequest.id == request_id).first()
 
 
 def get_maintenance_requests(db: Session, car_id: int = None, garage_id: int = None, start_date: str = None,
-                             end_date: str = None):
-    """ Get all maintenance requests from the DB with filter options """
-    query = db.query(MaintenanceRequest)
+                             end_date: str = None, cursor: str = None, limit: int = None):
+    """ Get a page of maintenance requests from the DB with filter options and the cursor of the next page """
+    query = filter_maintenance_requests(db.query(MaintenanceRequest), car_id=car_id, garage_id=garage_id,
+                                        start_date=start_date, end_date=end_date)
+    return paginate(query, MaintenanceRequest.id, cursor=cursor, limit=limit)
+
+
+def get_maintenance_request_rows(db: Session, car_id: int = None, garage_id: int = None, start_date: str = None,
+                                 end_date: str = None, service_type: str = None, cursor: str = None,
+                                 limit: int = None, include_scheduled: bool = False):
+    """ Same page as get_maintenance_requests, as plain column rows without building entities """
+    # The occurrences of the schedules are only expanded in a bounded date window
+    if include_scheduled and not (start_date and end_date):
+        raise HTTPException(
+            status_code=400,
+            detail="The start and end dates are required to include the scheduled occurrences."
+        )
+
+    query = filter_maintenance_requests(maintenance_request_columns(db), car_id=car_id, garage_id=garage_id,
+                                        start_date=start_date, end_date=end_date, service_type=service_type)
+    rows, next_cursor = paginate(query, MaintenanceRequest.id, cursor=cursor, limit=limit)
+
+    # The occurrences not booked yet have no ID to seek past, so they follow the requests on their last page
+    if include_scheduled and next_cursor is None:
+        rows = rows + get_scheduled_occurrences(db, parse_date(start_date), parse_date(end_date), car_id=car_id,
+                                                garage_ids=[garage_id] if garage_id else None,
+                                                service_type=service_type)
+    return rows, next_cursor
+
+
+def get_car_maintenance_history(db: Session, car_id: int, start_date: str = None, end_date: str = None,
+                                service_type: str = None, cursor: str = None, limit: int = None):
+    """ Get the summary of the maintenance requests of a car, a page of them and the cursor of the next page """
+    check_car_exists(db, car_id)
+
+    summary = summarize_maintenance(db, [car_id], start_date=start_date, end_date=end_date,
+                                    service_type=service_type)[car_id]
+    rows, next_cursor = get_maintenance_request_rows(db, car_id=car_id, start_date=start_date, end_date=end_date,
+                                                     service_type=service_type, cursor=cursor, limit=limit)
+    return summary, rows, next_cursor
+
+
+def get_maintenance_summaries(db: Session, car_ids: List[int], start_date: str = None, end_date: str = None,
+                              service_type: str = None):
+    """ Get the maintenance summaries of many cars, in the order of the IDs and None for the unknown cars """
+    if len(car_ids) > settings.max_bulk_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(car_ids)}, the maximum is {settings.max_bulk_items}."
+        )
+
+    existing_ids = {car_id for car_id, in db.query(Car.id).filter(Car.id.in_(set(car_ids)))}
+    summaries = summarize_maintenance(db, list(existing_ids), start_date=start_date, end_date=end_date,
+                                      service_type=service_type)
+    return [summaries.get(car_id) for car_id in car_ids]
+
+
+def summarize_maintenance(db: Session, car_ids: List[int], start_date: str = None, end_date: str = None,
+                          service_type: str = None):
+    """ Aggregate the maintenance requests of the given cars per service type with a single grouped query """
+    today = date.today()
+    # Requests of today are still to be done, so they count as scheduled rather than as the last service
+    query = db.query(
+        MaintenanceRequest.car_id,
+        MaintenanceRequest.service_type,
+        func.count(MaintenanceRequest.id),
+        func.max(case((MaintenanceRequest.scheduled_date < today, MaintenanceRequest.scheduled_date))),
+        func.min(case((MaintenanceRequest.scheduled_date >= today, MaintenanceRequest.scheduled_date)))
+    ).filter(MaintenanceRequest.car_id.in_(car_ids))
+    query = filter_maintenance_requests(query, start_date=start_date, end_date=end_date, service_type=service_type)
+
+    # Keys in the order of MaintenanceSummaryResponse
+    summaries = {
+        car_id: {"carId": car_id, "totalRequests": 0, "lastServiceDate": None, "nextScheduledDate": None,
+                 "serviceTypes": []}
+        for car_id in car_ids
+    }
+    for car_id, request_service_type, count, last_date, next_date in query.group_by(
+            MaintenanceRequest.car_id, MaintenanceRequest.service_type):
+        summary = summaries[car_id]
+        summary["totalRequests"] += count
+        summary["serviceTypes"].append({"serviceType": request_service_type, "count": count})
+        if last_date and (summary["lastServiceDate"] is None or last_date > summary["lastServiceDate"]):
+            summary["lastServiceDate"] = last_date
+        if next_date and (summary["nextScheduledDate"] is None or next_date < summary["nextScheduledDate"]):
+            summary["nextScheduledDate"] = next_date
+
+    # The most frequent services first
+    for summary in summaries.values():
+        summary["serviceTypes"].sort(key=lambda item: (-item["count"], item["serviceType"]))
+    return summaries
+
+
+def iter_maintenance_requests(db: Session, car_id: int = None, garage_id: int = None, start_date: date = None,
+                              end_date: date = None, batch_size: int = 1000):
+    """ Stream the maintenance requests from the DB as plain rows, fetching them in batches
+
+    The dates are parsed by the caller: an invalid filter found once the rows are streamed could not be a 400.
+    """
+    query = filter_maintenance_requests(maintenance_request_columns(db), car_id=car_id, garage_id=garage_id)
+    if start_date:
+        query = query.filter(MaintenanceRequest.scheduled_date >= start_date)
+    if end_date:
+        query = query.filter(MaintenanceRequest.scheduled_date <= end_date)
+
+    # Column rows with a server-side cursor keep memory flat however many rows match
+    yield from query.order_by(MaintenanceRequest.id).yield_per(batch_size)
+
+
+def maintenance_request_columns(db: Session):
+    """ Query of the maintenance request columns in the order of the response model """
+    return db.query(
+        MaintenanceRequest.id,
+        MaintenanceRequest.car_id,
+        MaintenanceRequest.car_name,
+        MaintenanceRequest.service_type,
+        MaintenanceRequest.scheduled_date,
+        MaintenanceRequest.garage_id,
+        MaintenanceRequest.garage_name,
+        MaintenanceRequest.schedule_id
+    )
+
+
+def filter_maintenance_requests(query, car_id: int = None, garage_id: int = None, start_date: str = None,
+                                end_date: str = None, service_type: str = None):
+    """ Apply the maintenance request filter options to a query """
     if car_id:
         query = query.filter(MaintenanceRequest.car_id == car_id)
     if garage_id:
         query = query.filter(MaintenanceRequest.garage_id == garage_id)
+    if service_type:
+        query = query.filter(MaintenanceRequest.service_type == service_type)
     if start_date:
-        query = query.filter(MaintenanceRequest.scheduled_date >= start_date)
+        query = query.filter(MaintenanceRequest.scheduled_date >= parse_date(start_date))
     if end_date:
-        query = query.filter(MaintenanceRequest.scheduled_date <= end_date)
-    return query.all()
+        query = query.filter(MaintenanceRequest.scheduled_date <= parse_date(end_date))
+    return query
 
 
+def parse_date(value: str):
+    """ Parse a YYYY-MM-DD date filter """
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}.")
+
+
+@retry_on_lock
 def update_maintenance_request(db: Session, request_id: int, maintenance_request: MaintenanceRequestUpdate):
     """ Update info about a maintenance request in the DB """
     db_request = db.query(MaintenanceRequest).filter(MaintenanceRequest.id == request_id).first()
     if db_request:
+        previous_slot = (db_request.garage_id, db_request.scheduled_date)
+        # Counted again once changed, as its car, service type or month may change
+        release_service_counts(db, MaintenanceRequest.id == request_id)
         if maintenance_request.carId:
+            check_car_exists(db, maintenance_request.carId)
             db_request.car_id = maintenance_request.carId
-            car = db.query(Car).filter(Car.id == maintenance_request.carId).first()
-            db_request.car_name = car.make
         if maintenance_request.serviceType:
             db_request.service_type = maintenance_request.serviceType
         if maintenance_request.scheduledDate:
             scheduled_date = datetime.strptime(maintenance_request.scheduledDate, "%Y-%m-%d")
-            if scheduled_date < datetime.now():
+            if scheduled_date.date() < date.today():
                 raise HTTPException(
                     status_code=400,
                     detail="Scheduled date cannot be in the past."
                 )
 
-            db_request.scheduled_date = maintenance_request.scheduledDate
+            db_request.scheduled_date = scheduled_date.date()
         if maintenance_request.garageId:
             db_request.garage_id = maintenance_request.garageId
-            garage = db.query(Garage).filter(Garage.id == maintenance_request.garageId).first()
-            db_request.garage_name = garage.name
 
+        # Move the request in the occupancy when its garage or date changed
+        current_slot = (db_request.garage_id, db_request.scheduled_date)
+        if current_slot != previous_slot:
+            reserve_slot(db, *current_slot)
+            adjust_occupancy(db, Counter({previous_slot: -1}))
+        db.flush()
+        add_service_counts(db, MaintenanceRequest.id == request_id)
+
+        bump_versions(db, "maintenance_requests")
         db.commit()
         db.refresh(db_request)
         return db_request
@@ -90,7 +347,37 @@ def delete_maintenance_request(db: Session, request_id: int):
     """ Delete a garage from the DB """
     db_request = db.query(MaintenanceRequest).filter(MaintenanceRequest.id == request_id).first()
     if db_request:
+        adjust_occupancy(db, Counter({(db_request.garage_id, db_request.scheduled_date): -1}))
+        release_service_counts(db, MaintenanceRequest.id == request_id)
         db.delete(db_request)
+        bump_versions(db, "maintenance_requests")
         db.commit()
         return db_request
     return None
+
+
+def delete_maintenance_requests(db: Session, request_ids: List[int]):
+    """ Delete many maintenance requests from the DB in a single transaction """
+    if len(request_ids) > settings.max_bulk_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(request_ids)}, the maximum is {settings.max_bulk_items}."
+        )
+
+    existing_ids = {
+        row.id for row in db.query(MaintenanceRequest.id).filter(MaintenanceRequest.id.in_(request_ids))
+    } if request_ids else set()
+    errors = [
+        {"index": index, "detail": f"Maintenance request not found: {request_id}."}
+        for index, request_id in enumerate(request_ids) if request_id not in existing_ids
+    ]
+
+    if existing_ids:
+        release_occupancy(db, MaintenanceRequest.id.in_(existing_ids))
+        release_service_counts(db, MaintenanceRequest.id.in_(existing_ids))
+        db.query(MaintenanceRequest).filter(MaintenanceRequest.id.in_(existing_ids)) \
+            .delete(synchronize_session=False)
+        bump_versions(db, "maintenance_requests")
+    db.commit()
+
+    return {"deleted": sorted(existing_ids), "errors": errors}
@@ -0,0 +1,169 @@
+import functools
+import importlib
+from collections import Counter
+from datetime import date
+from fastapi import HTTPException
+from sqlalchemy import Date, bindparam, func, literal, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from car_management_backend.app.cache import invalidate_on_commit
+from car_management_backend.app.config import settings
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy
+
+# Dialects with an INSERT ... ON CONFLICT DO UPDATE construct, imported with the engine of the dialect
+UPSERT_DIALECTS = {"sqlite": "sqlalchemy.dialects.sqlite", "postgresql": "sqlalchemy.dialects.postgresql"}
+
+
+def get_upsert_insert(db: Session):
+    """ Get the insert construct with ON CONFLICT of the session's dialect, None when it has none """
+    module = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    return importlib.import_module(module).insert if module else None
+
+
+def adjust_occupancy(db: Session, deltas: Counter):
+    """ Add the request count changes per (garage ID, date) to the occupancy in the current transaction """
+    rows = [
+        {"occupancy_garage_id": garage_id, "occupancy_date": day, "delta": delta}
+        for (garage_id, day), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    invalidate_on_commit(db, *{f"reports:garage:{row['occupancy_garage_id']}" for row in rows})
+
+    table = GarageDailyOccupancy.__table__
+    upsert_insert = get_upsert_insert(db)
+    if upsert_insert is not None:
+        statement = upsert_insert(table).values(
+            garage_id=bindparam("occupancy_garage_id"),
+            date=bindparam("occupancy_date"),
+            request_count=bindparam("delta")
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.garage_id, table.c.date],
+            set_={"request_count": table.c.request_count + statement.excluded.request_count}
+        )
+        db.execute(statement, rows)
+        return
+
+    # Other dialects update the existing rows and insert the missing ones
+    for row in rows:
+        updated = db.execute(
+            table.update()
+                .where(table.c.garage_id == row["occupancy_garage_id"], table.c.date == row["occupancy_date"])
+                .values(request_count=table.c.request_count + row["delta"])
+        )
+        if updated.rowcount == 0:
+            db.execute(table.insert().values(garage_id=row["occupancy_garage_id"], date=row["occupancy_date"],
+                                             request_count=row["delta"]))
+
+
+def reserve_occupancy(db: Session, garage_id: int, day: date, count: int = 1, held: int = 0):
+    """ Atomically take slots of a garage day in the current transaction, unless it would exceed the capacity
+
+    The held slots are the ones of the schedule occurrences of the day not booked yet, which the capacity keeps.
+    """
+    table = GarageDailyOccupancy.__table__
+    ensure_occupancy_row(db, garage_id, day)
+
+    # The capacity check and the increment are one statement on a locked row, so concurrent bookings of the same
+    # day are serialized by the database instead of racing between a read and an insert
+    capacity = select(Garage.capacity).where(Garage.id == garage_id).scalar_subquery()
+    reserved = db.execute(
+        table.update()
+            .where(table.c.garage_id == garage_id, table.c.date == day,
+                   table.c.request_count + count + held <= capacity)
+            .values(request_count=table.c.request_count + count)
+    )
+    if reserved.rowcount == 0:
+        return False
+    invalidate_on_commit(db, f"reports:garage:{garage_id}")
+    return True
+
+
+def retry_on_lock(crud_function):
+    """ Run a booking again in a new transaction when the database was locked, answering 503 once it stays locked
+
+    A SQLite transaction which read before another one committed a write cannot write anymore, waiting does not
+    help it, only starting over does. The busy timeout already spaces out the attempts.
+    """
+    @functools.wraps(crud_function)
+    def retried(db: Session, *args, **kwargs):
+        for _ in range(settings.booking_lock_retries + 1):
+            try:
+                return crud_function(db, *args, **kwargs)
+            except OperationalError as error:
+                db.rollback()
+                if "locked" not in str(error.orig):
+                    raise
+        raise HTTPException(status_code=503, detail="The database is busy, retry the booking later.",
+                            headers={"Retry-After": "1"})
+    return retried
+
+
+def ensure_occupancy_row(db: Session, garage_id: int, day: date):
+    """ Create the empty occupancy row of an existing garage day, for the conditional update to lock """
+    table = GarageDailyOccupancy.__table__
+    if db.query(table.c.garage_id).filter(table.c.garage_id == garage_id, table.c.date == day).first():
+        return
+
+    rows = select(Garage.id, literal(day, Date), literal(0)).where(Garage.id == garage_id)
+    upsert_insert = get_upsert_insert(db)
+    if upsert_insert is not None:
+        db.execute(upsert_insert(table).from_select(["garage_id", "date", "request_count"], rows)
+                   .on_conflict_do_nothing(index_elements=[table.c.garage_id, table.c.date]))
+        return
+
+    # Other dialects may lose the race to a concurrent insert of the same row, which is fine
+    try:
+        with db.begin_nested():
+            db.execute(table.insert().from_select(["garage_id", "date", "request_count"], rows))
+    except IntegrityError:
+        pass
+
+
+def release_occupancy(db: Session, *criteria):
+    """ Remove the maintenance requests matching the criteria from the occupancy, before they are deleted """
+    rows = (
+        db.query(
+            MaintenanceRequest.garage_id,
+            MaintenanceRequest.scheduled_date,
+            func.count(MaintenanceRequest.id).label("count")
+        )
+            .filter(*criteria)
+            .group_by(MaintenanceRequest.garage_id, MaintenanceRequest.scheduled_date)
+            .all()
+    )
+    adjust_occupancy(db, Counter({(row.garage_id, row.scheduled_date): -row.count for row in rows}))
+
+
+def get_occupancy(db: Session, garage_id: int, start_date: date, end_date: date):
+    """ Get the number of maintenance requests per day of a garage in a date range """
+    rows = (
+        db.query(GarageDailyOccupancy.date, GarageDailyOccupancy.request_count)
+            .filter(
+            GarageDailyOccupancy.garage_id == garage_id,
+            GarageDailyOccupancy.date.between(start_date, end_date)
+        )
+            .all()
+    )
+    return {row.date: row.request_count for row in rows}
+
+
+def rebuild_occupancy(db: Session):
+    """ Recompute the whole occupancy table from the maintenance requests """
+    db.query(GarageDailyOccupancy).delete(synchronize_session=False)
+    counts = (
+        db.query(
+            MaintenanceRequest.garage_id,
+            MaintenanceRequest.scheduled_date,
+            func.count(MaintenanceRequest.id)
+        )
+            .group_by(MaintenanceRequest.garage_id, MaintenanceRequest.scheduled_date)
+    )
+    db.execute(
+        GarageDailyOccupancy.__table__.insert().from_select(["garage_id", "date", "request_count"], counts)
+    )
+    invalidate_on_commit(db, "reports")
+    db.commit()
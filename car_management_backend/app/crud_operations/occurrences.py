@@ -0,0 +1,127 @@
+from calendar import monthrange
+from collections import Counter
+from datetime import date, timedelta
+from typing import List
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from car_management_backend.app.config import settings
+from car_management_backend.app.models.car import Car
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.maintenance_schedule import MaintenanceSchedule
+
+# Days between two occurrences of an interval of 1, for the frequencies of a fixed length
+FREQUENCY_DAYS = {"DAILY": 1, "WEEKLY": 7}
+# Months between two occurrences of an interval of 1, for the others
+FREQUENCY_MONTHS = {"MONTHLY": 1, "YEARLY": 12}
+
+
+def nth_occurrence(schedule, index: int):
+    """ Date of an occurrence of a schedule from its index, the first one being 0 """
+    if schedule.frequency in FREQUENCY_DAYS:
+        return schedule.start_date + timedelta(days=index * schedule.interval * FREQUENCY_DAYS[schedule.frequency])
+
+    # The day of the month is kept, falling back to the last day of the shorter months
+    months = schedule.start_date.year * 12 + schedule.start_date.month - 1 \
+        + index * schedule.interval * FREQUENCY_MONTHS[schedule.frequency]
+    year, month = divmod(months, 12)
+    return date(year, month + 1, min(schedule.start_date.day, monthrange(year, month + 1)[1]))
+
+
+def first_index_from(schedule, day: date):
+    """ Index of the first occurrence of a schedule on or after a day, computed without walking the earlier ones """
+    if day <= schedule.start_date:
+        return 0
+    if schedule.frequency in FREQUENCY_DAYS:
+        step = schedule.interval * FREQUENCY_DAYS[schedule.frequency]
+        return -(-(day - schedule.start_date).days // step)
+
+    step = schedule.interval * FREQUENCY_MONTHS[schedule.frequency]
+    elapsed_months = (day.year - schedule.start_date.year) * 12 + day.month - schedule.start_date.month
+    index = elapsed_months // step
+    # At most one step further, when the occurrence of that month is earlier in the month than the day
+    while nth_occurrence(schedule, index) < day:
+        index += 1
+    return index
+
+
+def occurrences_between(schedule, first_day: date, last_day: date):
+    """ Dates of the occurrences of a schedule in a date range, only the ones in the range are generated """
+    if schedule.until_date is not None:
+        last_day = min(last_day, schedule.until_date)
+    days = []
+    index = first_index_from(schedule, first_day)
+    while schedule.occurrence_count is None or index < schedule.occurrence_count:
+        day = nth_occurrence(schedule, index)
+        if day > last_day:
+            break
+        days.append(day)
+        index += 1
+    return days
+
+
+def get_scheduled_occurrences(db: Session, first_day: date, last_day: date, car_id: int = None,
+                              garage_ids: List[int] = None, service_type: str = None):
+    """ Occurrences of the schedules in a date range that are not booked yet, as maintenance request rows """
+    query = (
+        db.query(
+            MaintenanceSchedule.id,
+            MaintenanceSchedule.car_id,
+            Car.make,
+            MaintenanceSchedule.service_type,
+            MaintenanceSchedule.garage_id,
+            Garage.name,
+            MaintenanceSchedule.start_date,
+            MaintenanceSchedule.frequency,
+            MaintenanceSchedule.interval,
+            MaintenanceSchedule.until_date,
+            MaintenanceSchedule.occurrence_count
+        )
+            .join(Car, Car.id == MaintenanceSchedule.car_id)
+            .join(Garage, Garage.id == MaintenanceSchedule.garage_id)
+            .filter(
+            MaintenanceSchedule.start_date <= last_day,
+            or_(MaintenanceSchedule.until_date.is_(None), MaintenanceSchedule.until_date >= first_day)
+        )
+    )
+    if car_id:
+        query = query.filter(MaintenanceSchedule.car_id == car_id)
+    if garage_ids:
+        query = query.filter(MaintenanceSchedule.garage_id.in_(garage_ids))
+    if service_type:
+        query = query.filter(MaintenanceSchedule.service_type == service_type)
+    schedules = query.all()
+    if not schedules:
+        return []
+
+    # The booked occurrences are maintenance requests already, wherever and whenever they were moved to
+    booked = set(
+        db.query(MaintenanceRequest.schedule_id, MaintenanceRequest.occurrence_date)
+            .filter(
+            MaintenanceRequest.schedule_id.in_(query.with_entities(MaintenanceSchedule.id).scalar_subquery()),
+            MaintenanceRequest.occurrence_date.between(first_day, last_day)
+        )
+    )
+
+    # Rows in the order of maintenance_request_columns, without ID
+    occurrences = []
+    for schedule in schedules:
+        for day in occurrences_between(schedule, first_day, last_day):
+            if (schedule.id, day) not in booked:
+                occurrences.append((None, schedule.car_id, schedule.make, schedule.service_type, day,
+                                    schedule.garage_id, schedule.name, schedule.id))
+        if len(occurrences) > settings.schedule_max_occurrences:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many scheduled occurrences between {first_day:%Y-%m-%d} and {last_day:%Y-%m-%d}, "
+                       f"the maximum is {settings.schedule_max_occurrences}. Narrow the dates."
+            )
+    occurrences.sort(key=lambda row: (row[4], row[7]))
+    return occurrences
+
+
+def count_scheduled_occurrences(db: Session, first_day: date, last_day: date, garage_ids: List[int]):
+    """ Number of the occurrences of the schedules not booked yet per (garage ID, date) in a date range """
+    return Counter((row[5], row[4]) for row in get_scheduled_occurrences(db, first_day, last_day,
+                                                                          garage_ids=garage_ids))
@@ -0,0 +1,46 @@
+import base64
+import binascii
+from fastapi import HTTPException
+from sqlalchemy.orm import Query
+from car_management_backend.app.config import settings
+
+# Response header carrying the cursor of the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int):
+    """ Build the opaque cursor pointing after the given row ID """
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """ Get the row ID an opaque cursor points after """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}.")
+
+
+def paginate(query: Query, id_column, cursor: str = None, limit: int = None):
+    """ Get one page of the query results ordered by ID and the cursor of the next page """
+    # Without a cursor or a limit the whole result is returned in a single page
+    if cursor is None and limit is None:
+        return query.order_by(id_column).all(), None
+
+    if limit is None:
+        limit = settings.default_page_limit
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail=f"Limit should be a positive number: {limit}.")
+    limit = min(limit, settings.max_page_limit)
+
+    # Seek past the last seen ID instead of using OFFSET, so every page costs the same index range scan
+    if cursor is not None:
+        query = query.filter(id_column > decode_cursor(cursor))
+
+    # Fetch one extra row to know if there is a next page
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
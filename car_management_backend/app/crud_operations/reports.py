@@ -1,14 +1,24 @@
 import calendar
+import heapq
+from collections import Counter, defaultdict
 from fastapi import HTTPException
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import List
 from sqlalchemy.orm import Session
+from car_management_backend.app.crud_operations.maintenance_requests import parse_date
+from car_management_backend.app.crud_operations.occupancy import get_occupancy
+from car_management_backend.app.crud_operations.occurrences import count_scheduled_occurrences
+from car_management_backend.app.crud_operations.service_counts import month_of
+from car_management_backend.app.models.car import Car
+from car_management_backend.app.models.car_garage import car_garage
 from car_management_backend.app.models.maintenance import MaintenanceRequest
 from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy
 
 
-def get_requests_per_month(db: Session, garage_id: int, start_month: str, end_month: str):
-    """ Get the number of maintenance requests per month for a given garage """
+def get_months(start_month: str, end_month: str):
+    """ Get the first and last day of a YYYY-MM month range and all months in it """
     start_date = datetime.strptime(start_month, "%Y-%m").date()
     end_date = datetime.strptime(end_month, "%Y-%m").date()
 
@@ -24,35 +34,61 @@ def get_requests_per_month(db: Session, garage_id: int, start_month: str, end_mo
         current_date += timedelta(days=31)
         current_date = current_date.replace(day=1)
 
+    return start_date, end_date, all_months
+
+
+def get_requests_per_month(db: Session, garage_id: int, start_month: str, end_month: str):
+    """ Get the number of maintenance requests per month for a given garage """
+    return get_requests_per_month_for_garages(db, start_month, end_month, garage_ids=[garage_id])[garage_id]
+
+
+def get_requests_per_month_for_garages(db: Session, start_month: str, end_month: str, garage_ids: List[int] = None,
+                                       city: str = None):
+    """ Get the number of maintenance requests per month for each of the given garages or the garages of a city """
+    start_date, end_date, all_months = get_months(start_month, end_month)
+
+    if city:
+        city_garage_ids = [row.id for row in db.query(Garage.id).filter(Garage.city.ilike(city))]
+        garage_ids = [garage_id for garage_id in garage_ids if garage_id in city_garage_ids] \
+            if garage_ids else city_garage_ids
+    garage_ids = list(dict.fromkeys(garage_ids or []))
+    if not garage_ids:
+        return {}
+
+    # One grouped query for all garages, with plain range predicates on the date column so the
+    # (garage_id, scheduled_date) index serves both the filter and the grouping
+    month = month_of(db, MaintenanceRequest.scheduled_date)
     results = (
         db.query(
-            func.strftime("%Y-%m", MaintenanceRequest.scheduled_date).label("month"),
+            MaintenanceRequest.garage_id,
+            month.label("month"),
             func.count(MaintenanceRequest.id).label("count")
         )
             .filter(
-            MaintenanceRequest.garage_id == garage_id,
-            func.date(MaintenanceRequest.scheduled_date) >= start_date,
-            func.date(MaintenanceRequest.scheduled_date) <= end_date
+            MaintenanceRequest.garage_id.in_(garage_ids),
+            MaintenanceRequest.scheduled_date >= start_date,
+            MaintenanceRequest.scheduled_date <= end_date
         )
-            .group_by(func.strftime("%Y-%m", MaintenanceRequest.scheduled_date))
-            .order_by(func.strftime("%Y-%m", MaintenanceRequest.scheduled_date))
+            .group_by(MaintenanceRequest.garage_id, month)
             .all()
     )
 
-    monthly_counts = {row.month: row.count for row in results}
+    monthly_counts = Counter({(row.garage_id, row.month): row.count for row in results})
+    # The occurrences of the schedules not booked yet are planned requests of their month
+    for (garage_id, day), count in count_scheduled_occurrences(db, start_date, end_date, garage_ids).items():
+        monthly_counts[(garage_id, day.strftime("%Y-%m"))] += count
 
     # Set count for all months of the period including the ones where the requests are 0
-    monthly_requests = {}
-    for month in all_months:
-        monthly_requests[month] = monthly_counts.get(month, 0)
-
-    return dict(monthly_requests)
+    return {
+        garage_id: {month: monthly_counts.get((garage_id, month), 0) for month in all_months}
+        for garage_id in garage_ids
+    }
 
 
 def get_daily_availability_report(db: Session, garage_id: int, start_date: str, end_date: str):
     """ Get the daily availability for a given garage """
-    start_date = datetime.strptime(start_date, "%Y-%m-%d")
-    end_date = datetime.strptime(end_date, "%Y-%m-%d")
+    start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
     garage = db.query(Garage).filter(Garage.id == garage_id).first()
     if not garage:
@@ -62,32 +98,79 @@ def get_daily_availability_report(db: Session, garage_id: int, start_date: str,
     all_dates = []
     current_date = start_date
     while current_date <= end_date:
-        all_dates.append(current_date.strftime("%Y-%m-%d"))
+        all_dates.append(current_date)
         current_date += timedelta(days=1)
 
-    results = (
-        db.query(
-            MaintenanceRequest.scheduled_date.label("date"),
-            func.count(MaintenanceRequest.id).label("requests")
-        )
-            .filter(
-            MaintenanceRequest.garage_id == garage_id,
-            MaintenanceRequest.scheduled_date.between(start_date, end_date)
-        )
-            .group_by(MaintenanceRequest.scheduled_date)
-            .all()
-    )
-
-    requests_dict = {row.date: row.requests for row in results}
+    # Read the precomputed per day counts instead of grouping the maintenance requests
+    requests_dict = get_occupancy(db, garage_id, all_dates[0], all_dates[-1]) if all_dates else {}
+    # The occurrences of the schedules not booked yet take their slot too, as when booking
+    scheduled = count_scheduled_occurrences(db, all_dates[0], all_dates[-1], [garage_id]) if all_dates else {}
 
     daily_report = []
     for date in all_dates:
-        requests = requests_dict.get(date, 0)
+        requests = requests_dict.get(date, 0) + scheduled.get((garage_id, date), 0)
         available_capacity = garage.capacity - requests
         daily_report.append({
-            "date": date,
+            "date": date.strftime("%Y-%m-%d"),
             "requests": requests,
             "availableCapacity": available_capacity
         })
 
     return daily_report
+
+
+def get_next_available_slots(db: Session, car_id: int, start_date: str = None, days: int = 90, city: str = None,
+                             alternatives: int = 3):
+    """ Find the earliest day with free capacity among the garages of a car and the first free days of the others """
+    if not db.query(Car.id).filter(Car.id == car_id).first():
+        raise HTTPException(status_code=404, detail="Car not found")
+
+    # Maintenance cannot be scheduled in the past, so the search starts today at the earliest
+    today = date.today()
+    first_day = max(parse_date(start_date), today) if start_date else today
+    last_day = first_day + timedelta(days=days - 1)
+
+    garages_query = (
+        db.query(Garage.id, Garage.name, Garage.capacity)
+            .join(car_garage, car_garage.c.garage_id == Garage.id)
+            .filter(car_garage.c.car_id == car_id)
+    )
+    if city:
+        garages_query = garages_query.filter(Garage.city.ilike(city))
+    garages = garages_query.all()
+
+    # The booked days of all the garages in the horizon with one query on the precomputed occupancy
+    booked_days = defaultdict(dict)
+    if garages:
+        rows = (
+            db.query(GarageDailyOccupancy.garage_id, GarageDailyOccupancy.date, GarageDailyOccupancy.request_count)
+                .filter(
+                GarageDailyOccupancy.garage_id.in_([garage.id for garage in garages]),
+                GarageDailyOccupancy.date.between(first_day, last_day),
+                GarageDailyOccupancy.request_count > 0
+            )
+        )
+        for row in rows:
+            booked_days[row.garage_id][row.date] = row.request_count
+        # The occurrences of the schedules not booked yet keep their slots, as when booking
+        for (garage_id, day), count in count_scheduled_occurrences(db, first_day, last_day,
+                                                                    [garage.id for garage in garages]).items():
+            booked_days[garage_id][day] = booked_days[garage_id].get(day, 0) + count
+
+    # The first free day of every garage only walks past its fully booked days
+    slots = []
+    for garage in garages:
+        requests = booked_days[garage.id]
+        day = first_day
+        while day <= last_day and requests.get(day, 0) >= garage.capacity:
+            day += timedelta(days=1)
+        if day <= last_day:
+            slots.append((day, garage.id, garage.name, garage.capacity - requests.get(day, 0)))
+
+    # Keep the earliest ones with a heap instead of sorting the slots of all garages
+    slots = [
+        {"date": day.strftime("%Y-%m-%d"), "garageId": garage_id, "garageName": garage_name,
+         "availableCapacity": available_capacity}
+        for day, garage_id, garage_name, available_capacity in heapq.nsmallest(alternatives + 1, slots)
+    ]
+    return {"carId": car_id, "earliest": slots[0] if slots else None, "alternatives": slots[1:]}
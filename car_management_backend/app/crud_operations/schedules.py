@@ -0,0 +1,214 @@
+from datetime import date, timedelta
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from car_management_backend.app.cache import invalidate_on_commit
+from car_management_backend.app.config import settings
+from car_management_backend.app.crud_operations.maintenance_requests import check_car_exists, \
+    fully_booked_detail, parse_date, reserve_slot
+from car_management_backend.app.crud_operations.occurrences import count_scheduled_occurrences, \
+    occurrences_between
+from car_management_backend.app.crud_operations.occupancy import get_occupancy, retry_on_lock
+from car_management_backend.app.crud_operations.pagination import paginate
+from car_management_backend.app.crud_operations.service_counts import add_service_counts
+from car_management_backend.app.crud_operations.versions import bump_versions
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.maintenance_schedule import SCHEDULE_FREQUENCIES, MaintenanceSchedule
+from car_management_backend.app.schemas.schedule import MaintenanceScheduleCreate, MaintenanceScheduleUpdate
+
+
+@retry_on_lock
+def create_schedule(db: Session, schedule: MaintenanceScheduleCreate):
+    """ Add a new maintenance schedule to the DB """
+    check_car_exists(db, schedule.carId)
+    check_garage_exists(db, schedule.garageId)
+    db_schedule = MaintenanceSchedule(
+        car_id=schedule.carId,
+        garage_id=schedule.garageId,
+        service_type=schedule.serviceType,
+        start_date=parse_date(schedule.startDate),
+        frequency=schedule.frequency.upper(),
+        interval=schedule.interval,
+        until_date=parse_date(schedule.untilDate) if schedule.untilDate else None,
+        occurrence_count=schedule.occurrenceCount
+    )
+    # Only the first occurrence is checked against today, the schedule keeps its past occurrences afterwards
+    if db_schedule.start_date < date.today():
+        raise HTTPException(status_code=400, detail="Start date cannot be in the past.")
+    validate_recurrence(db_schedule)
+
+    db.add(db_schedule)
+    db.flush()
+    check_schedule_capacity(db, db_schedule)
+    bump_versions(db, "maintenance_schedules")
+    invalidate_on_commit(db, f"reports:garage:{db_schedule.garage_id}")
+    db.commit()
+    db.refresh(db_schedule)
+    return db_schedule
+
+
+def get_schedule(db: Session, schedule_id: int):
+    """ Get a maintenance schedule from the DB via its ID """
+    return db.query(MaintenanceSchedule).filter(MaintenanceSchedule.id == schedule_id).first()
+
+
+def get_schedules(db: Session, car_id: int = None, garage_id: int = None, cursor: str = None, limit: int = None):
+    """ Get a page of maintenance schedules from the DB with filter options and the cursor of the next page """
+    query = db.query(MaintenanceSchedule)
+    if car_id:
+        query = query.filter(MaintenanceSchedule.car_id == car_id)
+    if garage_id:
+        query = query.filter(MaintenanceSchedule.garage_id == garage_id)
+    return paginate(query, MaintenanceSchedule.id, cursor=cursor, limit=limit)
+
+
+@retry_on_lock
+def update_schedule(db: Session, schedule_id: int, schedule: MaintenanceScheduleUpdate):
+    """ Update a maintenance schedule in the DB, the requests already booked from it are kept as they are """
+    db_schedule = db.query(MaintenanceSchedule).filter(MaintenanceSchedule.id == schedule_id).first()
+    if db_schedule:
+        previous_garage_id = db_schedule.garage_id
+        values = schedule.dict(exclude_unset=True)
+        if values.get("carId"):
+            check_car_exists(db, values["carId"])
+            db_schedule.car_id = values["carId"]
+        if values.get("garageId"):
+            check_garage_exists(db, values["garageId"])
+            db_schedule.garage_id = values["garageId"]
+        if values.get("serviceType"):
+            db_schedule.service_type = values["serviceType"]
+        if values.get("startDate"):
+            db_schedule.start_date = parse_date(values["startDate"])
+            if db_schedule.start_date < date.today():
+                raise HTTPException(status_code=400, detail="Start date cannot be in the past.")
+        if values.get("frequency"):
+            db_schedule.frequency = values["frequency"].upper()
+        if values.get("interval") is not None:
+            db_schedule.interval = values["interval"]
+        # The bounds of the recurrence are removed with an explicit null
+        if "untilDate" in values:
+            db_schedule.until_date = parse_date(values["untilDate"]) if values["untilDate"] else None
+        if "occurrenceCount" in values:
+            db_schedule.occurrence_count = values["occurrenceCount"]
+        validate_recurrence(db_schedule)
+        db.flush()
+        check_schedule_capacity(db, db_schedule)
+
+        bump_versions(db, "maintenance_schedules")
+        invalidate_on_commit(db, f"reports:garage:{previous_garage_id}", f"reports:garage:{db_schedule.garage_id}")
+        db.commit()
+        db.refresh(db_schedule)
+        return db_schedule
+    return None
+
+
+def delete_schedule(db: Session, schedule_id: int):
+    """ Delete a maintenance schedule from the DB, the requests booked from it stay as plain requests """
+    db_schedule = db.query(MaintenanceSchedule).filter(MaintenanceSchedule.id == schedule_id).first()
+    if db_schedule:
+        delete_schedules(db, MaintenanceSchedule.id == schedule_id)
+        # Deleted in bulk, so the instance is detached to keep its values after the commit
+        db.expunge(db_schedule)
+        db.commit()
+        return db_schedule
+    return None
+
+
+def delete_schedules(db: Session, *criteria):
+    """ Delete the schedules matching the criteria in the current transaction, detaching their booked requests """
+    schedules = db.query(MaintenanceSchedule.id, MaintenanceSchedule.garage_id).filter(*criteria).all()
+    if not schedules:
+        return
+    schedule_ids = [schedule.id for schedule in schedules]
+    db.query(MaintenanceRequest).filter(MaintenanceRequest.schedule_id.in_(schedule_ids)) \
+        .update({MaintenanceRequest.schedule_id: None, MaintenanceRequest.occurrence_date: None},
+                synchronize_session=False)
+    db.query(MaintenanceSchedule).filter(MaintenanceSchedule.id.in_(schedule_ids)).delete(synchronize_session=False)
+    bump_versions(db, "maintenance_schedules", "maintenance_requests")
+    invalidate_on_commit(db, *{f"reports:garage:{schedule.garage_id}" for schedule in schedules})
+
+
+@retry_on_lock
+def book_occurrence(db: Session, schedule_id: int, occurrence_date: str):
+    """ Turn an occurrence of a schedule into a maintenance request, which replaces it in the listings and reports """
+    db_schedule = db.query(MaintenanceSchedule).filter(MaintenanceSchedule.id == schedule_id).first()
+    if not db_schedule:
+        raise HTTPException(status_code=404, detail="Maintenance schedule not found")
+    day = parse_date(occurrence_date)
+    if day not in occurrences_between(db_schedule, day, day):
+        raise HTTPException(status_code=400, detail=f"No occurrence of schedule {schedule_id} on {day:%Y-%m-%d}.")
+    if day < date.today():
+        raise HTTPException(status_code=400, detail="Scheduled date cannot be in the past.")
+
+    db_request = MaintenanceRequest(
+        car_id=db_schedule.car_id,
+        service_type=db_schedule.service_type,
+        scheduled_date=day,
+        garage_id=db_schedule.garage_id,
+        schedule_id=schedule_id,
+        occurrence_date=day
+    )
+    booked_detail = f"Occurrence of schedule {schedule_id} on {day:%Y-%m-%d} is already booked."
+    if db.query(MaintenanceRequest.id).filter(MaintenanceRequest.schedule_id == schedule_id,
+                                              MaintenanceRequest.occurrence_date == day).first():
+        raise HTTPException(status_code=409, detail=booked_detail)
+
+    reserve_slot(db, db_request.garage_id, db_request.scheduled_date, booking_occurrence=True)
+    # The unique (schedule, occurrence) index still rejects an occurrence booked twice concurrently
+    try:
+        db.add(db_request)
+        db.flush()
+        add_service_counts(db, MaintenanceRequest.id == db_request.id)
+        bump_versions(db, "maintenance_requests")
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=booked_detail)
+    db.refresh(db_request)
+    return db_request
+
+
+def check_schedule_capacity(db: Session, schedule: MaintenanceSchedule):
+    """ Reject a schedule, flushed as it would be saved, whose occurrences overfill a day of its garage
+
+    The unbounded recurrences are checked over the next schedule_capacity_check_days days only.
+    """
+    first_day = max(schedule.start_date, date.today())
+    last_day = date.today() + timedelta(days=settings.schedule_capacity_check_days - 1)
+    days = occurrences_between(schedule, first_day, last_day)
+    if not days:
+        return
+
+    # Read after the flush, so the counts include the occurrences of this schedule not booked yet, and on SQLite
+    # after taking the write lock, so that two schedules written concurrently cannot both fit the same slot
+    capacity = db.query(Garage.capacity).filter(Garage.id == schedule.garage_id).scalar()
+    requests = get_occupancy(db, schedule.garage_id, days[0], days[-1])
+    held = count_scheduled_occurrences(db, days[0], days[-1], [schedule.garage_id])
+    for day in days:
+        if requests.get(day, 0) + held[(schedule.garage_id, day)] > capacity:
+            raise HTTPException(status_code=409, detail=fully_booked_detail(schedule.garage_id, day))
+
+
+def check_garage_exists(db: Session, garage_id: int):
+    """ Reject a maintenance schedule of a missing garage """
+    if not db.query(Garage.id).filter(Garage.id == garage_id).first():
+        raise HTTPException(status_code=404, detail="Garage not found")
+
+
+def validate_recurrence(schedule):
+    """ Reject a schedule whose recurrence has no occurrence or cannot be expanded """
+    if schedule.frequency not in SCHEDULE_FREQUENCIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid frequency: {schedule.frequency}, it should be one of {', '.join(SCHEDULE_FREQUENCIES)}."
+        )
+    if schedule.interval <= 0:
+        raise HTTPException(status_code=400, detail=f"Interval should be a positive number: {schedule.interval}.")
+    if schedule.occurrence_count is not None and schedule.occurrence_count <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Occurrence count should be a positive number: {schedule.occurrence_count}."
+        )
+    if schedule.until_date is not None and schedule.until_date < schedule.start_date:
+        raise HTTPException(status_code=400, detail="Until date cannot be before the start date.")
@@ -0,0 +1,118 @@
+import re
+from typing import List
+from sqlalchemy import and_, bindparam, or_, text
+from sqlalchemy.orm import Session, selectinload
+from car_management_backend.app.config import settings
+from car_management_backend.app.models.car import Car
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.search import SEARCH_TABLES
+
+# Words as split by the unicode61 tokenizer of the search tables
+SEARCH_WORD = re.compile(r"[^\W_]+")
+
+
+def is_search_indexed(db: Session):
+    """ Whether the database has the FTS5 search tables, only SQLite does """
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def index_cars(db: Session, cars: List[Car]):
+    """ Add or refresh cars in the search index in the current transaction """
+    index_rows(db, "cars_search", [
+        {"rowid": car.id, "make": car.make, "model": car.model, "license_plate": car.license_plate} for car in cars
+    ])
+
+
+def index_garages(db: Session, garages: List[Garage]):
+    """ Add or refresh garages in the search index in the current transaction """
+    index_rows(db, "garages_search", [
+        {"rowid": garage.id, "name": garage.name, "location": garage.location, "city": garage.city}
+        for garage in garages
+    ])
+
+
+def unindex_cars(db: Session, car_ids):
+    """ Remove cars from the search index in the current transaction """
+    unindex_rows(db, "cars_search", car_ids)
+
+
+def unindex_garages(db: Session, garage_ids):
+    """ Remove garages from the search index in the current transaction """
+    unindex_rows(db, "garages_search", garage_ids)
+
+
+def index_rows(db: Session, table_name: str, rows: List[dict]):
+    """ Replace the indexed text of the rows of a search table """
+    if not rows or not is_search_indexed(db):
+        return
+    unindex_rows(db, table_name, [row["rowid"] for row in rows])
+    columns = SEARCH_TABLES[table_name]
+    db.execute(
+        text(f"INSERT INTO {table_name} (rowid, {', '.join(columns)}) "
+             f"VALUES (:rowid, {', '.join(f':{column}' for column in columns)})"),
+        rows
+    )
+
+
+def unindex_rows(db: Session, table_name: str, row_ids):
+    """ Remove rows from a search table """
+    if not row_ids or not is_search_indexed(db):
+        return
+    db.execute(
+        text(f"DELETE FROM {table_name} WHERE rowid IN :row_ids").bindparams(bindparam("row_ids", expanding=True)),
+        {"row_ids": list(row_ids)}
+    )
+
+
+def rebuild_search_index(db: Session):
+    """ Recompute the search tables from the cars and garages """
+    if not is_search_indexed(db):
+        return
+    for table_name, source_table in (("cars_search", "cars"), ("garages_search", "garages")):
+        columns = ", ".join(SEARCH_TABLES[table_name])
+        db.execute(text(f"DELETE FROM {table_name}"))
+        db.execute(text(f"INSERT INTO {table_name} (rowid, {columns}) SELECT id, {columns} FROM {source_table}"))
+    db.commit()
+
+
+def search(db: Session, query: str, limit: int = 20):
+    """ Find the cars and garages having all the words of the query as word prefixes, the most relevant first """
+    words = SEARCH_WORD.findall(query)
+    if not words:
+        return [], []
+
+    if is_search_indexed(db):
+        # Every word is quoted, so that the query cannot use the FTS5 syntax, and matched as a prefix
+        match = " ".join(f'"{word}"*' for word in words)
+        car_ids = search_ids(db, "cars_search", match, limit)
+        garage_ids = search_ids(db, "garages_search", match, limit)
+    else:
+        car_ids = like_search_ids(db, Car, [Car.make, Car.model, Car.license_plate], words, limit)
+        garage_ids = like_search_ids(db, Garage, [Garage.name, Garage.location, Garage.city], words, limit)
+
+    cars = db.query(Car).options(selectinload(Car.garages)).filter(Car.id.in_(car_ids)).all() if car_ids else []
+    garages = db.query(Garage).filter(Garage.id.in_(garage_ids)).all() if garage_ids else []
+    # Back to the order of relevance
+    car_ranks = {car_id: rank for rank, car_id in enumerate(car_ids)}
+    garage_ranks = {garage_id: rank for rank, garage_id in enumerate(garage_ids)}
+    cars.sort(key=lambda car: car_ranks[car.id])
+    garages.sort(key=lambda garage: garage_ranks[garage.id])
+    return cars, garages
+
+
+def search_ids(db: Session, table_name: str, match: str, limit: int):
+    """ IDs of the rows of a search table matching an FTS5 query, by bm25 rank """
+    # Only the first matches are ranked, as scoring all the rows having a word as common as a make costs more
+    # than the difference it makes to the first results
+    rows = db.execute(
+        text(f"SELECT rowid FROM (SELECT rowid, rank FROM {table_name} WHERE {table_name} MATCH :match "
+             f"LIMIT :ranked_matches) ORDER BY rank LIMIT :limit"),
+        {"match": match, "ranked_matches": max(limit, settings.search_ranked_matches), "limit": limit}
+    )
+    return [row.rowid for row in rows]
+
+
+def like_search_ids(db: Session, model, columns, words: List[str], limit: int):
+    """ IDs of the rows having every word in one of the columns, for the databases without the search tables """
+    criteria = and_(*(or_(*(column.ilike(f"%{word}%") for column in columns)) for word in words))
+    return [row.id for row in db.query(model.id).filter(criteria).order_by(model.id).limit(limit)]
@@ -0,0 +1,98 @@
+from collections import Counter
+from sqlalchemy import bindparam, func
+from sqlalchemy.orm import Session
+from car_management_backend.app.crud_operations.occupancy import get_upsert_insert
+from car_management_backend.app.models.car import Car
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.service_count import MonthlyServiceCount
+
+
+def month_of(db: Session, column):
+    """ SQL expression of the YYYY-MM month of a date column """
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def count_requests(db: Session, *criteria):
+    """ Number of the maintenance requests matching the criteria per (month, make, production year, service type) """
+    month = month_of(db, MaintenanceRequest.scheduled_date)
+    rows = (
+        db.query(month, Car.make, Car.production_year, MaintenanceRequest.service_type,
+                 func.count(MaintenanceRequest.id))
+            .join(Car, Car.id == MaintenanceRequest.car_id)
+            .filter(*criteria)
+            .group_by(month, Car.make, Car.production_year, MaintenanceRequest.service_type)
+    )
+    return Counter({(month, make, production_year, service_type): count
+                    for month, make, production_year, service_type, count in rows})
+
+
+def add_service_counts(db: Session, *criteria):
+    """ Count the maintenance requests matching the criteria, once they are written in the current transaction """
+    adjust_service_counts(db, count_requests(db, *criteria))
+
+
+def release_service_counts(db: Session, *criteria):
+    """ Remove the maintenance requests matching the criteria from the counts, before they are changed or deleted """
+    adjust_service_counts(db, Counter({key: -count for key, count in count_requests(db, *criteria).items()}))
+
+
+def adjust_service_counts(db: Session, deltas: Counter):
+    """ Add the request count changes per (month, make, production year, service type) in the current transaction """
+    rows = [
+        {"count_month": month, "count_make": make, "count_production_year": production_year,
+         "count_service_type": service_type, "delta": delta}
+        for (month, make, production_year, service_type), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+
+    table = MonthlyServiceCount.__table__
+    upsert_insert = get_upsert_insert(db)
+    if upsert_insert is not None:
+        statement = upsert_insert(table).values(
+            month=bindparam("count_month"),
+            make=bindparam("count_make"),
+            production_year=bindparam("count_production_year"),
+            service_type=bindparam("count_service_type"),
+            request_count=bindparam("delta")
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.month, table.c.make, table.c.production_year, table.c.service_type],
+            set_={"request_count": table.c.request_count + statement.excluded.request_count}
+        )
+        db.execute(statement, rows)
+        return
+
+    # Other dialects update the existing rows and insert the missing ones
+    for row in rows:
+        updated = db.execute(
+            table.update()
+                .where(table.c.month == row["count_month"], table.c.make == row["count_make"],
+                       table.c.production_year == row["count_production_year"],
+                       table.c.service_type == row["count_service_type"])
+                .values(request_count=table.c.request_count + row["delta"])
+        )
+        if updated.rowcount == 0:
+            db.execute(table.insert().values(month=row["count_month"], make=row["count_make"],
+                                             production_year=row["count_production_year"],
+                                             service_type=row["count_service_type"], request_count=row["delta"]))
+
+
+def rebuild_service_counts(db: Session):
+    """ Recompute the whole monthly service counts table from the maintenance requests """
+    db.query(MonthlyServiceCount).delete(synchronize_session=False)
+    month = month_of(db, MaintenanceRequest.scheduled_date)
+    counts = (
+        db.query(month, Car.make, Car.production_year, MaintenanceRequest.service_type,
+                 func.count(MaintenanceRequest.id))
+            .join(Car, Car.id == MaintenanceRequest.car_id)
+            .group_by(month, Car.make, Car.production_year, MaintenanceRequest.service_type)
+    )
+    db.execute(
+        MonthlyServiceCount.__table__.insert().from_select(
+            ["month", "make", "production_year", "service_type", "request_count"], counts
+        )
+    )
+    db.commit()
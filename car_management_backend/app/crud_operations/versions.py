@@ -0,0 +1,70 @@
+from typing import Optional, Sequence
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session
+from car_management_backend.app.crud_operations.occupancy import get_upsert_insert
+from car_management_backend.app.models.table_version import TableVersion
+
+ETAG_HEADER = "ETag"
+
+
+def bump_versions(db: Session, *table_names: str):
+    """ Increment the change counters of the tables in the current transaction """
+    # Sorted so that concurrent writers lock the counter rows in the same order
+    rows = [{"version_table_name": table_name} for table_name in sorted(set(table_names))]
+    table = TableVersion.__table__
+    upsert_insert = get_upsert_insert(db)
+    if upsert_insert is not None:
+        statement = upsert_insert(table).values(table_name=bindparam("version_table_name"), version=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.table_name],
+            set_={"version": table.c.version + 1}
+        )
+        db.execute(statement, rows)
+        return
+
+    # Other dialects update the existing counters and insert the missing ones
+    for row in rows:
+        updated = db.execute(
+            table.update()
+                .where(table.c.table_name == row["version_table_name"])
+                .values(version=table.c.version + 1)
+        )
+        if updated.rowcount == 0:
+            db.execute(table.insert().values(table_name=row["version_table_name"], version=1))
+
+
+def get_versions_etag(db: Session, table_names: Sequence[str]):
+    """ Build the ETag of a listing from the change counters of the tables it reads """
+    return make_etag(*get_versions(db, table_names))
+
+
+def get_row_etag(db: Session, model, row_id: int, table_names: Sequence[str] = ()):
+    """ Build the ETag of a single row from its last update and the change counters of the tables it embeds """
+    updated_at = db.query(model.updated_at).filter(model.id == row_id).scalar()
+    if updated_at is None:
+        return None
+    return make_etag(f"{model.__tablename__}.{row_id}.{updated_at:%Y%m%d%H%M%S%f}", *get_versions(db, table_names))
+
+
+def get_versions(db: Session, table_names: Sequence[str]):
+    """ Get the change counters of the tables as table.version parts, the missing ones being at 0 """
+    if not table_names:
+        return []
+    versions = dict(
+        db.query(TableVersion.table_name, TableVersion.version).filter(TableVersion.table_name.in_(table_names))
+    )
+    return [f"{table_name}.{versions.get(table_name, 0)}" for table_name in table_names]
+
+
+def make_etag(*parts: str):
+    """ Build a weak ETag, as the same data may be sent with different encodings """
+    return 'W/"' + "-".join(parts) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]):
+    """ Whether the If-None-Match header of a request matches the current ETag, with the weak comparison """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
@@ -0,0 +1,12 @@
+from fastapi import Request
+from car_management_backend.app.models.database import open_session
+
+# Methods of the requests that only read, whose sessions may read from the read replica
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+# Get the database session, shared by all the routers. The requests that may write use the primary from the start,
+# the checks and counts their writes are based on must not be read from a lagging replica
+async def get_db(request: Request):
+    async with open_session(writing=request.method not in READ_METHODS) as db:
+        yield db
@@ -0,0 +1,288 @@
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Optional
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from car_management_backend.app.config import settings
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestMetrics:
+    """ Timings of a single request, filled by the SQL hooks, the timed routes and the middleware """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.handler_started = None
+        self.route = None
+        self.statement_count = 0
+        self.sql_time = 0.0
+        self.slowest_statement_time = 0.0
+        self.slowest_statement = None
+        self.dependencies_time = 0.0
+        self.endpoint_time = 0.0
+        self.serialization_time = 0.0
+        # Profiles of the CRUD calls run in the threadpool, merged into the request profile
+        self.profiles = None
+        self.lock = threading.Lock()
+
+    def add_statement(self, statement: str, elapsed: float):
+        with self.lock:
+            self.statement_count += 1
+            self.sql_time += elapsed
+            if elapsed > self.slowest_statement_time:
+                self.slowest_statement_time = elapsed
+                self.slowest_statement = statement
+
+    def server_timing(self):
+        """ Server-Timing header value, durations in milliseconds """
+        total = time.perf_counter() - self.started
+        slowest = re.sub(r"\s+", " ", self.slowest_statement or "")[:80].replace('"', "'")
+        return ", ".join([
+            f'db;dur={self.sql_time * 1000:.2f};desc="{self.statement_count} statements"',
+            f'db-slowest;dur={self.slowest_statement_time * 1000:.2f};desc="{slowest}"',
+            f"deps;dur={self.dependencies_time * 1000:.2f}",
+            f"app;dur={max(self.endpoint_time - self.sql_time, 0) * 1000:.2f}",
+            f"serialize;dur={self.serialization_time * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+
+current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar("current_metrics", default=None)
+
+
+class RouteMetrics:
+    """ Per route latency histograms and SQL totals, rendered in the Prometheus text format """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, metrics: RequestMetrics, elapsed: float):
+        key = (method, route, str(status))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0,
+                                             "statements": 0, "sql": 0.0}
+            for index, bound in enumerate(self.buckets):
+                if elapsed <= bound:
+                    series["buckets"][index] += 1
+            series["count"] += 1
+            series["sum"] += elapsed
+            series["statements"] += metrics.statement_count
+            series["sql"] += metrics.sql_time
+
+    def render(self):
+        with self.lock:
+            series = {key: {**values, "buckets": list(values["buckets"])} for key, values in self.series.items()}
+
+        lines = [
+            "# HELP http_request_duration_seconds Latency of the requests per route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), values in sorted(series.items()):
+            labels = f'method="{method}",route="{route}",status="{status}"'
+            for bound, count in zip(self.buckets, values["buckets"]):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {values["count"]}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {values['sum']:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {values['count']}")
+
+        lines += [
+            "# HELP db_statements_total SQL statements executed per route.",
+            "# TYPE db_statements_total counter",
+        ]
+        for (method, route, status), values in sorted(series.items()):
+            lines.append(f'db_statements_total{{method="{method}",route="{route}",status="{status}"}} '
+                         f'{values["statements"]}')
+        lines += [
+            "# HELP db_duration_seconds_total Time spent executing SQL per route.",
+            "# TYPE db_duration_seconds_total counter",
+        ]
+        for (method, route, status), values in sorted(series.items()):
+            lines.append(f'db_duration_seconds_total{{method="{method}",route="{route}",status="{status}"}} '
+                         f'{values["sql"]:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+route_metrics = RouteMetrics()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record_statement(conn, statement)
+
+
+def handle_error(exception_context):
+    # A statement that raised has no after_cursor_execute, its start is removed here and it is counted all the same
+    if exception_context.execution_context is not None and exception_context.connection is not None \
+            and exception_context.connection.info.get("query_started"):
+        record_statement(exception_context.connection, exception_context.statement)
+
+
+def record_statement(conn, statement: str):
+    started = conn.info["query_started"].pop()
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.add_statement(statement, time.perf_counter() - started)
+
+
+class TimedRoute(APIRoute):
+    """ Route measuring the dependencies, the endpoint and the response serialization of its requests """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not settings.instrumentation_enabled:
+            return handler
+
+        async def timed_handler(request):
+            metrics = current_metrics.get()
+            if metrics is None:
+                return await handler(request)
+            metrics.route = self.path
+            metrics.handler_started = time.perf_counter()
+            response = await handler(request)
+            # What is not spent before and in the endpoint is the response validation and rendering
+            metrics.serialization_time = max(time.perf_counter() - metrics.handler_started
+                                             - metrics.dependencies_time - metrics.endpoint_time, 0)
+            return response
+
+        return timed_handler
+
+
+def timed_endpoint(endpoint):
+    """ Wrap an endpoint to record its own duration and the time spent before it resolving the dependencies """
+    if not settings.instrumentation_enabled:
+        return endpoint
+
+    def start():
+        metrics = current_metrics.get()
+        if metrics is not None and metrics.handler_started is not None:
+            metrics.dependencies_time = time.perf_counter() - metrics.handler_started
+        return metrics, time.perf_counter()
+
+    def stop(metrics, started):
+        if metrics is not None:
+            metrics.endpoint_time = time.perf_counter() - started
+
+    # FastAPI reads the parameters through __wrapped__ and runs sync endpoints in the threadpool, as before
+    if iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            metrics, started = start()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                stop(metrics, started)
+    else:
+        @wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            metrics, started = start()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                stop(metrics, started)
+    return wrapper
+
+
+def profiled(function):
+    """ Wrap a function run in a worker thread to profile it too when its request is profiled """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.profiles is None:
+        return function
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            metrics.profiles.append(profile)
+    return wrapper
+
+
+class InstrumentationMiddleware:
+    """ ASGI middleware timing every request, adding its Server-Timing header and profiling a sample of them """
+
+    # The profiler hooks the event loop thread, so only one request is profiled at a time
+    profiling = threading.Lock()
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        status = 500
+        profile = None
+        if settings.profile_sample_rate and random.random() < settings.profile_sample_rate \
+                and self.profiling.acquire(blocking=False):
+            profile = cProfile.Profile()
+            metrics.profiles = []
+            profile.enable()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", metrics.server_timing().encode("latin-1", "replace")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - metrics.started
+            if profile is not None:
+                profile.disable()
+                self.profiling.release()
+                if elapsed * 1000 >= settings.profile_threshold_ms:
+                    dump_profile(profile, metrics, scope["method"], elapsed)
+            route_metrics.observe(scope["method"], metrics.route or "unmatched", status, metrics, elapsed)
+            current_metrics.reset(token)
+
+
+def dump_profile(profile: cProfile.Profile, metrics: RequestMetrics, method: str, elapsed: float):
+    """ Write the merged profile of a slow request to the profile directory, for snakeviz or pstats """
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    route = re.sub(r"[^A-Za-z0-9]+", "_", metrics.route or "unmatched").strip("_")
+    path = os.path.join(settings.profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{route}-"
+                                              f"{elapsed * 1000:.0f}ms.prof")
+    stats = pstats.Stats(profile)
+    for thread_profile in metrics.profiles:
+        stats.add(thread_profile)
+    stats.dump_stats(path)
+
+
+def install_instrumentation(app):
+    """ Time the requests of the app and the SQL of every engine, when enabled in the settings """
+    if not settings.instrumentation_enabled:
+        return
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(Engine, "handle_error", handle_error)
+    app.add_middleware(InstrumentationMiddleware)
@@ -0,0 +1,235 @@
+# Background jobs: the heavy reports and the imports are queued in the jobs table and run by a bounded pool of
+# worker processes, each with its own DB engines. The queue is the database itself, so no broker is needed, and
+# jobs queued by any server process are run by the first idle worker. The process ids identify the workers, the
+# servers sharing a queue are expected to run on the same host, as they do with a local SQLite file.
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from contextlib import closing
+from typing import List, NamedTuple, Optional
+from fastapi import HTTPException
+from pydantic import parse_obj_as
+from car_management_backend.app.cache import ForwardingCacheBackend, build_backend, response_cache
+from car_management_backend.app.config import Settings, configure, settings
+from car_management_backend.app.crud_operations import analytics, cars, jobs as job_crud, \
+    maintenance_requests, reports
+from car_management_backend.app.models.database import get_engines, use_primary
+from car_management_backend.app.schemas.car import CarCreate
+from car_management_backend.app.schemas.maintenance import MaintenanceRequestCreate
+from car_management_backend.app.serializers import encode_json
+
+logger = logging.getLogger(__name__)
+
+
+class JobKind(NamedTuple):
+    """ CRUD function run by a kind of job, called unchanged with a session of the worker and the job arguments """
+    function: object
+    # Pydantic types of the arguments stored as plain JSON, e.g. the items of an import
+    argument_types: dict = {}
+    # List argument split into batches of max_bulk_items, each committed on its own, reporting the progress
+    batched_argument: Optional[str] = None
+
+
+JOB_KINDS = {
+    "dailyAvailabilityReport": JobKind(reports.get_daily_availability_report),
+    "monthlyRequestsReport": JobKind(reports.get_requests_per_month),
+    "monthlyRequestsReportByGarage": JobKind(reports.get_requests_per_month_for_garages),
+    "garageUtilization": JobKind(analytics.get_garage_utilization),
+    "serviceMix": JobKind(analytics.get_service_mix),
+    "cityLoadHeatmap": JobKind(analytics.get_city_load_heatmap),
+    "carImport": JobKind(cars.create_cars, {"cars": List[CarCreate]}, batched_argument="cars"),
+    "maintenanceImport": JobKind(maintenance_requests.create_maintenance_requests,
+                                 {"maintenance_requests": List[MaintenanceRequestCreate]},
+                                 batched_argument="maintenance_requests"),
+}
+
+
+def run_worker(settings_values: dict, wakeup, invalidations):
+    """ Main loop of a worker process: claim the oldest queued job, run it, record its outcome, and again """
+    # Stopped by its supervisor, not by the Ctrl+C of the server sent to the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure(Settings(**settings_values))
+    # Invalidations of a memory cache are sent to the server process owning it
+    if settings.cache_backend == "memory":
+        response_cache.configure(ForwardingCacheBackend(invalidations.send), enabled=settings.cache_enabled)
+    else:
+        response_cache.configure(build_backend(), enabled=settings.cache_enabled)
+
+    session_factory = get_engines()["SessionLocal"]
+    worker_pid = os.getpid()
+    while True:
+        # The queue is read and written on the primary, a lagging replica would show jobs claimed already
+        with closing(use_primary(session_factory())) as db:
+            job = job_crud.claim_job(db, worker_pid)
+        if job is None:
+            wakeup.acquire(timeout=settings.job_poll_interval_seconds)
+            continue
+        run_job(session_factory, *job)
+
+
+def run_job(session_factory, job_id: int, kind: str, arguments: dict):
+    """ Run a claimed job and record its result or the reason of its failure """
+    try:
+        job_kind = JOB_KINDS.get(kind)
+        if job_kind is None:
+            raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}.")
+        for name, argument_type in job_kind.argument_types.items():
+            arguments[name] = parse_obj_as(argument_type, arguments[name])
+
+        if job_kind.batched_argument:
+            result = run_batches(session_factory, job_id, job_kind, arguments)
+        else:
+            # Each job gets its own session, which the CRUD function commits or rolls back as it would in a request
+            with closing(session_factory()) as db:
+                result = job_kind.function(db=db, **arguments)
+        status, result, error = "SUCCEEDED", encode_json(result, non_str_keys=True).decode(), None
+    except HTTPException as exception:
+        status, result, error = "FAILED", None, str(exception.detail)
+    except Exception as exception:
+        logger.exception("Job %s failed", job_id)
+        status, result, error = "FAILED", None, f"{type(exception).__name__}: {exception}"
+
+    with closing(use_primary(session_factory())) as db:
+        job_crud.finish_job(db, job_id, status, result=result, error=error)
+
+
+def run_batches(session_factory, job_id: int, job_kind: JobKind, arguments: dict):
+    """ Run a bulk CRUD function on batches of its items, merging their created IDs and their errors """
+    items = arguments[job_kind.batched_argument]
+    merged = {"created": [], "errors": []}
+    for offset in range(0, len(items), settings.max_bulk_items):
+        batch = items[offset:offset + settings.max_bulk_items]
+        # The imports write, their checks are read on the primary as in a request
+        with closing(use_primary(session_factory())) as db:
+            result = job_kind.function(db=db, **{**arguments, job_kind.batched_argument: batch})
+        merged["created"].extend(result["created"])
+        # The error indexes are the ones of the whole import
+        merged["errors"].extend({**error, "index": error["index"] + offset} for error in result["errors"])
+
+        # The batches already committed stay imported if the job is cancelled, as told by its partial result
+        done = min(offset + settings.max_bulk_items, len(items))
+        with closing(use_primary(session_factory())) as db:
+            job_crud.update_job_progress(db, job_id, done / len(items), encode_json(merged).decode())
+    return merged
+
+
+class JobPool:
+    """ Bounded pool of job worker processes, watched by a supervisor thread of the server process
+
+    The supervisor stops the workers running a cancelled job, replaces the workers that died, failing their job,
+    and applies the cache invalidations of the jobs to the memory cache of the server.
+    """
+
+    def __init__(self):
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = {}
+        self.wakeup = None
+        self.stopping = threading.Event()
+        self.supervisor = None
+
+    def start(self):
+        """ Start the workers and their supervisor, after queuing again the jobs of the workers gone with a server """
+        if settings.job_workers <= 0 or self.supervisor is not None:
+            return
+        with closing(use_primary(get_engines()["SessionLocal"]())) as db:
+            orphan_pids = [pid for pid in job_crud.get_running_job_pids(db) if not is_process_alive(pid)]
+            job_crud.release_jobs(db, orphan_pids, "QUEUED")
+
+        self.wakeup = self.context.Semaphore(0)
+        self.stopping.clear()
+        for _ in range(settings.job_workers):
+            self.start_worker()
+        self.supervisor = threading.Thread(target=self.supervise, name="job-supervisor", daemon=True)
+        self.supervisor.start()
+
+    def stop(self):
+        """ Stop the workers, their running jobs are queued again for the next start """
+        if self.supervisor is None:
+            return
+        self.stopping.set()
+        self.supervisor.join()
+        self.supervisor = None
+        worker_pids = list(self.workers)
+        self.stop_workers(worker_pids)
+        with closing(use_primary(get_engines()["SessionLocal"]())) as db:
+            job_crud.release_jobs(db, worker_pids, "QUEUED")
+
+    def notify(self):
+        """ Wake up an idle worker for a job just queued, instead of waiting for its next look at the queue """
+        if self.supervisor is not None:
+            self.wakeup.release()
+
+    def start_worker(self):
+        # A pipe per worker, which a killed worker can only break for itself
+        invalidations, worker_invalidations = self.context.Pipe(duplex=False)
+        worker = self.context.Process(target=run_worker, args=(settings.dict(), self.wakeup, worker_invalidations),
+                                      name="job-worker", daemon=True)
+        worker.start()
+        worker_invalidations.close()
+        self.workers[worker.pid] = (worker, invalidations)
+
+    def stop_workers(self, worker_pids: List[int]):
+        for pid in worker_pids:
+            self.workers[pid][0].terminate()
+        for pid in worker_pids:
+            self.remove_worker(pid)
+
+    def remove_worker(self, pid: int):
+        """ Forget a stopped worker, once the invalidations of the jobs it committed are applied """
+        worker, invalidations = self.workers.pop(pid)
+        worker.join()
+        self.apply_invalidations(invalidations)
+        invalidations.close()
+
+    def supervise(self):
+        while not self.stopping.wait(settings.job_poll_interval_seconds):
+            try:
+                for _, invalidations in self.workers.values():
+                    self.apply_invalidations(invalidations)
+                with closing(use_primary(get_engines()["SessionLocal"]())) as db:
+                    # Killing the worker rolls back the transaction of the job, the batches of an import excepted
+                    cancelled_jobs = job_crud.get_cancelled_jobs(db, list(self.workers))
+                    cancelled_pids = list({job.worker_pid for job in cancelled_jobs})
+                    self.stop_workers(cancelled_pids)
+                    for job in cancelled_jobs:
+                        job_crud.finish_job(db, job.id, "CANCELLED")
+                    # A job claimed by one of these workers since the cancellation was read is queued again
+                    job_crud.release_jobs(db, cancelled_pids, "QUEUED")
+
+                    dead_pids = [pid for pid, (worker, _) in self.workers.items() if not worker.is_alive()]
+                    for pid in dead_pids:
+                        exit_code = self.workers[pid][0].exitcode
+                        self.remove_worker(pid)
+                        job_crud.release_jobs(db, [pid], "FAILED", f"Job worker exited with code {exit_code}.")
+                # Back to the full pool, also after a failure above
+                while len(self.workers) < settings.job_workers:
+                    self.start_worker()
+            except Exception:
+                logger.exception("Job supervision failed")
+
+    @staticmethod
+    def apply_invalidations(invalidations):
+        """ Invalidate the memory cache entries of the tags sent by a worker so far """
+        try:
+            while invalidations.poll():
+                response_cache.invalidate(*invalidations.recv())
+        except (EOFError, OSError):
+            # The pipe of a dead worker, whatever it sent completely was applied
+            pass
+
+
+def is_process_alive(pid: int):
+    """ Whether a process of this host still runs """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Started by the app on startup, when job_workers is positive
+job_pool = JobPool()
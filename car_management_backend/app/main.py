@@ -1,17 +1,72 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from car_management_backend.app.routers import garage, car, maintenance
+from car_management_backend.app.config import Settings, configure, settings
 
-app = FastAPI()
+# Values of the settings the app of this process was built with. The modules read the shared settings, the engines
+# are shared and the routers decide on their instrumentation when first imported, so a second app with other
+# settings would silently switch the first one to them
+built_settings = None
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-app.include_router(garage.router)
-app.include_router(car.router)
-app.include_router(maintenance.router)
+def create_app(app_settings: Settings = None):
+    """ Build the API from the settings, the database engines are only created by the first request
+
+    Only one app per process is supported: building another one is allowed with the same settings only.
+    """
+    global built_settings
+    # The routers are imported here, so that importing this module stays cheap and they see the settings
+    from car_management_backend.app.cache import build_backend, response_cache
+    from car_management_backend.app.crud_operations.pagination import NEXT_CURSOR_HEADER
+    from car_management_backend.app.crud_operations.versions import ETAG_HEADER
+    from car_management_backend.app.instrumentation import install_instrumentation
+    from car_management_backend.app.jobs import job_pool
+    from car_management_backend.app.models.database import dispose_engines, reset_engines
+
+    values = (app_settings or settings).dict()
+    if built_settings is not None and values != built_settings:
+        raise RuntimeError("An app was already built in this process with other settings, only one is supported.")
+    # Another app of the same settings shares the engines and the cache of the first one
+    if built_settings is None:
+        if app_settings is not None:
+            configure(app_settings)
+            # Engines built from the previous settings are dropped, the next session builds them from these ones
+            reset_engines()
+        response_cache.configure(build_backend(), enabled=settings.cache_enabled)
+        built_settings = values
+
+    from car_management_backend.app.routers import garage, car, maintenance, schedule, analytics, job, \
+        cache, search, metrics
+
+    app = FastAPI()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER, "Server-Timing"],
+    )
+    install_instrumentation(app)
+    # The job workers are stopped before the engines their supervisor uses
+    app.add_event_handler("startup", job_pool.start)
+    app.add_event_handler("shutdown", job_pool.stop)
+    app.add_event_handler("shutdown", dispose_engines)
+
+    app.include_router(garage.router)
+    app.include_router(car.router)
+    app.include_router(maintenance.router)
+    app.include_router(schedule.router)
+    app.include_router(analytics.router)
+    app.include_router(job.router)
+    app.include_router(cache.router)
+    app.include_router(search.router)
+    app.include_router(metrics.router)
+    return app
+
+
+def __getattr__(name):
+    # The app of the default settings for "car_management_backend.app.main:app", built on first access
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, func
 from sqlalchemy.orm import relationship
 from car_management_backend.app.models.database import Base
 from car_management_backend.app.models.car_garage import car_garage
@@ -13,8 +14,13 @@ class Car(Base):
     model = Column(String, nullable=False)
     production_year = Column(Integer, nullable=False)
     license_plate = Column(String, nullable=False)
+    # Upper-cased and without whitespace, identifies the car whatever way the plate was typed or scanned
+    normalized_plate = Column(String, nullable=False, unique=True, index=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                        server_default=func.current_timestamp())
 
-    garages = relationship("Garage", secondary=car_garage, back_populates="cars")
+    # Ordered, so that the garages of a car are always listed the same way
+    garages = relationship("Garage", secondary=car_garage, back_populates="cars", order_by="Garage.id")
     maintenance_requests = relationship("MaintenanceRequest", backref="car",
                                         lazy="dynamic", cascade="all, delete-orphan")
 
@@ -1,9 +1,234 @@
-from sqlalchemy import create_engine
+import threading
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from car_management_backend.app.config import settings
+
+# Async drivers used for the sync database URLs when the async engine is enabled
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def get_async_database_url():
+    """ Get the async engine URL, derived from the sync one unless set explicitly """
+    if settings.async_database_url:
+        return settings.async_database_url
+    return to_async_url(settings.database_url)
+
+
+def get_read_database_url():
+    """ Get the URL of the read replica, if any, read-only connections to the primary SQLite file when enabled """
+    if settings.read_database_url:
+        return settings.read_database_url
+    url = make_url(settings.database_url)
+    if settings.sqlite_read_only_connections and url.get_backend_name() == "sqlite" \
+            and url.database and url.database != ":memory:":
+        url = url.set(database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"})
+        return url.render_as_string(hide_password=False)
+    return None
+
+
+def to_async_url(url):
+    """ Swap the driver of a sync database URL for its async counterpart """
+    url = make_url(url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    return url.render_as_string(hide_password=False)
+
+
+def engine_options(url, pool_class):
+    """ Get the create_engine keyword arguments for the given URL """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return {
+            "pool_size": settings.database_pool_size,
+            "max_overflow": settings.database_max_overflow,
+            "pool_recycle": settings.database_pool_recycle,
+            "pool_pre_ping": settings.database_pool_pre_ping,
+        }
+
+    options = {"connect_args": {"check_same_thread": False}}
+    # In-memory databases live in a single connection, so they keep the dialect's default pool
+    if url.database and url.database != ":memory:":
+        options.update({
+            "poolclass": pool_class,
+            "pool_size": settings.database_pool_size,
+            "max_overflow": settings.database_max_overflow,
+            "pool_pre_ping": settings.database_pool_pre_ping,
+        })
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """ Tune every new SQLite connection for concurrent readers and writers """
+    cursor = dbapi_connection.cursor()
+    if settings.sqlite_wal:
+        # Readers no longer block behind a writer with a write-ahead log instead of the rollback journal
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+
+def set_sqlite_read_pragmas(dbapi_connection, connection_record):
+    """ Tune every new read replica SQLite connection, the journal mode is left to the primary """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+
+def is_read_statement(clause):
+    """ Whether a statement only reads, the textual ones are judged by their first keyword """
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == "SELECT"
+    return getattr(clause, "is_select", False)
+
+
+class RoutingSession(Session):
+    """ Session reading from the read replica until it writes, then from the primary for the rest of its life
+
+    Sticking to the primary after the first write lets a request read its own writes whatever the replica lag.
+    The sessions of the requests that write are sent to the primary from the start with use_primary, so that the
+    reads their writes are computed from are not stale either.
+    """
+
+    wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        read_bind = self.info.get("read_bind")
+        if read_bind is None:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self._flushing or (clause is not None and not is_read_statement(clause)):
+            self.wrote = True
+        # Without a statement, the bind is only asked for its dialect
+        if clause is None or self.wrote:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return read_bind
+
+
+def use_primary(db):
+    """ Send all the statements of a sync or async session to the primary, for a unit of work that writes """
+    getattr(db, "sync_session", db).wrote = True
+    return db
 
-DATABASE_URL = "sqlite:///car_management.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+# Names of the engines and session factories built from the settings, read as attributes of this module
+ENGINE_NAMES = ("engine", "read_engine", "SessionLocal", "async_engine", "async_read_engine", "AsyncSessionLocal")
+
+# Nothing connects to the database on import, the engines are built by the first session
+engines = {}
+engines_lock = threading.Lock()
+
+
+def build_engines():
+    """ Build the engines and session factories of the current settings """
+    engine = create_engine(settings.database_url, **engine_options(settings.database_url, QueuePool))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+
+    # Engine of the read replica, when one is configured
+    read_database_url = get_read_database_url()
+    read_engine = None
+    if read_database_url:
+        read_engine = create_engine(read_database_url, **engine_options(read_database_url, QueuePool))
+        if read_engine.dialect.name == "sqlite":
+            event.listen(read_engine, "connect", set_sqlite_read_pragmas)
+
+    built = {
+        "engine": engine,
+        "read_engine": read_engine,
+        "SessionLocal": sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession,
+                                     info={"read_bind": read_engine}),
+        "async_engine": None,
+        "async_read_engine": None,
+        "AsyncSessionLocal": None,
+    }
+
+    # Async engine (aiosqlite, asyncpg, ...) used by the routers when enabled in the settings
+    if settings.database_async:
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        async_database_url = get_async_database_url()
+        async_engine = create_async_engine(async_database_url,
+                                           **engine_options(async_database_url, AsyncAdaptedQueuePool))
+        if async_engine.dialect.name == "sqlite":
+            event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+
+        async_read_engine = None
+        if read_database_url:
+            async_read_database_url = to_async_url(read_database_url)
+            async_read_engine = create_async_engine(async_read_database_url,
+                                                    **engine_options(async_read_database_url, AsyncAdaptedQueuePool))
+            if async_read_engine.dialect.name == "sqlite":
+                event.listen(async_read_engine.sync_engine, "connect", set_sqlite_read_pragmas)
+        built["async_engine"] = async_engine
+        built["async_read_engine"] = async_read_engine
+        # The CRUD code runs on the sync session wrapped by the async one, which routes to the sync engines
+        built["AsyncSessionLocal"] = sessionmaker(
+            autocommit=False, autoflush=False, bind=async_engine, class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            info={"read_bind": async_read_engine.sync_engine if async_read_engine else None}
+        )
+    return built
+
+
+def get_engines():
+    """ Get the engines and session factories, built on first use """
+    if not engines:
+        with engines_lock:
+            if not engines:
+                engines.update(build_engines())
+    return engines
+
+
+def reset_engines():
+    """ Forget the engines, the next session builds them from the settings again, and get the forgotten ones """
+    with engines_lock:
+        built = dict(engines)
+        engines.clear()
+    for name in ("engine", "read_engine"):
+        if built.get(name) is not None:
+            built[name].dispose()
+    return built
+
+
+async def dispose_engines():
+    """ Close the pooled connections of all the engines, on shutdown """
+    built = reset_engines()
+    for name in ("async_engine", "async_read_engine"):
+        if built.get(name) is not None:
+            await built[name].dispose()
+
+
+def __getattr__(name):
+    # engine, SessionLocal, ... as module attributes, built by the first access
+    if name in ENGINE_NAMES:
+        return get_engines()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@asynccontextmanager
+async def open_session(writing: bool = False):
+    """ Open a DB session on the async engine when enabled, otherwise on the sync one, on the primary if writing """
+    session_factories = get_engines()
+    if session_factories["AsyncSessionLocal"] is not None:
+        async with session_factories["AsyncSessionLocal"]() as db:
+            if writing:
+                use_primary(db)
+            yield db
+    else:
+        db = session_factories["SessionLocal"]()
+        if writing:
+            use_primary(db)
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
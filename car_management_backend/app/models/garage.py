@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, func
 from sqlalchemy.orm import relationship
 from car_management_backend.app.models.database import Base
 from car_management_backend.app.models.car_garage import car_garage
@@ -13,5 +14,7 @@ class Garage(Base):
     location = Column(String, nullable=False)
     city = Column(String, index=True, nullable=False)
     capacity = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                        server_default=func.current_timestamp())
 
     cars = relationship("Car", secondary=car_garage, back_populates="garages")
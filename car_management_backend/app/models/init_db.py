@@ -1,8 +1,14 @@
-# Script for initial creation of the DB
+# Script for initial creation of the DB, mark it as up to date for the migrations with: alembic stamp head
 from car_management_backend.app.models.database import Base, engine
 from car_management_backend.app.models.garage import Garage
 from car_management_backend.app.models.car import Car
 from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.maintenance_schedule import MaintenanceSchedule
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy
+from car_management_backend.app.models.service_count import MonthlyServiceCount
+from car_management_backend.app.models.table_version import TableVersion
+from car_management_backend.app.models.job import Job
+from car_management_backend.app.models.search import SEARCH_TABLES
 
 
 Base.metadata.create_all(bind=engine)
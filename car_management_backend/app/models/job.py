@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import Boolean, Column, DateTime, Float, Index, Integer, String, Text
+from car_management_backend.app.models.database import Base
+
+# Lifecycle of a job: queued, then run by a worker process until it succeeds, fails or is cancelled
+JOB_STATUSES = ("QUEUED", "RUNNING", "SUCCEEDED", "FAILED", "CANCELLED")
+FINISHED_JOB_STATUSES = ("SUCCEEDED", "FAILED", "CANCELLED")
+
+
+class Job(Base):
+    """ Background run of a report or an import, the queue of the job workers is this table """
+    __tablename__ = "jobs"
+    # The workers claim the oldest queued job
+    __table_args__ = (Index("ix_jobs_status_id", "status", "id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Name of the CRUD function run by the job, and its keyword arguments as JSON
+    kind = Column(String, nullable=False)
+    arguments = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="QUEUED")
+    progress = Column(Float, nullable=False, default=0.0)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # Return value of the CRUD function as JSON, or the detail of its failure
+    result = Column(Text)
+    error = Column(Text)
+    # Process running the job, for the cancellation and the recovery of the jobs of the workers that died
+    worker_pid = Column(Integer)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -1,19 +1,39 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, Integer, String, ForeignKey, Index, func, select
+from sqlalchemy.orm import column_property, relationship
+from car_management_backend.app.models.car import Car
 from car_management_backend.app.models.database import Base
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.maintenance_schedule import MaintenanceSchedule  # noqa: F401
 
 
 class MaintenanceRequest(Base):
     """ Maintenance request model """
     __tablename__ = "maintenance_requests"
+    __table_args__ = (
+        # Cover the per garage / per car date range filters of the listing and the reports
+        Index("ix_maintenance_requests_garage_id_scheduled_date", "garage_id", "scheduled_date"),
+        Index("ix_maintenance_requests_car_id_scheduled_date", "car_id", "scheduled_date"),
+        # A schedule occurrence is booked at most once
+        Index("ix_maintenance_requests_schedule_id_occurrence_date", "schedule_id", "occurrence_date", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     car_id = Column(Integer, ForeignKey("cars.id"), nullable=False)
-    car_name = Column(String, nullable=False)
     service_type = Column(String, nullable=False)
-    scheduled_date = Column(String, nullable=False)
+    scheduled_date = Column(Date, nullable=False)
     garage_id = Column(Integer, ForeignKey("garages.id"), nullable=False)
-    garage_name = Column(String, nullable=False)
+    # Set on the requests booked from an occurrence of a schedule, which replace that occurrence
+    schedule_id = Column(Integer, ForeignKey("maintenance_schedules.id"))
+    occurrence_date = Column(Date)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                        server_default=func.current_timestamp())
+
+    # The names are read from the car and the garage in the same SELECT, so that they are never stale
+    car_name = column_property(select(Car.make).where(Car.id == car_id).correlate_except(Car).scalar_subquery())
+    garage_name = column_property(
+        select(Garage.name).where(Garage.id == garage_id).correlate_except(Garage).scalar_subquery()
+    )
 
     garage = relationship("Garage")
 
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, Integer, String, ForeignKey, func
+from car_management_backend.app.models.database import Base
+
+# Frequencies of the schedules, as in the RRULE FREQ part
+SCHEDULE_FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+
+
+class MaintenanceSchedule(Base):
+    """ Recurring maintenance of a car in a garage, its occurrences are expanded on read and never stored """
+    __tablename__ = "maintenance_schedules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    car_id = Column(Integer, ForeignKey("cars.id"), nullable=False, index=True)
+    garage_id = Column(Integer, ForeignKey("garages.id"), nullable=False, index=True)
+    service_type = Column(String, nullable=False)
+    # First occurrence, then one every interval units of the frequency (RRULE DTSTART, FREQ and INTERVAL)
+    start_date = Column(Date, nullable=False)
+    frequency = Column(String, nullable=False)
+    interval = Column(Integer, nullable=False, default=1)
+    # Optional bounds of the recurrence (RRULE UNTIL and COUNT)
+    until_date = Column(Date)
+    occurrence_count = Column(Integer)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                        server_default=func.current_timestamp())
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Date, Integer, ForeignKey
+from car_management_backend.app.models.database import Base
+
+
+class GarageDailyOccupancy(Base):
+    """ Number of maintenance requests per garage and day, maintained by the maintenance request writes """
+    __tablename__ = "garage_daily_occupancy"
+
+    garage_id = Column(Integer, ForeignKey("garages.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    request_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,10 @@
+# Script for backfilling the precomputed garage occupancy from the existing maintenance requests
+from car_management_backend.app.crud_operations.occupancy import rebuild_occupancy
+from car_management_backend.app.models.database import SessionLocal, use_primary
+
+
+db = use_primary(SessionLocal())
+try:
+    rebuild_occupancy(db)
+finally:
+    db.close()
@@ -0,0 +1,10 @@
+# Script for backfilling the search tables from the existing cars and garages
+from car_management_backend.app.crud_operations.search import rebuild_search_index
+from car_management_backend.app.models.database import SessionLocal, use_primary
+
+
+db = use_primary(SessionLocal())
+try:
+    rebuild_search_index(db)
+finally:
+    db.close()
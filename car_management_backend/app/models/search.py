@@ -0,0 +1,32 @@
+from sqlalchemy import DDL, event
+from car_management_backend.app.models.database import Base
+
+# SQLite FTS5 tables indexing the searchable text of the cars and garages, their rowid being the indexed row ID.
+# They are not mapped models: the CRUD write paths keep them in sync, see crud_operations/search.py
+SEARCH_TABLES = {
+    "cars_search": ["make", "model", "license_plate"],
+    "garages_search": ["name", "location", "city"],
+}
+# Diacritics folded, and prefix indexes for the short prefixes a search box sends while typing
+SEARCH_TOKENIZE = "unicode61 remove_diacritics 2"
+SEARCH_PREFIXES = "2 3"
+
+
+def create_search_table_ddl(table_name: str):
+    """ CREATE VIRTUAL TABLE statement of a search table """
+    columns = ", ".join(SEARCH_TABLES[table_name])
+    return (f"CREATE VIRTUAL TABLE IF NOT EXISTS {table_name} USING fts5({columns}, "
+            f"tokenize='{SEARCH_TOKENIZE}', prefix='{SEARCH_PREFIXES}')")
+
+
+def is_search_table(name: str):
+    """ Whether a table is a search table or one of the shadow tables FTS5 creates for it """
+    return any(name == table_name or name.startswith(f"{table_name}_") for table_name in SEARCH_TABLES)
+
+
+# Created and dropped with the mapped tables on SQLite, other databases search with ILIKE instead
+for search_table in SEARCH_TABLES:
+    event.listen(Base.metadata, "after_create",
+                 DDL(create_search_table_ddl(search_table)).execute_if(dialect="sqlite"))
+    event.listen(Base.metadata, "before_drop",
+                 DDL(f"DROP TABLE IF EXISTS {search_table}").execute_if(dialect="sqlite"))
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String
+from car_management_backend.app.models.database import Base
+
+
+class MonthlyServiceCount(Base):
+    """ Number of maintenance requests per month, car make, production year and service type, maintained by the
+    maintenance request and car writes for the fleet analytics """
+    __tablename__ = "monthly_service_counts"
+
+    # YYYY-MM month of the scheduled date
+    month = Column(String, primary_key=True)
+    make = Column(String, primary_key=True)
+    production_year = Column(Integer, primary_key=True)
+    service_type = Column(String, primary_key=True)
+    request_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+from car_management_backend.app.models.database import Base
+
+
+class TableVersion(Base):
+    """ Change counter per table, bumped by the CRUD writes and used for the ETags of the listings """
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
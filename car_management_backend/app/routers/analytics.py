@@ -0,0 +1,44 @@
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, Query, Response
+from car_management_backend.app.crud_operations import analytics as analytics_crud
+from car_management_backend.app.crud_operations.executor import run_crud
+from car_management_backend.app.crud_operations.versions import ETAG_HEADER, etag_matches, get_versions_etag
+from car_management_backend.app.schemas.analytics import CityLoadHeatmapResponse, GarageUtilizationResponse, \
+    ServiceMixResponse
+from car_management_backend.app.dependencies import get_db
+from car_management_backend.app.instrumentation import TimedRoute
+from car_management_backend.app.serializers import FastJSONResponse
+
+router = APIRouter(route_class=TimedRoute)
+
+
+async def run_report(db: Session, if_none_match: Optional[str], table_names: List[str], report, **kwargs):
+    """ Answer an unchanged report with 304, otherwise compute it and send its columnar JSON as is """
+    etag = await run_crud(db, get_versions_etag, table_names=table_names)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    return FastJSONResponse(await run_crud(db, report, **kwargs), headers={ETAG_HEADER: etag})
+
+
+@router.get("/analytics/garageUtilization", response_model=GarageUtilizationResponse)
+async def get_garage_utilization(startDate: str, endDate: str, garageIds: Optional[List[int]] = Query(None),
+                                 city: Optional[str] = None, if_none_match: Optional[str] = Header(None),
+                                 db: Session = Depends(get_db)):
+    return await run_report(db, if_none_match, ["maintenance_requests", "garages"],
+                            analytics_crud.get_garage_utilization, start_date=startDate, end_date=endDate,
+                            garage_ids=garageIds, city=city)
+
+
+@router.get("/analytics/serviceMix", response_model=ServiceMixResponse)
+async def get_service_mix(startMonth: str, endMonth: str, yearBand: int = 5,
+                          if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    return await run_report(db, if_none_match, ["maintenance_requests", "cars"], analytics_crud.get_service_mix,
+                            start_month=startMonth, end_month=endMonth, year_band=yearBand)
+
+
+@router.get("/analytics/cityLoadHeatmap", response_model=CityLoadHeatmapResponse)
+async def get_city_load_heatmap(startDate: str, endDate: str, if_none_match: Optional[str] = Header(None),
+                                db: Session = Depends(get_db)):
+    return await run_report(db, if_none_match, ["maintenance_requests", "garages"],
+                            analytics_crud.get_city_load_heatmap, start_date=startDate, end_date=endDate)
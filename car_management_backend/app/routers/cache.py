@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from car_management_backend.app.cache import response_cache
+from car_management_backend.app.instrumentation import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return response_cache.stats()
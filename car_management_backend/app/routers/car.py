@@ -1,81 +1,143 @@
 from typing import List, Optional
-from sqlalchemy.orm import Session, class_mapper
-from fastapi import APIRouter, HTTPException, Depends
-from car_management_backend.app.schemas.car import CarCreate, CarUpdate, CarResponse
+from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from car_management_backend.app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkDeleteResponse
+from car_management_backend.app.schemas.car import CarCreate, CarUpdate, CarResponse, NextAvailableSlotResponse, \
+    PlateLookupRequest, PlateLookupResult
+from car_management_backend.app.schemas.maintenance import CarMaintenanceHistoryResponse, \
+    MaintenanceSummariesRequest, MaintenanceSummaryResult
+from car_management_backend.app.cache import response_cache
 from car_management_backend.app.crud_operations import cars as cars_crud
-from car_management_backend.app.models.database import SessionLocal
-
-router = APIRouter()
-
-
-def sqlalchemy_to_dict(model_instance):
-    """ Map the model fields to the response model ones """
-    result = {column.name: getattr(model_instance, column.name) for column in
-              class_mapper(model_instance.__class__).columns}
-
-    # Map garages relationship
-    garages = [
-        {
-            "id": garage.id,
-            "name": garage.name,
-            "location": garage.location,
-            "city": garage.city,
-            "capacity": garage.capacity
-        }
-        for garage in model_instance.garages
-    ]
+from car_management_backend.app.crud_operations import maintenance_requests as maintenance_crud
+from car_management_backend.app.crud_operations import reports as reports_generator
+from car_management_backend.app.crud_operations.executor import run_crud
+from car_management_backend.app.crud_operations.pagination import NEXT_CURSOR_HEADER
+from car_management_backend.app.crud_operations.versions import ETAG_HEADER, etag_matches, get_row_etag, \
+    get_versions_etag
+from car_management_backend.app.models.car import Car
+from car_management_backend.app.dependencies import get_db
+from car_management_backend.app.instrumentation import TimedRoute
+from car_management_backend.app.serializers import FastJSONResponse, car_rows_to_dicts, car_to_dict, \
+    maintenance_rows_to_dicts
+
+router = APIRouter(route_class=TimedRoute)
 
-    return {
-        "id": result.get("id"),
-        "make": result.get("make"),
-        "model": result.get("model"),
-        "productionYear": result.get("production_year"),
-        "licensePlate": result.get("license_plate"),
-        "garages": garages
-    }
 
+@router.post("/cars", response_model=CarResponse)
+async def create_car(car: CarCreate, db: Session = Depends(get_db)):
+    db_car = await run_crud(db, cars_crud.create_car, car=car)
+    return car_to_dict(db_car)
 
-# Get the database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+@router.post("/cars/bulk", response_model=BulkCreateResponse)
+async def create_cars(cars: List[CarCreate], db: Session = Depends(get_db)):
+    return await run_crud(db, cars_crud.create_cars, cars=cars)
 
-@router.post("/cars", response_model=CarResponse)
-def create_car(car: CarCreate, db: Session = Depends(get_db)):
-    db_car = cars_crud.create_car(db=db, car=car)
-    return sqlalchemy_to_dict(db_car)
+
+@router.post("/cars/bulkDelete", response_model=BulkDeleteResponse)
+async def delete_cars(request: BulkDeleteRequest, db: Session = Depends(get_db)):
+    return await run_crud(db, cars_crud.delete_cars, car_ids=request.ids)
 
 
 @router.get("/cars", response_model=List[CarResponse])
-def list_cars(carMake: Optional[str] = None, garageId: Optional[int] = None, fromYear: Optional[int] = None, toYear: Optional[int] = None,
-              db: Session = Depends(get_db)):
-    cars = cars_crud.get_cars(db=db, make=carMake, garage_id=garageId, from_year=fromYear, to_year=toYear)
-    return [sqlalchemy_to_dict(car) for car in cars]
+async def list_cars(carMake: Optional[str] = None, garageId: Optional[int] = None, fromYear: Optional[int] = None,
+                    toYear: Optional[int] = None, cursor: Optional[str] = None, limit: Optional[int] = None,
+                    if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    # The cars embed their garages, an unchanged listing is answered without reading them
+    etag = await run_crud(db, get_versions_etag, table_names=["cars", "garages"])
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    headers = {ETAG_HEADER: etag}
+
+    # Column rows encoded directly, the response model validation would only rebuild the same dicts
+    rows, garages, next_cursor = await run_crud(db, cars_crud.get_car_rows, make=carMake, garage_id=garageId,
+                                                from_year=fromYear, to_year=toYear, cursor=cursor, limit=limit)
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return FastJSONResponse(car_rows_to_dicts(rows, garages), headers=headers)
+
+
+@router.get("/cars/byPlate/{plate}", response_model=CarResponse)
+async def get_car_by_plate(plate: str, db: Session = Depends(get_db)):
+    car = await run_crud(db, cars_crud.get_car_by_plate, plate=plate)
+    if not car:
+        raise HTTPException(status_code=404, detail="Car not found")
+    return car_to_dict(car)
+
+
+@router.post("/cars/lookupPlates", response_model=List[PlateLookupResult])
+async def lookup_plates(request: PlateLookupRequest, db: Session = Depends(get_db)):
+    cars = await run_crud(db, cars_crud.get_cars_by_plates, plates=request.plates)
+    return [
+        {"plate": plate, "car": car_to_dict(car) if car else None}
+        for plate, car in zip(request.plates, cars)
+    ]
+
+
+@router.post("/cars/maintenanceSummaries", response_model=List[MaintenanceSummaryResult])
+async def get_maintenance_summaries(request: MaintenanceSummariesRequest, startDate: Optional[str] = None,
+                                    endDate: Optional[str] = None, serviceType: Optional[str] = None,
+                                    db: Session = Depends(get_db)):
+    summaries = await run_crud(db, maintenance_crud.get_maintenance_summaries, car_ids=request.carIds,
+                               start_date=startDate, end_date=endDate, service_type=serviceType)
+    return [{"carId": car_id, "summary": summary} for car_id, summary in zip(request.carIds, summaries)]
 
 
 @router.get("/cars/{id}", response_model=CarResponse)
-def get_car(id: int, db: Session = Depends(get_db)):
-    car = cars_crud.get_car(db=db, car_id=id)
+async def get_car(id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                  db: Session = Depends(get_db)):
+    etag = await run_crud(db, get_row_etag, model=Car, row_id=id, table_names=["garages"])
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    # A missing row has no ETag and gets its 404 below
+    if etag:
+        response.headers[ETAG_HEADER] = etag
+
+    key = response_cache.make_key("car", id=id)
+    found, car = response_cache.get(key)
+    if found:
+        return car
+
+    car = await run_crud(db, cars_crud.get_car, car_id=id)
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
-    return sqlalchemy_to_dict(car)
+    car = car_to_dict(car)
+    # The car embeds its garages, so it is evicted with any of them too
+    response_cache.set(key, car, tags=[f"car:{id}", *(f"garage:{garage['id']}" for garage in car["garages"])])
+    return car
 
 
 @router.put("/cars/{id}", response_model=CarResponse)
-def update_car(id: int, car: CarUpdate, db: Session = Depends(get_db)):
-    updated_car = cars_crud.update_car(db=db, car_id=id, car=car)
+async def update_car(id: int, car: CarUpdate, db: Session = Depends(get_db)):
+    updated_car = await run_crud(db, cars_crud.update_car, car_id=id, car=car)
     if not updated_car:
         raise HTTPException(status_code=404, detail="Car not found")
-    return sqlalchemy_to_dict(updated_car)
+    return car_to_dict(updated_car)
 
 
 @router.delete("/cars/{id}")
-def delete_car(id: int, db: Session = Depends(get_db)):
-    deleted_car = cars_crud.delete_car(db=db, car_id=id)
+async def delete_car(id: int, db: Session = Depends(get_db)):
+    deleted_car = await run_crud(db, cars_crud.delete_car, car_id=id)
     if not deleted_car:
         raise HTTPException(status_code=404, detail="Car not found")
     return {"message": "Car deleted successfully"}
+
+
+@router.get("/cars/{id}/nextAvailableSlot", response_model=NextAvailableSlotResponse)
+async def get_next_available_slot(id: int, from_date: Optional[str] = Query(None, alias="from"),
+                                  days: int = Query(90, ge=1, le=366), city: Optional[str] = None,
+                                  alternatives: int = Query(3, ge=0, le=50), db: Session = Depends(get_db)):
+    return await run_crud(db, reports_generator.get_next_available_slots, car_id=id, start_date=from_date, days=days,
+                          city=city, alternatives=alternatives)
+
+
+@router.get("/cars/{id}/maintenance", response_model=CarMaintenanceHistoryResponse)
+async def get_car_maintenance_history(id: int, startDate: Optional[str] = None, endDate: Optional[str] = None,
+                                      serviceType: Optional[str] = None, cursor: Optional[str] = None,
+                                      limit: Optional[int] = None, db: Session = Depends(get_db)):
+    summary, rows, next_cursor = await run_crud(db, maintenance_crud.get_car_maintenance_history, car_id=id,
+                                                start_date=startDate, end_date=endDate, service_type=serviceType,
+                                                cursor=cursor, limit=limit)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    # The summary is built in the field order of its model, so it is encoded like the request rows
+    return FastJSONResponse({"summary": summary, "requests": maintenance_rows_to_dicts(rows)}, headers=headers)
@@ -1,60 +1,94 @@
-from typing import List
+from typing import List, Optional
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from car_management_backend.app.cache import response_cache
 from car_management_backend.app.crud_operations import garages as garage_crud
 from car_management_backend.app.crud_operations import reports as reports_generator
+from car_management_backend.app.crud_operations.executor import run_crud
+from car_management_backend.app.crud_operations.pagination import NEXT_CURSOR_HEADER
+from car_management_backend.app.crud_operations.versions import ETAG_HEADER, etag_matches, get_row_etag, \
+    get_versions_etag
+from car_management_backend.app.models.garage import Garage
 from car_management_backend.app.schemas.garage import GarageCreate, GarageUpdate, GarageResponse, \
     DailyAvailabilityResponse
-from car_management_backend.app.models.database import SessionLocal
+from car_management_backend.app.dependencies import get_db
+from car_management_backend.app.instrumentation import TimedRoute
 
-router = APIRouter()
-
-
-# Get the database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/garages", response_model=GarageResponse)
-def create_garage(garage: GarageCreate, db: Session = Depends(get_db)):
-    return garage_crud.create_garage(db=db, garage=garage)
+async def create_garage(garage: GarageCreate, db: Session = Depends(get_db)):
+    return await run_crud(db, garage_crud.create_garage, garage=garage)
 
 
 @router.get("/garages", response_model=list[GarageResponse])
-def list_garages(city: str = None, db: Session = Depends(get_db)):
-    return garage_crud.get_garages(db=db, city=city)
+async def list_garages(response: Response, city: str = None, cursor: Optional[str] = None,
+                       limit: Optional[int] = None, if_none_match: Optional[str] = Header(None),
+                       db: Session = Depends(get_db)):
+    etag = await run_crud(db, get_versions_etag, table_names=["garages"])
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    response.headers[ETAG_HEADER] = etag
+
+    key = response_cache.make_key("garages", city=city, cursor=cursor, limit=limit)
+    found, page = response_cache.get(key)
+    if not found:
+        garages, next_cursor = await run_crud(db, garage_crud.get_garages, city=city, cursor=cursor, limit=limit)
+        page = {"items": [GarageResponse.from_orm(garage).dict() for garage in garages], "nextCursor": next_cursor}
+        response_cache.set(key, page, tags=["garages"])
+
+    if page["nextCursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["nextCursor"]
+    return page["items"]
 
 
 @router.get("/garages/{id:int}", response_model=GarageResponse)
-def get_garage(id: int, db: Session = Depends(get_db)):
-    garage = garage_crud.get_garage(db=db, garage_id=id)
+async def get_garage(id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                     db: Session = Depends(get_db)):
+    etag = await run_crud(db, get_row_etag, model=Garage, row_id=id)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    if etag:
+        response.headers[ETAG_HEADER] = etag
+
+    key = response_cache.make_key("garage", id=id)
+    found, garage = response_cache.get(key)
+    if found:
+        return garage
+
+    garage = await run_crud(db, garage_crud.get_garage, garage_id=id)
     if not garage:
         raise HTTPException(status_code=404, detail="Garage not found")
+    garage = GarageResponse.from_orm(garage).dict()
+    response_cache.set(key, garage, tags=[f"garage:{id}"])
     return garage
 
 
 @router.put("/garages/{id}", response_model=GarageResponse)
-def update_garage(id: int, garage: GarageUpdate, db: Session = Depends(get_db)):
-    updated_garage = garage_crud.update_garage(db=db, garage_id=id, garage=garage)
+async def update_garage(id: int, garage: GarageUpdate, db: Session = Depends(get_db)):
+    updated_garage = await run_crud(db, garage_crud.update_garage, garage_id=id, garage=garage)
     if not updated_garage:
         raise HTTPException(status_code=404, detail="Garage not found")
     return updated_garage
 
 
 @router.delete("/garages/{id}", response_model=GarageResponse)
-def delete_garage(id: int, db: Session = Depends(get_db)):
-    deleted_garage = garage_crud.delete_garage(db=db, garage_id=id)
+async def delete_garage(id: int, db: Session = Depends(get_db)):
+    deleted_garage = await run_crud(db, garage_crud.delete_garage, garage_id=id)
     if not deleted_garage:
         raise HTTPException(status_code=404, detail="Garage not found")
     return deleted_garage
 
 
 @router.get("/garages/dailyAvailabilityReport", response_model=List[DailyAvailabilityResponse])
-def get_daily_availability_report(garageId: int, startDate: str, endDate: str, db: Session = Depends(get_db)):
-    report = reports_generator.get_daily_availability_report(db=db, garage_id=garageId,
-                                                             start_date=startDate, end_date=endDate)
+async def get_daily_availability_report(garageId: int, startDate: str, endDate: str,
+                                        db: Session = Depends(get_db)):
+    key = response_cache.make_key("dailyAvailabilityReport", garageId=garageId, startDate=startDate, endDate=endDate)
+    found, report = response_cache.get(key)
+    if not found:
+        report = await run_crud(db, reports_generator.get_daily_availability_report, garage_id=garageId,
+                                start_date=startDate, end_date=endDate)
+        # The available capacity also depends on the garage itself
+        response_cache.set(key, report, tags=["reports", f"reports:garage:{garageId}", f"garage:{garageId}"])
     return report
@@ -0,0 +1,115 @@
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from car_management_backend.app.config import settings
+from car_management_backend.app.crud_operations import jobs as job_crud
+from car_management_backend.app.crud_operations.executor import run_crud
+from car_management_backend.app.crud_operations.pagination import NEXT_CURSOR_HEADER
+from car_management_backend.app.jobs import job_pool
+from car_management_backend.app.schemas.car import CarCreate
+from car_management_backend.app.schemas.job import JobResponse
+from car_management_backend.app.schemas.maintenance import MaintenanceRequestCreate
+from car_management_backend.app.dependencies import get_db
+from car_management_backend.app.instrumentation import TimedRoute
+from car_management_backend.app.serializers import job_to_dict
+
+router = APIRouter(route_class=TimedRoute)
+
+
+async def submit_job(db: Session, kind: str, **arguments):
+    """ Queue a job of the CRUD function of the kind with these arguments and wake up a worker for it """
+    db_job = await run_crud(db, job_crud.create_job, kind=kind, arguments=arguments)
+    job_pool.notify()
+    return job_to_dict(db_job)
+
+
+def check_import_size(items: list):
+    """ Reject an import larger than the job limit, the bulk limit only applies to each of its batches """
+    if len(items) > settings.job_max_import_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(items)}, the maximum is {settings.job_max_import_items}."
+        )
+
+
+@router.post("/jobs/reports/dailyAvailabilityReport", response_model=JobResponse, status_code=202)
+async def submit_daily_availability_report(garageId: int, startDate: str, endDate: str,
+                                           db: Session = Depends(get_db)):
+    return await submit_job(db, "dailyAvailabilityReport", garage_id=garageId, start_date=startDate,
+                            end_date=endDate)
+
+
+@router.post("/jobs/reports/monthlyRequestsReport", response_model=JobResponse, status_code=202)
+async def submit_monthly_requests_report(garageId: int, startMonth: str, endMonth: str,
+                                         db: Session = Depends(get_db)):
+    return await submit_job(db, "monthlyRequestsReport", garage_id=garageId, start_month=startMonth,
+                            end_month=endMonth)
+
+
+@router.post("/jobs/reports/monthlyRequestsReportByGarage", response_model=JobResponse, status_code=202)
+async def submit_monthly_requests_report_by_garage(startMonth: str, endMonth: str,
+                                                   garageIds: Optional[List[int]] = Query(None),
+                                                   city: Optional[str] = None, db: Session = Depends(get_db)):
+    if not garageIds and not city:
+        raise HTTPException(status_code=400, detail="Either garageIds or city should be provided.")
+    return await submit_job(db, "monthlyRequestsReportByGarage", start_month=startMonth, end_month=endMonth,
+                            garage_ids=garageIds, city=city)
+
+
+@router.post("/jobs/reports/garageUtilization", response_model=JobResponse, status_code=202)
+async def submit_garage_utilization(startDate: str, endDate: str, garageIds: Optional[List[int]] = Query(None),
+                                    city: Optional[str] = None, db: Session = Depends(get_db)):
+    return await submit_job(db, "garageUtilization", start_date=startDate, end_date=endDate, garage_ids=garageIds,
+                            city=city)
+
+
+@router.post("/jobs/reports/serviceMix", response_model=JobResponse, status_code=202)
+async def submit_service_mix(startMonth: str, endMonth: str, yearBand: int = 5, db: Session = Depends(get_db)):
+    return await submit_job(db, "serviceMix", start_month=startMonth, end_month=endMonth, year_band=yearBand)
+
+
+@router.post("/jobs/reports/cityLoadHeatmap", response_model=JobResponse, status_code=202)
+async def submit_city_load_heatmap(startDate: str, endDate: str, db: Session = Depends(get_db)):
+    return await submit_job(db, "cityLoadHeatmap", start_date=startDate, end_date=endDate)
+
+
+@router.post("/jobs/imports/cars", response_model=JobResponse, status_code=202)
+async def submit_car_import(cars: List[CarCreate], db: Session = Depends(get_db)):
+    check_import_size(cars)
+    return await submit_job(db, "carImport", cars=[car.dict() for car in cars])
+
+
+@router.post("/jobs/imports/maintenance", response_model=JobResponse, status_code=202)
+async def submit_maintenance_import(requests: List[MaintenanceRequestCreate], db: Session = Depends(get_db)):
+    check_import_size(requests)
+    return await submit_job(db, "maintenanceImport", maintenance_requests=[request.dict() for request in requests])
+
+
+@router.get("/jobs", response_model=list[JobResponse])
+async def list_jobs(response: Response, status: Optional[str] = None, kind: Optional[str] = None,
+                    cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    jobs, next_cursor = await run_crud(db, job_crud.get_jobs, status=status, kind=kind, cursor=cursor, limit=limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [job_to_dict(job) for job in jobs]
+
+
+@router.get("/jobs/{id}", response_model=JobResponse)
+async def get_job(id: int, db: Session = Depends(get_db)):
+    job = await run_crud(db, job_crud.get_job, job_id=id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+
+@router.get("/jobs/{id}/result")
+async def get_job_result(id: int, db: Session = Depends(get_db)):
+    # The return value of the CRUD function, stored as JSON by the worker and sent as is
+    result = await run_crud(db, job_crud.get_job_result, job_id=id)
+    return Response(content=result, media_type="application/json")
+
+
+@router.post("/jobs/{id}/cancel", response_model=JobResponse)
+async def cancel_job(id: int, db: Session = Depends(get_db)):
+    job = await run_crud(db, job_crud.cancel_job, job_id=id)
+    return job_to_dict(job)
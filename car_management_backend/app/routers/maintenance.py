@@ -1,106 +1,209 @@
+import csv
+import io
+import json
 from calendar import isleap
 from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy.orm import class_mapper
+from car_management_backend.app.cache import response_cache
 from car_management_backend.app.crud_operations import maintenance_requests as maintenance_crud
 from car_management_backend.app.crud_operations import reports as reports_generator
+from car_management_backend.app.crud_operations.executor import run_crud
+from car_management_backend.app.crud_operations.pagination import NEXT_CURSOR_HEADER
+from car_management_backend.app.crud_operations.versions import ETAG_HEADER, etag_matches, get_row_etag, \
+    get_versions_etag
+from car_management_backend.app.schemas.bulk import BulkCreateResponse, BulkDeleteRequest, BulkDeleteResponse
 from car_management_backend.app.schemas.maintenance import MaintenanceRequestCreate, MaintenanceRequestUpdate, \
-    MaintenanceRequestResponse, RequestsPerMonthResponse, YearMonth
-from car_management_backend.app.models.database import SessionLocal
+    MaintenanceRequestResponse, RequestsPerMonthResponse, YearMonth, GarageRequestsPerMonthResponse
+from car_management_backend.app.config import settings
+from car_management_backend.app.dependencies import get_db
+from car_management_backend.app.models.database import get_engines
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.instrumentation import TimedRoute
+from car_management_backend.app.serializers import FastJSONResponse, maintenance_request_to_dict, \
+    maintenance_rows_to_dicts
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
-def sqlalchemy_to_dict(model_instance):
-    """ Map the model fields to the response model ones """
-    result = {column.name: getattr(model_instance, column.name) for column in
-              class_mapper(model_instance.__class__).columns}
+# Columns of the exported maintenance requests, in the order of the response model
+EXPORT_FIELDS = ["id", "carId", "carName", "serviceType", "scheduledDate", "garageId", "garageName", "scheduleId"]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
 
-    return {
-        "id": result.get("id"),
-        "carId": result.get("car_id"),
-        "carName": result.get("car_name"),
-        "serviceType": result.get("service_type"),
-        "scheduledDate": result.get("scheduled_date"),
-        "garageId": result.get("garage_id"),
-        "garageName": result.get("garage_name")
-    }
 
-
-# Get the database session
-def get_db():
-    db = SessionLocal()
+def export_maintenance_requests(export_format: str, **filters):
+    """ Stream the matching maintenance requests encoded as NDJSON lines or CSV rows """
+    # The generator owns its session since it is consumed after the endpoint has returned
+    db = get_engines()["SessionLocal"]()
     try:
-        yield db
+        rows = maintenance_crud.iter_maintenance_requests(db=db, batch_size=settings.export_batch_size, **filters)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == "csv":
+            writer.writerow(EXPORT_FIELDS)
+
+        # Send the rows in chunks of one batch instead of one write per row
+        for index, row in enumerate(rows, start=1):
+            if export_format == "csv":
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + "\n")
+            if index % settings.export_batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
     finally:
         db.close()
 
 
 @router.post("/maintenance", response_model=MaintenanceRequestResponse)
-def create_maintenance_request(request: MaintenanceRequestCreate, db: Session = Depends(get_db)):
-    db_maintenance_request = maintenance_crud.create_maintenance_request(db=db, maintenance_request=request)
+async def create_maintenance_request(request: MaintenanceRequestCreate, db: Session = Depends(get_db)):
+    db_maintenance_request = await run_crud(db, maintenance_crud.create_maintenance_request,
+                                            maintenance_request=request)
     if not db_maintenance_request:
         raise HTTPException(status_code=400, detail="Failed to create maintenance request")
-    return sqlalchemy_to_dict(db_maintenance_request)
+    return maintenance_request_to_dict(db_maintenance_request)
 
 
-@router.get("/maintenance", response_model=list[MaintenanceRequestResponse])
-def list_maintenance_requests(carId: int = None, garageId: int = None, startDate: str = None, endDate: str = None,
-                              db: Session = Depends(get_db)):
-    requests = maintenance_crud.get_maintenance_requests(db=db, car_id=carId, garage_id=garageId, start_date=startDate,
-                                                         end_date=endDate)
+@router.post("/maintenance/bulk", response_model=BulkCreateResponse)
+async def create_maintenance_requests(requests: List[MaintenanceRequestCreate], db: Session = Depends(get_db)):
+    return await run_crud(db, maintenance_crud.create_maintenance_requests, maintenance_requests=requests)
+
+
+@router.post("/maintenance/bulkDelete", response_model=BulkDeleteResponse)
+async def delete_maintenance_requests(request: BulkDeleteRequest, db: Session = Depends(get_db)):
+    return await run_crud(db, maintenance_crud.delete_maintenance_requests, request_ids=request.ids)
 
-    return [sqlalchemy_to_dict(request) for request in requests]
+
+@router.get("/maintenance", response_model=list[MaintenanceRequestResponse])
+async def list_maintenance_requests(carId: int = None, garageId: int = None, startDate: str = None,
+                                    endDate: str = None, cursor: Optional[str] = None, limit: Optional[int] = None,
+                                    includeScheduled: bool = False, if_none_match: Optional[str] = Header(None),
+                                    db: Session = Depends(get_db)):
+    # The requests embed the names of their cars and garages
+    table_names = ["maintenance_requests", "cars", "garages"]
+    if includeScheduled:
+        table_names.append("maintenance_schedules")
+    etag = await run_crud(db, get_versions_etag, table_names=table_names)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    headers = {ETAG_HEADER: etag}
+
+    # Column rows encoded directly, the response model validation would only rebuild the same dicts
+    rows, next_cursor = await run_crud(db, maintenance_crud.get_maintenance_request_rows, car_id=carId,
+                                       garage_id=garageId, start_date=startDate, end_date=endDate, cursor=cursor,
+                                       limit=limit, include_scheduled=includeScheduled)
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return FastJSONResponse(maintenance_rows_to_dicts(rows), headers=headers)
+
+
+@router.get("/maintenance/export")
+def export_maintenance(format: str = "ndjson", carId: int = None, garageId: int = None, startDate: str = None,
+                       endDate: str = None):
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}.")
+    # Validated before the response starts, the generator runs after the 200 is sent
+    start_date = maintenance_crud.parse_date(startDate) if startDate else None
+    end_date = maintenance_crud.parse_date(endDate) if endDate else None
+    rows = export_maintenance_requests(format, car_id=carId, garage_id=garageId, start_date=start_date,
+                                       end_date=end_date)
+    return StreamingResponse(rows, media_type=EXPORT_MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f"attachment; filename=maintenance.{format}"})
 
 
 @router.get("/maintenance/{id:int}", response_model=MaintenanceRequestResponse)
-def get_maintenance_request(id: int, db: Session = Depends(get_db)):
-    request = maintenance_crud.get_maintenance_request(db=db, request_id=id)
+async def get_maintenance_request(id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                                  db: Session = Depends(get_db)):
+    etag = await run_crud(db, get_row_etag, model=MaintenanceRequest, row_id=id, table_names=["cars", "garages"])
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    if etag:
+        response.headers[ETAG_HEADER] = etag
+
+    request = await run_crud(db, maintenance_crud.get_maintenance_request, request_id=id)
     if not request:
         raise HTTPException(status_code=404, detail="Maintenance request not found")
-    return sqlalchemy_to_dict(request)
+    return maintenance_request_to_dict(request)
 
 
 @router.put("/maintenance/{id}", response_model=MaintenanceRequestResponse)
-def update_maintenance_request(id: int, request: MaintenanceRequestUpdate, db: Session = Depends(get_db)):
-    updated_request = maintenance_crud.update_maintenance_request(db=db, request_id=id, maintenance_request=request)
+async def update_maintenance_request(id: int, request: MaintenanceRequestUpdate, db: Session = Depends(get_db)):
+    updated_request = await run_crud(db, maintenance_crud.update_maintenance_request, request_id=id,
+                                     maintenance_request=request)
     if not updated_request:
         raise HTTPException(status_code=404, detail="Maintenance request not found")
-    return sqlalchemy_to_dict(updated_request)
+    return maintenance_request_to_dict(updated_request)
 
 
 @router.delete("/maintenance/{id}", response_model=MaintenanceRequestResponse)
-def delete_maintenance_request(id: int, db: Session = Depends(get_db)):
-    deleted_request = maintenance_crud.delete_maintenance_request(db=db, request_id=id)
+async def delete_maintenance_request(id: int, db: Session = Depends(get_db)):
+    deleted_request = await run_crud(db, maintenance_crud.delete_maintenance_request, request_id=id)
     if not deleted_request:
         raise HTTPException(status_code=404, detail="Maintenance request not found")
-    return sqlalchemy_to_dict(deleted_request)
+    return maintenance_request_to_dict(deleted_request)
 
 
 @router.get("/maintenance/monthlyRequestsReport", response_model=list[RequestsPerMonthResponse])
-def get_monthly_requests_report(garageId: int, startMonth: str, endMonth: str, db: Session = Depends(get_db)):
-    requests_per_month = reports_generator.get_requests_per_month(db=db, garage_id=garageId, start_month=startMonth,
-                                                                  end_month=endMonth)
-
-    # Transform the result into the response schema format
-    response = []
-    for year_month, count in requests_per_month.items():
+async def get_monthly_requests_report(garageId: int, startMonth: str, endMonth: str, db: Session = Depends(get_db)):
+    key = response_cache.make_key("monthlyRequestsReport", garageId=garageId, startMonth=startMonth,
+                                  endMonth=endMonth)
+    found, requests_per_month = response_cache.get(key)
+    if not found:
+        requests_per_month = await run_crud(db, reports_generator.get_requests_per_month, garage_id=garageId,
+                                            start_month=startMonth, end_month=endMonth)
+        response_cache.set(key, requests_per_month, tags=["reports", f"reports:garage:{garageId}"])
+    return to_monthly_report(requests_per_month, build_year_months(requests_per_month))
+
+
+@router.get("/maintenance/monthlyRequestsReportByGarage", response_model=list[GarageRequestsPerMonthResponse])
+async def get_monthly_requests_report_by_garage(startMonth: str, endMonth: str,
+                                                garageIds: Optional[List[int]] = Query(None),
+                                                city: Optional[str] = None, db: Session = Depends(get_db)):
+    if not garageIds and not city:
+        raise HTTPException(status_code=400, detail="Either garageIds or city should be provided.")
+    key = response_cache.make_key("monthlyRequestsReportByGarage", startMonth=startMonth, endMonth=endMonth,
+                                  garageIds=sorted(set(garageIds or [])), city=city)
+    found, series = response_cache.get(key)
+    if not found:
+        requests_per_garage = await run_crud(db, reports_generator.get_requests_per_month_for_garages,
+                                             start_month=startMonth, end_month=endMonth, garage_ids=garageIds,
+                                             city=city)
+        # Stored as pairs since JSON object keys cannot be integers; garages added to the city evict it too
+        series = list(requests_per_garage.items())
+        response_cache.set(key, series, tags=["reports", "garages",
+                                              *(f"reports:garage:{garage_id}" for garage_id, _ in series)])
+    requests_per_garage = dict(series)
+
+    # All garages share the same months, so their metadata is built only once
+    year_months = build_year_months(next(iter(requests_per_garage.values()), {}))
+    return [
+        GarageRequestsPerMonthResponse(garageId=garage_id, report=to_monthly_report(requests_per_month, year_months))
+        for garage_id, requests_per_month in requests_per_garage.items()
+    ]
+
+
+def build_year_months(requests_per_month: dict):
+    """ Build the year and month metadata of every YYYY-MM key of a monthly report """
+    year_months = {}
+    for year_month in requests_per_month:
         year, month_value = map(int, year_month.split("-"))
-        month_name = datetime(year, month_value, 1).strftime("%B").upper()
-        leap_year = isleap(year)
-
-        response.append(
-            RequestsPerMonthResponse(
-                yearMonth=YearMonth(
-                    year=year,
-                    month=month_name,
-                    leapYear=leap_year,
-                    monthValue=month_value,
-                ),
-                requests=count,
-            )
+        year_months[year_month] = YearMonth(
+            year=year,
+            month=datetime(year, month_value, 1).strftime("%B").upper(),
+            leapYear=isleap(year),
+            monthValue=month_value,
         )
+    return year_months
+
 
-    return response
+def to_monthly_report(requests_per_month: dict, year_months: dict):
+    """ Transform the result into the response schema format """
+    return [
+        RequestsPerMonthResponse(yearMonth=year_months[year_month], requests=count)
+        for year_month, count in requests_per_month.items()
+    ]
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from car_management_backend.app.instrumentation import route_metrics
+
+router = APIRouter()
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return Response(content=route_metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,61 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from car_management_backend.app.crud_operations import schedules as schedule_crud
+from car_management_backend.app.crud_operations.executor import run_crud
+from car_management_backend.app.crud_operations.pagination import NEXT_CURSOR_HEADER
+from car_management_backend.app.schemas.maintenance import MaintenanceRequestResponse
+from car_management_backend.app.schemas.schedule import MaintenanceScheduleCreate, MaintenanceScheduleUpdate, \
+    MaintenanceScheduleResponse
+from car_management_backend.app.dependencies import get_db
+from car_management_backend.app.instrumentation import TimedRoute
+from car_management_backend.app.serializers import maintenance_request_to_dict, schedule_to_dict
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.post("/schedules", response_model=MaintenanceScheduleResponse)
+async def create_schedule(schedule: MaintenanceScheduleCreate, db: Session = Depends(get_db)):
+    db_schedule = await run_crud(db, schedule_crud.create_schedule, schedule=schedule)
+    return schedule_to_dict(db_schedule)
+
+
+@router.get("/schedules", response_model=list[MaintenanceScheduleResponse])
+async def list_schedules(response: Response, carId: int = None, garageId: int = None, cursor: Optional[str] = None,
+                         limit: Optional[int] = None, db: Session = Depends(get_db)):
+    schedules, next_cursor = await run_crud(db, schedule_crud.get_schedules, car_id=carId, garage_id=garageId,
+                                            cursor=cursor, limit=limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [schedule_to_dict(schedule) for schedule in schedules]
+
+
+@router.get("/schedules/{id}", response_model=MaintenanceScheduleResponse)
+async def get_schedule(id: int, db: Session = Depends(get_db)):
+    schedule = await run_crud(db, schedule_crud.get_schedule, schedule_id=id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Maintenance schedule not found")
+    return schedule_to_dict(schedule)
+
+
+@router.put("/schedules/{id}", response_model=MaintenanceScheduleResponse)
+async def update_schedule(id: int, schedule: MaintenanceScheduleUpdate, db: Session = Depends(get_db)):
+    updated_schedule = await run_crud(db, schedule_crud.update_schedule, schedule_id=id, schedule=schedule)
+    if not updated_schedule:
+        raise HTTPException(status_code=404, detail="Maintenance schedule not found")
+    return schedule_to_dict(updated_schedule)
+
+
+@router.delete("/schedules/{id}", response_model=MaintenanceScheduleResponse)
+async def delete_schedule(id: int, db: Session = Depends(get_db)):
+    deleted_schedule = await run_crud(db, schedule_crud.delete_schedule, schedule_id=id)
+    if not deleted_schedule:
+        raise HTTPException(status_code=404, detail="Maintenance schedule not found")
+    return schedule_to_dict(deleted_schedule)
+
+
+@router.post("/schedules/{id}/occurrences/{occurrenceDate}", response_model=MaintenanceRequestResponse)
+async def book_occurrence(id: int, occurrenceDate: str, db: Session = Depends(get_db)):
+    db_maintenance_request = await run_crud(db, schedule_crud.book_occurrence, schedule_id=id,
+                                            occurrence_date=occurrenceDate)
+    return maintenance_request_to_dict(db_maintenance_request)
@@ -0,0 +1,20 @@
+from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from car_management_backend.app.crud_operations import search as search_crud
+from car_management_backend.app.crud_operations.executor import run_crud
+from car_management_backend.app.dependencies import get_db
+from car_management_backend.app.serializers import car_to_dict
+from car_management_backend.app.schemas.garage import GarageResponse
+from car_management_backend.app.schemas.search import SearchResponse
+from car_management_backend.app.instrumentation import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search(q: str, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    cars, garages = await run_crud(db, search_crud.search, query=q, limit=limit)
+    return {
+        "cars": [car_to_dict(car) for car in cars],
+        "garages": [GarageResponse.from_orm(garage).dict() for garage in garages]
+    }
@@ -0,0 +1,32 @@
+from datetime import date
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+# Columnar reports: the lists of a report are parallel, the matrices have one row per garage, group or city
+class GarageUtilizationResponse(BaseModel):
+    startDate: date
+    endDate: date
+    weeks: List[date]
+    garageIds: List[int]
+    requests: List[List[int]]
+    utilization: List[List[Optional[float]]]
+
+
+class ServiceMixResponse(BaseModel):
+    startMonth: str
+    endMonth: str
+    makes: List[str]
+    yearBands: List[int]
+    serviceTypes: List[str]
+    counts: List[List[int]]
+    shares: List[List[Optional[float]]]
+
+
+class CityLoadHeatmapResponse(BaseModel):
+    startDate: date
+    endDate: date
+    cities: List[str]
+    weekdays: List[str]
+    requests: List[List[int]]
+    load: List[List[Optional[float]]]
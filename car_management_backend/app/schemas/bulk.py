@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkCreateResponse(BaseModel):
+    created: List[int]
+    errors: List[BulkItemError]
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: List[int]
+
+
+class BulkDeleteResponse(BaseModel):
+    deleted: List[int]
+    errors: List[BulkItemError]
@@ -36,3 +36,25 @@ class CarResponse(CarBase):
 
     class Config:
         orm_mode = True
+
+
+class AvailableSlotResponse(BaseModel):
+    date: str
+    garageId: int
+    garageName: str
+    availableCapacity: int
+
+
+class NextAvailableSlotResponse(BaseModel):
+    carId: int
+    earliest: Optional[AvailableSlotResponse]
+    alternatives: List[AvailableSlotResponse]
+
+
+class PlateLookupRequest(BaseModel):
+    plates: List[str]
+
+
+class PlateLookupResult(BaseModel):
+    plate: str
+    car: Optional[CarResponse]
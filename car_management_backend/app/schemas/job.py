@@ -0,0 +1,18 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional
+
+
+class JobResponse(BaseModel):
+    id: int
+    # Report or import run by the job, e.g. dailyAvailabilityReport or maintenanceImport
+    kind: str
+    # QUEUED, RUNNING, SUCCEEDED, FAILED or CANCELLED
+    status: str
+    # Share of the work done, between 0 and 1
+    progress: float
+    cancelRequested: bool
+    error: Optional[str]
+    createdAt: datetime
+    startedAt: Optional[datetime]
+    finishedAt: Optional[datetime]
@@ -1,5 +1,6 @@
+from datetime import date
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class MaintenanceRequestCreate(BaseModel):
@@ -20,18 +21,47 @@ class MaintenanceRequestUpdate(BaseModel):
 
 
 class MaintenanceRequestResponse(BaseModel):
-    id: int
+    # The occurrences of the schedules that are not booked yet have no ID
+    id: Optional[int]
     carId: int
     carName: str
     serviceType: str
-    scheduledDate: str
+    scheduledDate: date
     garageId: int
     garageName: str
+    scheduleId: Optional[int]
 
     class Config:
         orm_mode = True
 
 
+class ServiceTypeCount(BaseModel):
+    serviceType: str
+    count: int
+
+
+class MaintenanceSummaryResponse(BaseModel):
+    carId: int
+    totalRequests: int
+    lastServiceDate: Optional[date]
+    nextScheduledDate: Optional[date]
+    serviceTypes: List[ServiceTypeCount]
+
+
+class CarMaintenanceHistoryResponse(BaseModel):
+    summary: MaintenanceSummaryResponse
+    requests: List[MaintenanceRequestResponse]
+
+
+class MaintenanceSummariesRequest(BaseModel):
+    carIds: List[int]
+
+
+class MaintenanceSummaryResult(BaseModel):
+    carId: int
+    summary: Optional[MaintenanceSummaryResponse]
+
+
 # Report schemas
 class YearMonth(BaseModel):
     year: int
@@ -44,3 +74,7 @@ class RequestsPerMonthResponse(BaseModel):
     yearMonth: YearMonth
     requests: int
 
+
+class GarageRequestsPerMonthResponse(BaseModel):
+    garageId: int
+    report: List[RequestsPerMonthResponse]
@@ -0,0 +1,38 @@
+from datetime import date
+from pydantic import BaseModel
+from typing import Optional
+
+
+class MaintenanceScheduleCreate(BaseModel):
+    carId: int
+    garageId: int
+    serviceType: str
+    startDate: str
+    # DAILY, WEEKLY, MONTHLY or YEARLY, repeated every interval
+    frequency: str
+    interval: int = 1
+    untilDate: Optional[str]
+    occurrenceCount: Optional[int]
+
+
+class MaintenanceScheduleUpdate(BaseModel):
+    carId: Optional[int]
+    garageId: Optional[int]
+    serviceType: Optional[str]
+    startDate: Optional[str]
+    frequency: Optional[str]
+    interval: Optional[int]
+    untilDate: Optional[str]
+    occurrenceCount: Optional[int]
+
+
+class MaintenanceScheduleResponse(BaseModel):
+    id: int
+    carId: int
+    garageId: int
+    serviceType: str
+    startDate: date
+    frequency: str
+    interval: int
+    untilDate: Optional[date]
+    occurrenceCount: Optional[int]
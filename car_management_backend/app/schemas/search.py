@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import List
+from car_management_backend.app.schemas.car import CarResponse
+from car_management_backend.app.schemas.garage import GarageResponse
+
+
+class SearchResponse(BaseModel):
+    cars: List[CarResponse]
+    garages: List[GarageResponse]
@@ -0,0 +1,129 @@
+import json
+from operator import itemgetter
+from fastapi import Response
+from car_management_backend.app.schemas.car import CarResponse, GarageReference
+from car_management_backend.app.schemas.maintenance import MaintenanceRequestResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_json(content, non_str_keys: bool = False):
+    """ Encode to the same bytes as FastAPI's JSONResponse, with orjson when installed """
+    if orjson is not None:
+        # Integer keys are written as strings like the json module does, only when asked since it is slower
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS if non_str_keys else None)
+    # Dates are the only non JSON values of the responses, rendered as ISO dates like FastAPI does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+                      default=str).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """ JSON response of content already shaped like its response model, encoded without validating it again """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return encode_json(content)
+
+
+def garage_to_dict(garage):
+    """ Shape a garage entity like GarageReference """
+    return {
+        "id": garage.id,
+        "name": garage.name,
+        "location": garage.location,
+        "city": garage.city,
+        "capacity": garage.capacity
+    }
+
+
+def car_to_dict(car):
+    """ Shape a car entity like CarResponse """
+    return {
+        "id": car.id,
+        "make": car.make,
+        "model": car.model,
+        "productionYear": car.production_year,
+        "licensePlate": car.license_plate,
+        "garages": [garage_to_dict(garage) for garage in car.garages]
+    }
+
+
+def maintenance_request_to_dict(request):
+    """ Shape a maintenance request entity like MaintenanceRequestResponse """
+    return {
+        "id": request.id,
+        "carId": request.car_id,
+        "carName": request.car_name,
+        "serviceType": request.service_type,
+        "scheduledDate": request.scheduled_date,
+        "garageId": request.garage_id,
+        "garageName": request.garage_name,
+        "scheduleId": request.schedule_id
+    }
+
+
+def schedule_to_dict(schedule):
+    """ Shape a maintenance schedule entity like MaintenanceScheduleResponse """
+    return {
+        "id": schedule.id,
+        "carId": schedule.car_id,
+        "garageId": schedule.garage_id,
+        "serviceType": schedule.service_type,
+        "startDate": schedule.start_date,
+        "frequency": schedule.frequency,
+        "interval": schedule.interval,
+        "untilDate": schedule.until_date,
+        "occurrenceCount": schedule.occurrence_count
+    }
+
+
+def job_to_dict(job):
+    """ Shape a job entity like JobResponse, without its result """
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "cancelRequested": job.cancel_requested,
+        "error": job.error,
+        "createdAt": job.created_at,
+        "startedAt": job.started_at,
+        "finishedAt": job.finished_at
+    }
+
+
+def row_mapper(response_model, columns: dict):
+    """ Build a function turning a column row into a response dict, given the row index of each field """
+    # The keys follow the field order of the model, as the validated responses do
+    fields = [name for name in response_model.__fields__ if name in columns]
+    values = itemgetter(*(columns[name] for name in fields))
+    return lambda row: dict(zip(fields, values(row)))
+
+
+# Rows of cars_crud.get_car_rows and maintenance_crud.get_maintenance_request_rows, whose scheduled occurrences
+# are rows of schedules_crud.get_scheduled_occurrences
+car_row_to_dict = row_mapper(CarResponse, {"id": 0, "make": 1, "model": 2, "productionYear": 3, "licensePlate": 4})
+garage_row_to_dict = row_mapper(GarageReference, {"id": 0, "name": 1, "location": 2, "city": 3, "capacity": 4})
+maintenance_row_to_dict = row_mapper(MaintenanceRequestResponse, {
+    "id": 0, "carId": 1, "carName": 2, "serviceType": 3, "scheduledDate": 4, "garageId": 5, "garageName": 6,
+    "scheduleId": 7
+})
+
+
+def car_rows_to_dicts(rows, garages: dict):
+    """ Shape the car rows and the garage rows of each car like a list of CarResponse """
+    cars = []
+    for row in rows:
+        car = car_row_to_dict(row)
+        # The garages are the last field of the model
+        car["garages"] = [garage_row_to_dict(garage) for garage in garages[row[0]]]
+        cars.append(car)
+    return cars
+
+
+def maintenance_rows_to_dicts(rows):
+    """ Shape the maintenance request rows like a list of MaintenanceRequestResponse """
+    return [maintenance_row_to_dict(row) for row in rows]
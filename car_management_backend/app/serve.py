@@ -0,0 +1,36 @@
+# Multi-process server: python -m car_management_backend.app.serve --workers 4
+# The workers share nothing but the database. Point them to a read replica with CAR_MANAGEMENT_READ_DATABASE_URL,
+# or on SQLite to read-only connections to the same file with CAR_MANAGEMENT_SQLITE_READ_ONLY_CONNECTIONS=1.
+# Behind gunicorn use: gunicorn -k uvicorn.workers.UvicornWorker -w 4 car_management_backend.app.main:app
+# with CAR_MANAGEMENT_CACHE_BACKEND=redis or CAR_MANAGEMENT_CACHE_ENABLED=0, for the reason given below.
+# Each worker also starts CAR_MANAGEMENT_JOB_WORKERS job processes, which all take their jobs from the same queue.
+import argparse
+import logging
+import os
+import uvicorn
+from car_management_backend.app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the car management API with several worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # The memory cache of a worker would keep serving what the other workers changed, until it expires
+    if args.workers > 1 and settings.cache_enabled and settings.cache_backend == "memory":
+        logger.warning("The memory response cache cannot be shared by the workers, it is disabled. "
+                       "Use the redis cache backend to keep a cache.")
+        os.environ["CAR_MANAGEMENT_CACHE_ENABLED"] = "false"
+
+    uvicorn.run("car_management_backend.app.main:app", host=args.host, port=args.port, workers=args.workers,
+                log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    main()
@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from car_management_backend.app.crud_operations import maintenance_requests as maintenance_crud
+# Registered with the metadata for create_all, the search tables being created with the mapped ones
+from car_management_backend.app.models import job, search  # noqa: F401
+from car_management_backend.app.models.car import Car
+from car_management_backend.app.models.database import Base, RoutingSession, set_sqlite_pragmas
+from car_management_backend.app.models.garage import Garage
+from car_management_backend.app.models.maintenance import MaintenanceRequest
+from car_management_backend.app.models.occupancy import GarageDailyOccupancy
+from car_management_backend.app.schemas.maintenance import MaintenanceRequestCreate
+
+BOOKERS = 100
+CAPACITY = 1
+SCHEDULED_DATE = "2030-01-02"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A connection per session, so that the bookers really run concurrently on the file
+    engine = create_engine(f"sqlite:///{tmp_path / 'booking.db'}", connect_args={"check_same_thread": False},
+                           poolclass=NullPool)
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession)
+    engine.dispose()
+
+
+def test_concurrent_bookings_never_overbook(session_factory):
+    with session_factory() as db:
+        garage = Garage(name="Garage", location="Street 1", city="Sofia", capacity=CAPACITY)
+        car = Car(make="VW", model="Golf", production_year=2015, license_plate="CA0001", normalized_plate="CA0001")
+        db.add_all([garage, car])
+        db.commit()
+        garage_id, car_id = garage.id, car.id
+
+    request = MaintenanceRequestCreate(carId=car_id, garageId=garage_id, serviceType="Oil change",
+                                       scheduledDate=SCHEDULED_DATE)
+    start = threading.Barrier(BOOKERS)
+
+    def book(_):
+        with session_factory() as db:
+            start.wait()
+            try:
+                maintenance_crud.create_maintenance_request(db=db, maintenance_request=request)
+                return "booked"
+            except HTTPException as error:
+                return error.status_code
+
+    with ThreadPoolExecutor(max_workers=BOOKERS) as executor:
+        outcomes = list(executor.map(book, range(BOOKERS)))
+
+    # Any other exception, e.g. a locked database, fails the test from executor.map
+    assert outcomes.count("booked") == CAPACITY
+    assert set(outcomes) <= {"booked", 409, 503}
+    with session_factory() as db:
+        stored = db.query(MaintenanceRequest).filter(MaintenanceRequest.garage_id == garage_id).count()
+        occupancy = db.query(GarageDailyOccupancy.request_count).filter(
+            GarageDailyOccupancy.garage_id == garage_id).scalar()
+    assert stored == occupancy == CAPACITY
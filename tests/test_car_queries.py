@@ -0,0 +1,72 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from car_management_backend.app.config import Settings
+from car_management_backend.app.main import create_app
+from car_management_backend.app.models.database import Base, get_engines
+
+# Cars added between the two measures, each of them in every garage
+MANY_CARS = 25
+GARAGES = 3
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    database = tmp_path_factory.mktemp("db") / "car_management.db"
+    # Uncached reads without job workers, every request goes to the database
+    app = create_app(Settings(database_url=f"sqlite:///{database}", cache_enabled=False, job_workers=0))
+    Base.metadata.create_all(bind=get_engines()["engine"])
+    # The shutdown of the app disposes of the engines
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def garage_ids(client):
+    return [
+        client.post("/garages", json={"name": f"Garage {i}", "location": f"Street {i}", "city": "Skopje",
+                                      "capacity": 10}).json()["id"]
+        for i in range(GARAGES)
+    ]
+
+
+def add_cars(client, garage_ids, count, offset=0):
+    for i in range(offset, offset + count):
+        response = client.post("/cars", json={"make": "Toyota", "model": "Corolla", "productionYear": 2015,
+                                              "licensePlate": f"SK-{i:04d}", "garageIds": garage_ids})
+        assert response.status_code == 200
+    return response.json()["id"]
+
+
+def count_selects(client, url):
+    """ Number of SELECT statements run by a GET request, and its response """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = get_engines()["engine"]
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    return sum(statement.lstrip().upper().startswith("SELECT") for statement in statements), response
+
+
+def test_car_queries_do_not_grow_with_the_cars(client, garage_ids):
+    car_id = add_cars(client, garage_ids, 1)
+    list_selects, response = count_selects(client, "/cars")
+    assert len(response.json()) == 1
+    car_selects, response = count_selects(client, f"/cars/{car_id}")
+    assert len(response.json()["garages"]) == GARAGES
+
+    car_id = add_cars(client, garage_ids, MANY_CARS, offset=1)
+    many_list_selects, response = count_selects(client, "/cars")
+    assert len(response.json()) == MANY_CARS + 1
+    assert all(len(car["garages"]) == GARAGES for car in response.json())
+    many_car_selects, _ = count_selects(client, f"/cars/{car_id}")
+
+    assert many_list_selects == list_selects
+    assert many_car_selects == car_selects